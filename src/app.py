@@ -1,21 +1,56 @@
+import io
 import streamlit as st
 import pandas as pd
 import random
-from tests.eval_utils import load_sample_data, get_random_samples, evaluate_prediction
+from tests.eval_utils import load_sample_data, get_random_samples, evaluate_predictions
+from utils.bulk_routing import BulkRoutingJob
 
 st.title("🧾 Ticket Routing - Team Predictor")
 
+
+@st.cache_data
+def load_dataset(path="src/data/issues.csv"):
+    """The sample dataset, read once per server process instead of on every rerun."""
+    return load_sample_data(path)
+
+
+@st.cache_data
+def read_uploaded_csv(data: bytes):
+    return pd.read_csv(io.BytesIO(data))
+
+
+@st.cache_resource(show_spinner="Loading model...")
+def warm_up(model_name, _predict_teams):
+    """Loads the selected model once per server process (models are shared across sessions)."""
+    _predict_teams(["warm up"], ["warm up"])
+    return True
+
+
+@st.cache_resource(show_spinner="Indexing past tickets for duplicate detection...")
+def warm_up_dedup():
+    """Opens (building it on first run) the near-duplicate index before the first prediction."""
+    from predictors.dedup import get_index
+
+    return len(get_index())
+
+
 # Sidebar: Mode + Model Selection
-mode = st.sidebar.radio("Select Mode", ["Prediction Mode", "Testing Mode"])
+mode = st.sidebar.radio("Select Mode", ["Prediction Mode", "Testing Mode", "Bulk Mode"])
 st.sidebar.header("Model Selection")
-model_name = st.sidebar.selectbox("Choose a model", ("MBERT_base", "Qwen"))
+model_name = st.sidebar.selectbox("Choose a model", ("MBERT_base", "kNN", "Qwen"))
 
 if model_name == "MBERT_base":
     st.sidebar.info("Using MBERT_base model for team prediction.")
-    from predictors.predictor_MBERT_base import predict_team
+    from predictors.predictor_MBERT_base import predict_teams_cached as predict_teams
+elif model_name == "kNN":
+    st.sidebar.info("Using nearest-neighbour search over past tickets for team prediction.")
+    from predictors.predictor_kNN import predict_teams, similar_tickets
 elif model_name == "Qwen":
     st.sidebar.info("Using Qwen model for team prediction.")
-    # from predictors.predictor_qwen import predict_team
+    from predictors.predictor_Qwen import predict_teams
+
+warm_up(model_name, predict_teams)
+warm_up_dedup()
 
 # Prediction Mode
 if mode == "Prediction Mode":
@@ -28,32 +63,42 @@ if mode == "Prediction Mode":
         if not ticket_summary.strip() or not ticket_description.strip():
             st.warning("Please provide both summary and description.")
         else:
-            predicted_team = predict_team(ticket_summary, ticket_description)
-            st.success(f"✅ Predicted Team: `{predicted_team}`")
+            from predictors.dedup import route
+
+            # Near-duplicates of past tickets answer without running the model.
+            (result,) = route([ticket_summary], [ticket_description], fallback=model_name, fallback_fn=predict_teams)
+            source = "near-duplicate tickets" if result["stage"] == "duplicate" else model_name
+            st.success(f"✅ Predicted Team: `{result['team']}` (from {source})")
+            if result["duplicates"]:
+                st.warning(f"Possible duplicate of {', '.join(d['key'] for d in result['duplicates'])}")
+                st.dataframe(pd.DataFrame(result["duplicates"])[["key", "team", "summary", "similarity"]])
+            if model_name == "kNN":
+                st.markdown("**Similar past tickets**")
+                st.dataframe(pd.DataFrame(similar_tickets(ticket_summary, ticket_description)))
 
 # Testing Mode
 
 elif mode == "Testing Mode":
     st.subheader("🧪 Testing Mode: Evaluate on Sample Data")
 
-    test_data = load_sample_data()
+    test_data = load_dataset()
 
     if "Summary" not in test_data.columns or "Description" not in test_data.columns or "Fixed By" not in test_data.columns:
         st.error("CSV must contain 'Summary', 'Description', and 'Fixed By' columns.")
     else:
         num_samples = st.slider("Number of samples", min_value=1, max_value=10, value=5)
 
-        if "resample_clicked" not in st.session_state:
-            st.session_state["resample_clicked"] = True
+        # The drawn rows live in the session so reruns keep them; a new draw
+        # happens only on "Resample" or when the sample size changes.
+        if st.button("🔄 Resample") or st.session_state.get("sample_size") != num_samples:
+            st.session_state["sample_index"] = get_random_samples(test_data, n=num_samples).index.tolist()
+            st.session_state["sample_size"] = num_samples
 
-        if st.button("🔄 Resample"):
-            st.session_state["resample_clicked"] = not st.session_state["resample_clicked"]
+        samples = test_data.loc[st.session_state["sample_index"]]
 
-        samples = get_random_samples(test_data, n=num_samples)
-
-        for idx, row in samples.iterrows():
-            result = evaluate_prediction(row, predict_team)
+        results = evaluate_predictions(samples, predict_teams)
 
+        for idx, result in zip(samples.index, results):
             st.markdown(f"### Sample {idx + 1}")
             st.markdown(f"**Summary:** {result['summary']}")
             st.markdown(f"**Description:** {result['description']}")
@@ -67,4 +112,56 @@ elif mode == "Testing Mode":
 
             st.markdown("---")
 
+# Bulk Mode
+
+elif mode == "Bulk Mode":
+    st.subheader("📦 Bulk Mode: Route Many Tickets")
 
+    source = st.radio("Tickets to route", ["Upload a CSV", "Whole dataset"], horizontal=True)
+    if source == "Upload a CSV":
+        uploaded = st.file_uploader("CSV with 'Summary' and 'Description' columns ('Fixed By' optional)", type="csv")
+        bulk_data = read_uploaded_csv(uploaded.getvalue()) if uploaded is not None else None
+    else:
+        bulk_data = load_dataset()
+    batch_size = st.number_input("Batch size", min_value=1, max_value=512, value=64)
+
+    job = st.session_state.get("bulk_job")
+    start_col, stop_col = st.columns(2)
+    if start_col.button("▶️ Route tickets", disabled=bulk_data is None or (job is not None and job.running)):
+        try:
+            job = BulkRoutingJob(bulk_data, predict_teams, int(batch_size)).start()
+            st.session_state["bulk_job"] = job
+            st.session_state["bulk_model"] = model_name
+            st.session_state["bulk_polling"] = True
+        except ValueError as e:
+            st.error(str(e))
+    if stop_col.button("⏹ Stop", disabled=job is None or not job.running):
+        job.cancel()
+
+    # Only this fragment refreshes while the job runs; the rest of the page
+    # (and the model) is left alone.
+    @st.fragment(run_every=1.0 if job is not None and job.running else None)
+    def show_bulk_progress():
+        job = st.session_state.get("bulk_job")
+        if job is None:
+            return
+        results, stats = job.snapshot()
+        st.progress(stats["done"] / max(stats["total"], 1),
+                    text=f"{stats['done']} / {stats['total']} tickets routed with {st.session_state['bulk_model']}")
+        routed_col, accuracy_col, speed_col = st.columns(3)
+        routed_col.metric("Routed", stats["done"])
+        accuracy_col.metric("Accuracy", "n/a" if stats["accuracy"] is None else f"{stats['accuracy']:.1%}")
+        speed_col.metric("Tickets/s", f"{stats['tickets_per_s']:.1f}")
+        if stats["error"] is not None:
+            st.error(f"Routing stopped: {stats['error']}")
+        st.dataframe(results, use_container_width=True)
+        st.download_button(
+            "⬇️ Download results", results.to_csv(index=False).encode("utf-8"),
+            file_name="routed_tickets.csv", mime="text/csv", disabled=results.empty,
+        )
+        if not stats["running"] and st.session_state.get("bulk_polling"):
+            # One full rerun after the job ends turns the polling off.
+            st.session_state["bulk_polling"] = False
+            st.rerun()
+
+    show_bulk_progress()
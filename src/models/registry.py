@@ -0,0 +1,285 @@
+"""
+Process-wide model registry.
+
+Each registered model is loaded at most once per process, on first use, and
+shared by every predictor, the Streamlit app and the CLI tools. Snapshots are
+resolved offline-first: a local directory whose manifest matches the pinned
+revision (or any complete local snapshot when nothing is pinned) is used
+without touching the network; the Hugging Face Hub is only contacted when no
+usable local snapshot exists. Weights are loaded from safetensors, which
+transformers memory-maps instead of reading into a separate buffer.
+
+Other revisions can be loaded next to the live one (load_version) and
+installed with swap_model. Callers that take the loaded version once per
+request with get_version keep a consistent tokenizer/model pair across a
+swap; server.model_rollout builds staged, shadowed rollouts on top of this.
+
+    PYTHONPATH=src python -m models.registry fetch MBERT_base   # pre-download
+    PYTHONPATH=src python -m models.registry status
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HF_TOKEN = os.getenv("HF_TOKEN")
+HF_PROFILE = os.getenv("HF_PROFILE")
+
+MANIFEST_FILE = ".registry_manifest.json"
+WEIGHT_FILES = ("model.safetensors", "pytorch_model.bin")
+
+MODEL_SPECS = {
+    "MBERT_base": {
+        "model_id": f"{HF_PROFILE}/modernbert-finetuned-lomada",
+        "local_dir": os.getenv("MBERT_BASE_MODEL_DIR", "src/models/MBERT_base/modernbert-finetuned-lomada"),
+        "revision": os.getenv("MBERT_BASE_REVISION"),
+        "model_class": "AutoModelForSequenceClassification",
+    },
+    "Qwen": {
+        "model_id": os.getenv("QWEN_MODEL_ID", "Qwen/Qwen2.5-0.5B-Instruct"),
+        "local_dir": os.getenv("QWEN_MODEL_DIR", "src/models/Qwen/Qwen2.5-0.5B-Instruct"),
+        "revision": os.getenv("QWEN_REVISION"),
+        "model_class": "AutoModelForCausalLM",
+    },
+    # Sentence embedding model behind the kNN router (predictor_kNN).
+    "embedder": {
+        "model_id": os.getenv("EMBEDDING_MODEL_ID", "sentence-transformers/all-MiniLM-L6-v2"),
+        "local_dir": os.getenv("EMBEDDING_MODEL_DIR", "src/models/embedder/all-MiniLM-L6-v2"),
+        "revision": os.getenv("EMBEDDING_MODEL_REVISION"),
+        "model_class": "SentenceTransformer",
+    },
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def register_model(name, model_id, local_dir, model_class, revision=None):
+    """Adds (or replaces) a model spec; it is loaded lazily by get_model."""
+    MODEL_SPECS[name] = {
+        "model_id": model_id,
+        "local_dir": local_dir,
+        "revision": revision,
+        "model_class": model_class,
+    }
+
+
+def _read_manifest(local_dir):
+    path = os.path.join(local_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(local_dir, model_id, revision):
+    files = {
+        name: os.path.getsize(os.path.join(local_dir, name))
+        for name in os.listdir(local_dir)
+        if name != MANIFEST_FILE and os.path.isfile(os.path.join(local_dir, name))
+    }
+    manifest = {"model_id": model_id, "revision": revision, "files": files}
+    with open(os.path.join(local_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _local_fingerprint(local_dir):
+    """Revision id for snapshots copied in by hand, without a manifest."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(local_dir)):
+        path = os.path.join(local_dir, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{int(stat.st_mtime)}".encode())
+    return f"local-{digest.hexdigest()[:12]}"
+
+
+def _local_snapshot(spec):
+    """
+    Returns the revision of a complete local snapshot that satisfies the spec,
+    or None if the local directory is missing, incomplete or pinned elsewhere.
+    """
+    local_dir = spec["local_dir"]
+    if not os.path.isdir(local_dir) or not os.path.exists(os.path.join(local_dir, "config.json")):
+        return None
+    if not any(os.path.exists(os.path.join(local_dir, name)) for name in WEIGHT_FILES):
+        return None
+
+    manifest = _read_manifest(local_dir)
+    if manifest is None:
+        if spec["revision"]:
+            return None
+        return _local_fingerprint(local_dir)
+
+    for name, size in manifest["files"].items():
+        path = os.path.join(local_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            logger.warning(f"Local snapshot {local_dir} is incomplete ({name} missing or truncated)")
+            return None
+    if spec["revision"] and manifest["revision"] != spec["revision"]:
+        return None
+    return manifest["revision"]
+
+
+def _fetch(spec):
+    from huggingface_hub import HfApi, snapshot_download
+
+    revision = HfApi(token=HF_TOKEN).model_info(spec["model_id"], revision=spec["revision"]).sha
+    snapshot_download(spec["model_id"], revision=revision, local_dir=spec["local_dir"], token=HF_TOKEN)
+    _write_manifest(spec["local_dir"], spec["model_id"], revision)
+    logger.info(f"Fetched {spec['model_id']}@{revision} into {spec['local_dir']}")
+    return revision
+
+
+def fetch_snapshot(name):
+    """Downloads the model from the Hub into its local_dir and records a manifest."""
+    return _fetch(MODEL_SPECS[name])
+
+
+def resolve_snapshot(name):
+    """Returns (local_dir, revision), hitting the Hub only if no local snapshot fits."""
+    spec = MODEL_SPECS[name]
+    revision = _local_snapshot(spec)
+    if revision is None:
+        logger.info(f"No usable local snapshot for {name}; fetching {spec['model_id']} from the Hub")
+        revision = fetch_snapshot(name)
+    return spec["local_dir"], revision
+
+
+def version_dir(name, revision):
+    """Where a non-default revision of a model is kept: next to its local_dir, suffixed with @revision."""
+    return f"{MODEL_SPECS[name]['local_dir']}@{revision}"
+
+
+def resolve_version(name, revision=None, local_dir=None):
+    """
+    Returns (local_dir, revision) for a specific version of a model: a local
+    snapshot directory (its revision comes from the manifest, or a
+    fingerprint), or a Hub revision kept in version_dir and downloaded only
+    if no complete copy is there yet. With neither, the live spec is used.
+    """
+    if local_dir is not None:
+        spec = dict(MODEL_SPECS[name], local_dir=local_dir, revision=revision)
+        resolved = _local_snapshot(spec)
+        if resolved is None:
+            raise ValueError(f"{local_dir} is not a complete snapshot of {name}"
+                             + (f" at {revision}" if revision else ""))
+        return local_dir, resolved
+    if revision is None:
+        return resolve_snapshot(name)
+    spec = dict(MODEL_SPECS[name], local_dir=version_dir(name, revision), revision=revision)
+    resolved = _local_snapshot(spec)
+    if resolved is None:
+        logger.info(f"No usable local snapshot for {name}@{revision}; fetching it from the Hub")
+        resolved = _fetch(spec)
+    return spec["local_dir"], resolved
+
+
+def _load(name, revision=None, local_dir=None):
+    import torch
+    import transformers
+
+    local_dir, revision = resolve_version(name, revision, local_dir)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    if MODEL_SPECS[name]["model_class"] == "SentenceTransformer":
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(local_dir, device=str(device), local_files_only=True)
+        model.eval()
+        print(f"✅ Loaded {name} ({revision}) from {local_dir}.")
+        return {"tokenizer": model.tokenizer, "model": model, "revision": revision, "local_dir": local_dir}
+
+    model_class = getattr(transformers, MODEL_SPECS[name]["model_class"])
+
+    tokenizer = transformers.AutoTokenizer.from_pretrained(local_dir, local_files_only=True)
+    model = model_class.from_pretrained(
+        local_dir,
+        local_files_only=True,
+        use_safetensors=os.path.exists(os.path.join(local_dir, "model.safetensors")) or None,
+    )
+    model.eval()
+    print(f"✅ Loaded {name} ({revision}) from {local_dir}.")
+    return {"tokenizer": tokenizer, "model": model.to(device), "revision": revision, "local_dir": local_dir}
+
+
+def _get_entry(name):
+    entry = _loaded.get(name)
+    if entry is None:
+        with _lock:
+            entry = _loaded.get(name)
+            if entry is None:
+                entry = _loaded[name] = _load(name)
+    return entry
+
+
+def get_model(name):
+    """Returns (tokenizer, model) for a registered model, loading it on first use."""
+    entry = _get_entry(name)
+    return entry["tokenizer"], entry["model"]
+
+
+def get_revision(name):
+    """Revision of the loaded model (loads it if needed)."""
+    return _get_entry(name)["revision"]
+
+
+def get_version(name):
+    """
+    The live version of a model as one dict (tokenizer, model, revision,
+    local_dir), loading it on first use. Unlike separate get_model /
+    get_revision calls, its fields always belong together, even while
+    swap_model replaces the live version.
+    """
+    return _get_entry(name)
+
+
+def load_version(name, revision=None, local_dir=None):
+    """
+    Loads a version of a model (see resolve_version) without making it live;
+    pass the result to swap_model to do that. The live version keeps serving
+    meanwhile, so both are in memory until the old one is released.
+    """
+    return _load(name, revision, local_dir)
+
+
+def swap_model(name, version):
+    """
+    Makes a loaded version the live one and returns the version it replaced
+    (None if nothing was loaded). Requests that already hold the old version
+    finish on it; get_model / get_version return the new one from now on.
+    """
+    with _lock:
+        previous = _loaded.get(name)
+        _loaded[name] = version
+    logger.info(f"{name}: {previous['revision'] if previous else 'nothing'} -> {version['revision']}")
+    return previous
+
+
+def is_loaded(name):
+    return name in _loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or pre-download registered models")
+    parser.add_argument("command", choices=["status", "fetch"])
+    parser.add_argument("names", nargs="*", default=list(MODEL_SPECS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for name in args.names:
+        spec = MODEL_SPECS[name]
+        if args.command == "fetch":
+            fetch_snapshot(name)
+        print(f"{name}: {spec['local_dir']} -> {_local_snapshot(spec) or 'no usable local snapshot'}")
+
+
+if __name__ == "__main__":
+    main()
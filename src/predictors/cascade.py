@@ -0,0 +1,65 @@
+"""
+Cascade router: the cheap calibrated classifier answers the tickets it is
+confident about, and only the rest are escalated.
+
+A ticket is escalated when its top probability is below min_confidence or
+its margin over the runner-up is below min_margin. Escalated tickets go, in
+one batch, to the predictor named by escalate_to (any name registered in
+predictors.registry), or get TRIAGE_LABEL when there is none.
+
+    CASCADE_MIN_CONFIDENCE=0.6 CASCADE_MIN_MARGIN=0.2 CASCADE_ESCALATE_TO=kNN
+"""
+import os
+
+from predictors.registry import get_batch_predictor, get_topk_predictor, predictor_revision
+
+TRIAGE_LABEL = "Needs human triage"
+
+FIRST_STAGE = os.getenv("CASCADE_FIRST_STAGE", "MBERT_base")
+MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.6"))
+MIN_MARGIN = float(os.getenv("CASCADE_MIN_MARGIN", "0.2"))
+# Registered predictor for uncertain tickets; empty sends them to triage.
+ESCALATE_TO = os.getenv("CASCADE_ESCALATE_TO", "")
+
+
+def needs_escalation(top, min_confidence, min_margin):
+    """top is a best-first list of (team, probability) pairs for one ticket."""
+    confidence = top[0][1]
+    margin = confidence - (top[1][1] if len(top) > 1 else 0.0)
+    return confidence < min_confidence or margin < min_margin
+
+
+def route(summaries, descriptions, first_stage: str = FIRST_STAGE, escalate_to: str = ESCALATE_TO,
+          min_confidence: float = MIN_CONFIDENCE, min_margin: float = MIN_MARGIN, batch_size: int = None) -> list:
+    """
+    Returns one dict per ticket with the chosen team, the first stage's
+    top-3 (team, probability) pairs and the stage that answered
+    ("first_stage", the escalate_to name, or "triage").
+    """
+    kwargs = {"batch_size": batch_size} if batch_size else {}
+    tops = get_topk_predictor(first_stage)(summaries, descriptions, k=3, **kwargs)
+    results = [{"team": top[0][0], "top_k": top, "stage": "first_stage"} for top in tops]
+
+    escalated = [i for i, top in enumerate(tops) if needs_escalation(top, min_confidence, min_margin)]
+    if escalated and escalate_to:
+        teams = get_batch_predictor(escalate_to)(
+            [summaries[i] for i in escalated], [descriptions[i] for i in escalated], **kwargs
+        )
+        for i, team in zip(escalated, teams):
+            results[i].update(team=team, stage=escalate_to)
+    else:
+        for i in escalated:
+            results[i].update(team=TRIAGE_LABEL, stage="triage")
+    return results
+
+
+def predict_teams(summaries, descriptions, batch_size: int = None, **kwargs) -> list:
+    return [result["team"] for result in route(summaries, descriptions, batch_size=batch_size, **kwargs)]
+
+
+def model_revision(first_stage: str = FIRST_STAGE, escalate_to: str = ESCALATE_TO) -> str:
+    return "+".join(predictor_revision(name) for name in (first_stage, escalate_to) if name)
+
+
+def predict_team(summary: str, description: str) -> str:
+    return predict_teams([summary], [description])[0]
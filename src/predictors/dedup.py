@@ -0,0 +1,159 @@
+"""
+Near-duplicate short-circuit in front of a model.
+
+Many bugs are near-copies of one another: several reporters file the same
+outage. Before any model runs, every ticket is looked up in a MinHash/LSH
+index of the labelled historical tickets. A ticket whose estimated Jaccard
+similarity to some indexed ticket is at least DEDUP_THRESHOLD takes the team
+of those duplicates (a similarity-weighted vote). Only the remaining tickets
+go, in one batch, to the DEDUP_FALLBACK predictor (any name registered in
+predictors.registry).
+
+    PYTHONPATH=src python -m predictors.dedup build    # index the whole CSV
+    PYTHONPATH=src python -m predictors.dedup update   # add new/edited issues only
+"""
+import argparse
+import logging
+import os
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from predictors.minhash_index import MinHashIndex
+from predictors.registry import get_batch_predictor, predictor_revision
+from utils import record_store
+from utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+ISSUES_CSV = os.getenv("ISSUES_CSV", "src/data/issues.csv")
+INDEX_DIR = os.getenv("DEDUP_INDEX_DIR", "src/data/dedup_index")
+THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+FALLBACK = os.getenv("DEDUP_FALLBACK", "MBERT_base")
+MAX_DUPLICATES = 5
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide MinHashIndex in INDEX_DIR, built from ISSUES_CSV on first use if empty."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = MinHashIndex(INDEX_DIR)
+                if not len(index) and os.path.exists(ISSUES_CSV):
+                    index_issues(pd.read_csv(ISSUES_CSV), index)
+                _index = index
+    return _index
+
+
+def index_issues(df, index=None):
+    """
+    Adds the labelled issues of df whose key is not indexed yet or whose
+    'Updated' value changed since it was indexed. Returns the count.
+    """
+    if index is None:
+        index = get_index()
+    added = record_store.index_issues(
+        df, index, lambda summaries, descriptions: index.hasher.signatures(summaries, descriptions, index.shingle_size)
+    )
+    if added:
+            logger.info(f"Indexed {added} issues ({len(index)} in the dedup index)")
+    return added
+
+
+def build_index(df, directory):
+    """A separate MinHashIndex in directory holding only the issues of df, e.g. a training split for evaluation."""
+    index = MinHashIndex(directory)
+    index_issues(df, index)
+    return index
+
+
+def find_duplicates(summaries, descriptions, threshold: float = THRESHOLD, index=None,
+                    exclude_keys=None) -> list:
+    """
+    For each ticket, up to MAX_DUPLICATES indexed tickets with an estimated
+    Jaccard similarity of at least threshold, as dicts with key, team,
+    summary and similarity, most similar first. exclude_keys (one Issue Key
+    per ticket) keeps a ticket that is itself indexed from matching itself.
+    """
+    if index is None:
+        index = get_index()
+    if exclude_keys is None:
+        exclude_keys = [None] * len(summaries)
+    with stage("dedup.lookup"):
+        signatures = index.hasher.signatures(
+            ["" if pd.isna(summary) else summary for summary in summaries], descriptions, index.shingle_size
+        )
+        return [
+            [{**index.records[row], "similarity": similarity}
+             for row, similarity in index.query(signature, threshold, exclude_key=key)[:MAX_DUPLICATES]]
+            for signature, key in zip(signatures, exclude_keys)
+        ]
+
+
+def _vote(duplicates):
+    weights = defaultdict(float)
+    for duplicate in duplicates:
+        weights[duplicate["team"]] += duplicate["similarity"]
+    return max(weights, key=weights.get)
+
+
+def route(summaries, descriptions, threshold: float = THRESHOLD, fallback: str = FALLBACK,
+          batch_size: int = None, index=None, exclude_keys=None, fallback_fn=None) -> list:
+    """
+    Returns one dict per ticket with the chosen team, the stage that answered
+    ("duplicate" or the fallback's name) and the near-duplicates found.
+    fallback_fn, if given, scores the remaining tickets instead of the
+    registered fallback predictor (e.g. a cached wrapper of it).
+    """
+    all_duplicates = find_duplicates(summaries, descriptions, threshold, index, exclude_keys)
+    results = [
+        {"team": _vote(duplicates) if duplicates else None,
+         "stage": "duplicate" if duplicates else fallback,
+         "duplicates": duplicates}
+        for duplicates in all_duplicates
+    ]
+    remaining = [i for i, result in enumerate(results) if result["team"] is None]
+    if remaining:
+        kwargs = {"batch_size": batch_size} if batch_size else {}
+        teams = (fallback_fn or get_batch_predictor(fallback))(
+            [summaries[i] for i in remaining], [descriptions[i] for i in remaining], **kwargs
+        )
+        for i, team in zip(remaining, teams):
+            results[i]["team"] = team
+    return results
+
+
+def predict_teams(summaries, descriptions, batch_size: int = None, **kwargs) -> list:
+    return [result["team"] for result in route(summaries, descriptions, batch_size=batch_size, **kwargs)]
+
+
+def model_revision(fallback: str = FALLBACK) -> str:
+    """Revision of the fallback; duplicates reuse teams already in the index."""
+    return predictor_revision(fallback)
+
+
+def predict_team(summary: str, description: str) -> str:
+    return predict_teams([summary], [description])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the near-duplicate ticket index")
+    parser.add_argument("command", choices=["build", "update"])
+    parser.add_argument("--data", default=ISSUES_CSV)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = MinHashIndex(INDEX_DIR)
+    if args.command == "build":
+        index.clear()
+    added = index_issues(pd.read_csv(args.data), index)
+    print(f"{INDEX_DIR}: added {added}, {len(index)} tickets indexed")
+
+
+if __name__ == "__main__":
+    main()
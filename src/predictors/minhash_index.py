@@ -0,0 +1,134 @@
+"""
+Persistent MinHash / LSH index for near-duplicate tickets.
+
+A ticket is reduced to the set of word SHINGLE_SIZE-grams of its lowercased
+summary plus cleaned description. Its MinHash signature holds, for each of
+num_perm hash functions, the minimum hash over that set. Two signatures
+agree on a position with probability equal to the Jaccard similarity of the
+sets, so the fraction of equal positions estimates it.
+
+LSH splits the signature into `bands` bands of num_perm / bands rows and
+buckets every ticket by each band. Only tickets sharing at least one bucket
+with a query are compared, so a lookup touches a handful of candidates
+however large the index grows. With 128 permutations in 16 bands of 8, pairs
+at Jaccard 0.8 collide with probability 0.95 and pairs at 0.5 with 0.06.
+
+Layout of an index directory (a utils.record_store.RecordStore, like VectorIndex):
+
+    meta.json          num_perm, bands, shingle size and seed
+    signatures.u32     uint32 signatures, one row of num_perm values per record
+    records.jsonl      one JSON object per row: key, team, summary, updated
+"""
+import logging
+import os
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from utils.record_store import RecordStore
+from utils.text_cleaners import CLEANER_VERSION, clean_description
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = int(os.getenv("MINHASH_NUM_PERM", "128"))
+LSH_BANDS = int(os.getenv("MINHASH_BANDS", "16"))
+SHINGLE_SIZE = int(os.getenv("MINHASH_SHINGLE_SIZE", "3"))
+SEED = 1
+
+WORD_PATTERN = re.compile(r"\w+")
+EMPTY = np.uint32(0xFFFFFFFF)
+
+
+def shingles(summary, description, size=SHINGLE_SIZE):
+    """Set of word n-grams of the ticket text (the words themselves for very short tickets)."""
+    words = WORD_PATTERN.findall(f"{summary or ''} {clean_description(description)}".lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """num_perm multiply-shift hash functions over 32-bit shingle hashes."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Odd multipliers keep each hash a bijection on 64-bit integers.
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return np.full(self.num_perm, EMPTY, dtype=np.uint32)
+        x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+        # uint64 products wrap around; the high 32 bits are the hash value.
+        hashes = (self._a[:, None] * x[None, :] + self._b[:, None]) >> np.uint64(32)
+        return hashes.min(axis=1).astype(np.uint32)
+
+    def signatures(self, summaries, descriptions, size=SHINGLE_SIZE):
+        if not len(summaries):
+            return np.zeros((0, self.num_perm), dtype=np.uint32)
+        return np.stack([
+            self.signature(shingles(summary, description, size))
+            for summary, description in zip(summaries, descriptions)
+        ])
+
+
+class MinHashIndex(RecordStore):
+    """Append-only signature store with LSH candidate lookup."""
+
+    def __init__(self, directory, num_perm=NUM_PERM, bands=LSH_BANDS, shingle_size=SHINGLE_SIZE):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        meta = {"num_perm": num_perm, "bands": bands, "shingle_size": shingle_size, "seed": SEED,
+                "cleaner_version": CLEANER_VERSION}
+        super().__init__(directory, meta, "signatures.u32", np.uint32, num_perm)
+
+    @property
+    def signatures(self):
+        return self.matrix
+
+    def _band_keys(self, signature):
+        r = self.rows_per_band
+        return [signature[b * r:(b + 1) * r].tobytes() for b in range(self.bands)]
+
+    def _index_rows(self, start, records, signatures):
+        super()._index_rows(start, records, signatures)
+        if start == 0:
+            self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        for row, signature in enumerate(signatures, start):
+            if signature[0] == EMPTY:
+                continue
+            for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+                buckets[band_key].append(row)
+
+    def query(self, signature, threshold, exclude_key=None):
+        """
+        [(row, estimated Jaccard)] of the indexed tickets at or above threshold
+        that share an LSH bucket with signature, most similar first.
+        """
+        if signature[0] == EMPTY:
+            return []
+        with self._lock:
+            candidates = set()
+            for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+                rows = buckets.get(band_key)
+                if rows:
+                    candidates.update(rows)
+            if not candidates:
+                return []
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            rows = rows[self.active[rows]]
+            similarity = (self.signatures[rows] == signature).mean(axis=1)
+        keep = similarity >= threshold
+        matches = sorted(zip(rows[keep].tolist(), similarity[keep].tolist()), key=lambda match: -match[1])
+        if exclude_key is not None:
+            matches = [(row, sim) for row, sim in matches if self.records[row]["key"] != exclude_key]
+        return matches
@@ -0,0 +1,166 @@
+"""
+ONNX Runtime inference engine for the sequence classifiers in the model registry.
+
+The fine-tuned model is exported to ONNX once per model revision (optionally
+followed by dynamic INT8 weight quantization) and the artifacts are cached in
+a sibling directory of the local snapshot, e.g.
+src/models/MBERT_base/modernbert-finetuned-lomada-onnx/. Predictors select it
+with INFERENCE_BACKEND=onnx or INFERENCE_BACKEND=onnx-int8.
+
+    PYTHONPATH=src python -m predictors.onnx_engine MBERT_base --int8
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+
+from models.registry import get_model, resolve_snapshot
+
+logger = logging.getLogger(__name__)
+
+OPSET_VERSION = 17
+EXPORT_MANIFEST = "export_manifest.json"
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))  # 0 = onnxruntime default
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def export_dir(local_dir):
+    return f"{local_dir.rstrip(os.sep)}-onnx"
+
+
+def _read_export_manifest(out_dir):
+    path = os.path.join(out_dir, EXPORT_MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_export_manifest(out_dir, manifest):
+    with open(os.path.join(out_dir, EXPORT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def export_onnx(name, quantized=False):
+    """
+    Returns the path of the (optionally INT8-quantized) ONNX export of a
+    registered model, exporting it first if the cached artifact is missing or
+    was produced from a different model revision.
+    """
+    local_dir, revision = resolve_snapshot(name)
+    out_dir = export_dir(local_dir)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+    target = int8_path if quantized else fp32_path
+
+    manifest = _read_export_manifest(out_dir)
+    if manifest.get("revision") != revision:
+        manifest = {"revision": revision, "opset": OPSET_VERSION, "files": []}
+    if os.path.basename(target) in manifest["files"] and os.path.exists(target):
+        return target
+
+    os.makedirs(out_dir, exist_ok=True)
+    if "model.onnx" not in manifest["files"] or not os.path.exists(fp32_path):
+        _export_fp32(name, fp32_path)
+        manifest["files"] = ["model.onnx"]
+        _write_export_manifest(out_dir, manifest)
+
+    if quantized:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        manifest["files"].append("model.int8.onnx")
+        _write_export_manifest(out_dir, manifest)
+        logger.info(f"Quantized {fp32_path} -> {int8_path}")
+    return target
+
+
+def _export_fp32(name, path):
+    import torch
+
+    tokenizer, model = get_model(name)
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    # Two tickets of different length so the traced graph sees real padding.
+    dummy = tokenizer(
+        ["Summary: short\nDescription: short", "Summary: a longer ticket\nDescription: with a longer body to pad"],
+        padding=True,
+        return_tensors="pt"
+    )
+    with torch.inference_mode():
+        torch.onnx.export(
+            LogitsOnly(model).eval(),
+            (dummy["input_ids"].to(model.device), dummy["attention_mask"].to(model.device)),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=OPSET_VERSION,
+            dynamo=False,
+        )
+    logger.info(f"Exported {name} to {path}")
+
+
+class OnnxEngine:
+    """Tokenizer, label map and ONNX Runtime session for one exported model."""
+
+    def __init__(self, name, quantized=False):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The ONNX backend needs onnxruntime: pip install onnxruntime onnx") from e
+        from transformers import AutoConfig, AutoTokenizer
+
+        local_dir, self.revision = resolve_snapshot(name)
+        self.tokenizer = AutoTokenizer.from_pretrained(local_dir, local_files_only=True)
+        self.id2label = AutoConfig.from_pretrained(local_dir, local_files_only=True).id2label
+        self.path = export_onnx(name, quantized)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ORT_INTRA_OP_THREADS:
+            options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+        self.session = ort.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+
+    def logits(self, input_ids, attention_mask):
+        """Runs the classifier on int64 numpy arrays of shape (batch, sequence)."""
+        return self.session.run(
+            ["logits"], {"input_ids": input_ids, "attention_mask": attention_mask}
+        )[0]
+
+
+def get_engine(name, quantized=False):
+    """Process-wide OnnxEngine per (model, quantized), created on first use."""
+    key = (name, quantized)
+    with _lock:
+        if key not in _engines:
+            _engines[key] = OnnxEngine(name, quantized)
+    return _engines[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a registered model to ONNX")
+    parser.add_argument("name", nargs="?", default="MBERT_base")
+    parser.add_argument("--int8", action="store_true", help="Also write the dynamically quantized INT8 model")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(export_onnx(args.name, quantized=args.int8))
+
+
+if __name__ == "__main__":
+    main()
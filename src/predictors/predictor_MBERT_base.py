@@ -1,39 +1,79 @@
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from preprocessors.preprocessor_MBERT_base import format_query_string
-import torch.nn.functional as F
+from preprocessors.preprocessor_MBERT_base import format_query_strings
+from models.registry import get_model, get_version
+from predictors.onnx_engine import get_engine
+from preprocessors.dataset_cache import load_dataset_cache
+from utils.prediction_cache import get_prediction_cache
+from utils.calibration import fit_temperature, load_temperature, save_temperature
+from utils.metrics import stage
 import os
-from dotenv import load_dotenv
-load_dotenv()
 
-HF_TOKEN = os.getenv("HF_TOKEN")
-HF_PROFILE = os.getenv("HF_PROFILE")
+MODEL_NAME = "MBERT_base"
 
-MODEL_ID = f"{HF_PROFILE}/modernbert-finetuned-lomada"
-LOCAL_MODEL_DIR = "src/models/MBERT_base/modernbert-finetuned-lomada"
+DEFAULT_BATCH_SIZE = int(os.getenv("PREDICT_BATCH_SIZE", "32"))
+# Upper bound on batch_size * padded_length, so a few 512-token tickets do not
+# force a whole batch of short ones to be padded out to 512.
+DEFAULT_MAX_BATCH_TOKENS = int(os.getenv("PREDICT_MAX_BATCH_TOKENS", "8192"))
+# A batch is closed early once padding would make it this many times larger
+# than the real tokens it carries; padded positions are pure waste on CPU.
+MAX_PADDING_RATIO = float(os.getenv("PREDICT_MAX_PADDING_RATIO", "1.2"))
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# "torch" (eager PyTorch), "onnx" (ONNX Runtime fp32) or "onnx-int8"
+# (ONNX Runtime with dynamically quantized INT8 weights).
+BACKENDS = ("torch", "onnx", "onnx-int8")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
 
 def load_model_and_tokenizer():
-    try:
-        # Try to load from Hugging Face Hub
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_ID,use_auth_token=HF_TOKEN)
-        model = AutoModelForSequenceClassification.from_pretrained(MODEL_ID,use_auth_token=HF_TOKEN)
-        print("✅ Loaded model from Hugging Face Hub.")
-    except Exception as e:
-        print(f"⚠️ Could not load from Hub. Falling back to local model. Reason: {e}")
-        tokenizer = AutoTokenizer.from_pretrained(LOCAL_MODEL_DIR)
-        model = AutoModelForSequenceClassification.from_pretrained(
-            LOCAL_MODEL_DIR,
-            local_files_only=True
-        )
-    
-    return tokenizer, model.to(device)
+    """
+    Returns the shared (tokenizer, model) pair from the model registry.
+    The model is loaded on the first call in the process, not at import time.
+    """
+    return get_model(MODEL_NAME)
+
+def load_backend(backend: str = None, version: dict = None):
+    """
+    Returns (tokenizer, label_map, revision, batch_logits) for an inference
+    backend, where batch_logits maps a list of token id lists to a CPU tensor
+    of logits with one row per ticket. The torch backend runs version (a
+    models.registry.get_version / load_version dict) when one is given, and
+    otherwise the live version at the time of the call; the returned parts
+    all stay on that version even if the live one is swapped meanwhile.
+    """
+    backend = backend or INFERENCE_BACKEND
+    if version is not None and backend != "torch":
+        raise ValueError(f"Model versions can only be pinned on the torch backend, not {backend!r}")
+    if backend == "torch":
+        version = version or get_version(MODEL_NAME)
+        tokenizer, model = version["tokenizer"], version["model"]
+
+        def batch_logits(batch_input_ids):
+            with stage("mbert.pad"):
+                inputs = tokenizer.pad({"input_ids": batch_input_ids}, padding="longest", return_tensors="pt")
+            with stage("mbert.to_device"):
+                inputs = {k: v.to(model.device) for k, v in inputs.items()}
+            # .cpu() waits for the device, so the forward time is real on GPUs too.
+            with stage("mbert.forward"):
+                return model(**inputs).logits.float().cpu()
+
+        return tokenizer, model.config.id2label, version["revision"], batch_logits
+
+    if backend in ("onnx", "onnx-int8"):
+        engine = get_engine(MODEL_NAME, quantized=backend == "onnx-int8")
 
-tokenizer, model = load_model_and_tokenizer()
+        def batch_logits(batch_input_ids):
+            with stage("mbert.pad"):
+                inputs = engine.tokenizer.pad({"input_ids": batch_input_ids}, padding="longest", return_tensors="np")
+            with stage(f"mbert.forward.{backend}"):
+                return torch.from_numpy(engine.logits(
+                    inputs["input_ids"].astype("int64"), inputs["attention_mask"].astype("int64")
+                ))
 
+        # INT8 scores can differ from fp32 ones, so they are cached separately.
+        revision = engine.revision if backend == "onnx" else f"{engine.revision}/{backend}"
+        return engine.tokenizer, engine.id2label, revision, batch_logits
+
+    raise ValueError(f"Unknown inference backend {backend!r}; choose one of {BACKENDS}")
 
-label_map = model.config.id2label
 
 # def predict_team(summary: str, description: str) -> str:
 #     """
@@ -62,21 +102,167 @@ label_map = model.config.id2label
 
 
 def predict_team(summary: str, description: str) -> str:
-    inputs = tokenizer(
-        format_query_string(summary, description),
-        truncation=True,
-        padding=True,                # simple future‑proof padding
-        return_tensors="pt"
-    )
-    inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    return predict_teams([summary], [description])[0]
+
+
+def _length_buckets(lengths, batch_size, max_batch_tokens):
+    """
+    Yields lists of indices into lengths, shortest tickets first, such that each
+    list holds at most batch_size tickets, at most max_batch_tokens tokens once
+    padded to its longest member, and no more than MAX_PADDING_RATIO padding.
+    """
+    batch, batch_tokens = [], 0
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        padded_tokens = (len(batch) + 1) * lengths[i]
+        if batch and (
+            len(batch) == batch_size
+            or padded_tokens > max_batch_tokens
+            or padded_tokens > MAX_PADDING_RATIO * (batch_tokens + lengths[i])
+        ):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += lengths[i]
+    if batch:
+        yield batch
+
+
+def predict_teams(summaries, descriptions, batch_size: int = DEFAULT_BATCH_SIZE,
+                  max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS, backend: str = None,
+                  version: dict = None) -> list:
+    """
+    Returns the predicted team name for each ticket, in input order.
+    Tickets are grouped by token length before batching so each forward pass
+    only pads up to the longest ticket in its own batch.
+    """
+    query_strings = format_query_strings(summaries, descriptions)
+    if not query_strings:
+        return []
+
+    loaded = load_backend(backend, version)
+    with stage("mbert.tokenize"):
+        input_ids = loaded[0](query_strings, truncation=True)["input_ids"]
+    return _labels(loaded, _logits(loaded, input_ids, batch_size, max_batch_tokens))
+
+
+def predict_tokenized(input_ids, batch_size: int = DEFAULT_BATCH_SIZE,
+                      max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS, backend: str = None) -> list:
+    """
+    predict_teams for tickets that are already tokenized (lists or arrays of
+    token ids, e.g. from a pre-tokenized dataset cache).
+    """
+    loaded = load_backend(backend)
+    return _labels(loaded, _logits(loaded, input_ids, batch_size, max_batch_tokens))
+
+
+def tokenized_logits(input_ids, batch_size: int = DEFAULT_BATCH_SIZE,
+                     max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS, backend: str = None):
+    """Raw logits for already tokenized tickets, as a CPU tensor with one row per ticket in input order."""
+    return _logits(load_backend(backend), input_ids, batch_size, max_batch_tokens)
+
+
+def _labels(loaded, logits):
+    _, label_map, _, _ = loaded
+    with stage("mbert.labels"):
+        pred_indices = logits.argmax(dim=-1).tolist()
+        return [label_map.get(pred_idx, f"LABEL_{pred_idx}") for pred_idx in pred_indices]
+
+
+def _logits(loaded, input_ids, batch_size, max_batch_tokens):
+    """tokenized_logits on one load_backend result, so a whole call runs on a single model version."""
+    _, label_map, _, batch_logits = loaded
+    input_ids = [ids.tolist() if hasattr(ids, "tolist") else ids for ids in input_ids]
+    lengths = [len(ids) for ids in input_ids]
+
+    logits = torch.empty(len(input_ids), len(label_map))
+    with torch.inference_mode():
+        for batch_indices in _length_buckets(lengths, batch_size, max_batch_tokens):
+            logits[batch_indices] = batch_logits([input_ids[i] for i in batch_indices])
+    return logits
+
+
+def predict_logits(summaries, descriptions, batch_size: int = DEFAULT_BATCH_SIZE,
+                   max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS, backend: str = None):
+    """Raw logits for each ticket (one row per ticket, columns ordered like id2label)."""
+    return _query_logits(load_backend(backend), summaries, descriptions, batch_size, max_batch_tokens)
+
+
+def _query_logits(loaded, summaries, descriptions, batch_size, max_batch_tokens):
+    tokenizer, label_map, _, _ = loaded
+    query_strings = format_query_strings(summaries, descriptions)
+    if not query_strings:
+        return torch.empty(0, len(label_map))
+    with stage("mbert.tokenize"):
+        input_ids = tokenizer(query_strings, truncation=True)["input_ids"]
+    return _logits(loaded, input_ids, batch_size, max_batch_tokens)
+
+
+def model_revision(backend: str = None) -> str:
+    """Revision predict_teams currently runs on this backend (what the prediction cache keys on)."""
+    return load_backend(backend)[2]
+
+
+def predict_teams_topk(summaries, descriptions, k: int = 3, batch_size: int = DEFAULT_BATCH_SIZE,
+                       max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS, backend: str = None) -> list:
+    """
+    Returns, for each ticket, the k most likely teams as (team, probability)
+    pairs, best first. Probabilities are softmax(logits / T) with the
+    temperature T calibrated for the current model revision (see calibrate).
+    """
+    loaded = load_backend(backend)
+    _, label_map, revision, _ = loaded
+    logits = _query_logits(loaded, summaries, descriptions, batch_size, max_batch_tokens)
+    probs = torch.softmax(logits / load_temperature(MODEL_NAME, revision), dim=-1)
+    top_probs, top_indices = probs.topk(min(k, probs.shape[-1]), dim=-1)
+    return [
+        [(label_map.get(idx, f"LABEL_{idx}"), prob) for idx, prob in zip(indices, row_probs)]
+        for indices, row_probs in zip(top_indices.tolist(), top_probs.tolist())
+    ]
+
+
+def calibrate(summaries, descriptions, actual, backend: str = None) -> float:
+    """
+    Fits and saves the softmax temperature for the current model revision on
+    held-out tickets with known teams ("Fixed By"); returns the temperature.
+    Tickets whose team the model has no label for are ignored.
+    """
+    # One load for the labels and the logits, so both come from the revision the temperature is saved for.
+    loaded = load_backend(backend)
+    _, label_map, revision, _ = loaded
+    label_index = {team: idx for idx, team in label_map.items()}
+    known = [i for i, team in enumerate(actual) if team in label_index]
+    logits = _query_logits(loaded, [summaries[i] for i in known], [descriptions[i] for i in known],
+                           DEFAULT_BATCH_SIZE, DEFAULT_MAX_BATCH_TOKENS)
+    temperature = fit_temperature(logits, [label_index[actual[i]] for i in known])
+    save_temperature(MODEL_NAME, revision, temperature)
+    return temperature
+
+
+def load_pretokenized_dataset(path: str = "src/data/issues.csv", backend: str = None):
+    """
+    Returns the memory-mapped TokenizedDataset of a ticket CSV for this
+    model's tokenizer, building it on the first call after the data, the
+    tokenizer or the cleaning code changed.
+    """
+    tokenizer, _, revision, _ = load_backend(backend)
+    # The INT8 model scores differently but tokenizes the same, so it shares the cache of its revision.
+    return load_dataset_cache(path, tokenizer, revision.removesuffix("/onnx-int8"))
+
+
+def predict_teams_cached(summaries, descriptions) -> list:
+    """
+    predict_teams behind the shared two-tier prediction cache; tickets already
+    scored by the current model revision skip tokenization and the forward pass.
+    """
+    backend = INFERENCE_BACKEND
+    version = get_version(MODEL_NAME) if backend == "torch" else None
+    _, _, revision, _ = load_backend(backend, version)
 
-    model.eval()
-    with torch.no_grad():
-        logits = model(**inputs).logits
-        probs = F.softmax(logits, dim=-1)
+    def predict_uncached(summaries, descriptions):
+        return predict_teams(summaries, descriptions, backend=backend, version=version)
 
-    predicted_class_idx = torch.argmax(probs, dim=1).item()
+    return get_prediction_cache().predict_teams(summaries, descriptions, predict_uncached, revision)
 
-    pred_idx = int(torch.argmax(logits, dim=-1))
-    return label_map.get(pred_idx, f"LABEL_{pred_idx}")
 
+def predict_team_cached(summary: str, description: str) -> str:
+    return predict_teams_cached([summary], [description])[0]
@@ -0,0 +1,187 @@
+"""
+Causal-LM router: a Qwen instruct model scores every candidate team as the
+continuation of a ticket prompt, and the most likely team wins.
+
+Nothing is generated. The prompt is split into an instruction prefix shared
+by all tickets and a per-ticket suffix:
+
+- the prefix's KV cache is computed once per process and reused;
+- for a batch of tickets, the ticket tokens and *all* candidate labels go
+  through the model in a single forward pass on top of that cache. The
+  labels are concatenated after the ticket and a custom 4D attention mask
+  lets each label see the prefix, its ticket and its own earlier tokens
+  only, so they are scored independently without L separate passes.
+
+A team's score is the summed log-probability of its label tokens, so the
+answer is always one of the known teams.
+"""
+import copy
+import os
+import threading
+
+import pandas as pd
+import torch
+
+from models.registry import get_model, get_revision
+from preprocessors.preprocessor_Qwen import format_instruction_prefix, format_label, format_ticket_prompts
+from utils.metrics import stage
+
+MODEL_NAME = "Qwen"
+ISSUES_CSV = os.getenv("ISSUES_CSV", "src/data/issues.csv")
+DEFAULT_BATCH_SIZE = int(os.getenv("QWEN_BATCH_SIZE", "8"))
+MAX_TICKET_TOKENS = int(os.getenv("QWEN_MAX_TICKET_TOKENS", "384"))
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def load_team_labels(path: str = ISSUES_CSV) -> list:
+    """Candidate teams: QWEN_TEAMS (comma separated) or every "Fixed By" value in the dataset."""
+    teams = os.getenv("QWEN_TEAMS")
+    if teams:
+        return [team.strip() for team in teams.split(",") if team.strip()]
+    return sorted(pd.read_csv(path, usecols=["Fixed By"])["Fixed By"].dropna().unique().tolist())
+
+
+class LabelScorer:
+    """Holds the model, the tokenized labels and the shared prefix KV cache."""
+
+    def __init__(self, tokenizer, model, teams):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.teams = teams
+        self.device = model.device
+        self.pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+        prefix_ids = tokenizer(format_instruction_prefix(teams), add_special_tokens=False, return_tensors="pt")["input_ids"]
+        self.prefix_length = prefix_ids.shape[1]
+        with torch.inference_mode():
+            self.prefix_cache = model(input_ids=prefix_ids.to(self.device), use_cache=True).past_key_values
+
+        self.label_ids = [
+            tokenizer(format_label(team), add_special_tokens=False)["input_ids"] for team in teams
+        ]
+        # Position of every label token inside the concatenated label block.
+        self.label_starts = []
+        offset = 0
+        for ids in self.label_ids:
+            self.label_starts.append(offset)
+            offset += len(ids)
+        self.label_block = torch.tensor([t for ids in self.label_ids for t in ids], device=self.device)
+        self.label_block_positions = torch.tensor([j for ids in self.label_ids for j in range(len(ids))], device=self.device)
+        # label_visibility[i, j]: label-block token i may attend to label-block token j.
+        segment = torch.tensor([n for n, ids in enumerate(self.label_ids) for _ in ids], device=self.device)
+        same_label = segment[:, None] == segment[None, :]
+        self.label_visibility = same_label & torch.ones_like(same_label).tril()
+
+    def _attention_mask(self, lengths, ticket_width, dtype):
+        """Additive (batch, 1, query, key) mask over [prefix | ticket | labels] keys."""
+        batch, n_label_tokens = len(lengths), len(self.label_block)
+        query = ticket_width + n_label_tokens
+        allowed = torch.zeros(batch, query, self.prefix_length + query, dtype=torch.bool, device=self.device)
+        allowed[:, :, :self.prefix_length] = True
+        ticket_keys = slice(self.prefix_length, self.prefix_length + ticket_width)
+        label_keys = slice(self.prefix_length + ticket_width, None)
+        causal = torch.ones(ticket_width, ticket_width, dtype=torch.bool, device=self.device).tril()
+        for b, length in enumerate(lengths):
+            real = torch.arange(ticket_width, device=self.device) < length
+            allowed[b, :ticket_width, ticket_keys] = causal & real[None, :]
+            allowed[b, ticket_width:, ticket_keys] = real[None, :]
+            allowed[b, ticket_width:, label_keys] = self.label_visibility
+        # Every query sees the prefix, so no row is fully masked.
+        mask = torch.zeros(allowed.shape, dtype=dtype, device=self.device)
+        mask.masked_fill_(~allowed, torch.finfo(dtype).min)
+        return mask[:, None]
+
+    def score(self, prompts) -> torch.Tensor:
+        """(len(prompts), len(teams)) summed log-probabilities of each team's label."""
+        with stage("qwen.tokenize"):
+            ticket_ids = self.tokenizer(
+                prompts, add_special_tokens=False, truncation=True, max_length=MAX_TICKET_TOKENS
+            )["input_ids"]
+        lengths = [len(ids) for ids in ticket_ids]
+        batch, width = len(ticket_ids), max(lengths)
+
+        tickets = torch.full((batch, width), self.pad_id, dtype=torch.long, device=self.device)
+        for b, ids in enumerate(ticket_ids):
+            tickets[b, :len(ids)] = torch.tensor(ids, device=self.device)
+        input_ids = torch.cat([tickets, self.label_block.expand(batch, -1)], dim=1)
+
+        start = torch.tensor(lengths, device=self.device)[:, None] + self.prefix_length
+        position_ids = torch.cat([
+            self.prefix_length + torch.arange(width, device=self.device).expand(batch, -1),
+            start + self.label_block_positions[None, :],
+        ], dim=1)
+
+        with stage("qwen.prefix_cache"):
+            cache = copy.deepcopy(self.prefix_cache)
+            cache.batch_repeat_interleave(batch)
+        with stage("qwen.forward"):
+            logits = self.model(
+                input_ids=input_ids,
+                position_ids=position_ids,
+                attention_mask=self._attention_mask(lengths, width, self.model.dtype),
+                past_key_values=cache,
+                use_cache=True,
+            ).logits.float()
+            log_probs = torch.log_softmax(logits, dim=-1)
+
+        rows = torch.arange(batch, device=self.device)
+        last_ticket = log_probs[rows, torch.tensor(lengths, device=self.device) - 1]
+        scores = torch.empty(batch, len(self.teams))
+        for n, (ids, offset) in enumerate(zip(self.label_ids, self.label_starts)):
+            total = last_ticket[:, ids[0]]
+            for j in range(1, len(ids)):
+                total = total + log_probs[:, width + offset + j - 1, ids[j]]
+            scores[:, n] = total.cpu()
+        return scores
+
+
+def get_scorer() -> LabelScorer:
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                tokenizer, model = get_model(MODEL_NAME)
+                _scorer = LabelScorer(tokenizer, model, load_team_labels())
+    return _scorer
+
+
+def predict_scores(summaries, descriptions, batch_size: int = DEFAULT_BATCH_SIZE) -> torch.Tensor:
+    """Label log-probabilities, one row per ticket and one column per team in get_scorer().teams."""
+    scorer = get_scorer()
+    prompts = format_ticket_prompts(summaries, descriptions)
+    # Similar lengths in a batch keep padding (and wasted attention) low.
+    order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+    scores = torch.empty(len(prompts), len(scorer.teams))
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            scores[batch] = scorer.score([prompts[i] for i in batch])
+    return scores
+
+
+def predict_teams(summaries, descriptions, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    if not len(summaries):
+        return []
+    teams = get_scorer().teams
+    return [teams[i] for i in predict_scores(summaries, descriptions, batch_size).argmax(dim=-1).tolist()]
+
+
+def predict_teams_topk(summaries, descriptions, k: int = 3, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """Top-k (team, probability) pairs, with probabilities renormalised over the candidate teams."""
+    teams = get_scorer().teams
+    probs = torch.softmax(predict_scores(summaries, descriptions, batch_size), dim=-1)
+    top_probs, top_indices = probs.topk(min(k, len(teams)), dim=-1)
+    return [
+        [(teams[i], p) for i, p in zip(indices, row_probs)]
+        for indices, row_probs in zip(top_indices.tolist(), top_probs.tolist())
+    ]
+
+
+def model_revision() -> str:
+    return get_revision(MODEL_NAME)
+
+
+def predict_team(summary: str, description: str) -> str:
+    return predict_teams([summary], [description])[0]
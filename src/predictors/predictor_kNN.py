@@ -0,0 +1,170 @@
+"""
+Nearest-neighbour router: embeds a ticket with a sentence-transformers model,
+looks up the most similar historical tickets in a persistent VectorIndex and
+picks the team by a similarity-weighted vote over the top K_NEIGHBOURS.
+
+    PYTHONPATH=src python -m predictors.predictor_kNN build    # embed the whole CSV
+    PYTHONPATH=src python -m predictors.predictor_kNN update   # add new/edited issues only
+"""
+import argparse
+import logging
+import os
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from models.registry import MODEL_SPECS, get_model, get_revision
+from predictors.vector_index import VectorIndex
+from preprocessors.preprocessor_MBERT_base import format_query_strings
+from utils import record_store
+from utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "embedder"
+ISSUES_CSV = os.getenv("ISSUES_CSV", "src/data/issues.csv")
+INDEX_DIR = os.getenv("KNN_INDEX_DIR", "src/data/knn_index")
+K_NEIGHBOURS = int(os.getenv("KNN_NEIGHBOURS", "10"))
+DEFAULT_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# "exact" scores every stored ticket; "approx" probes the nearest IVF clusters
+# once the index holds at least vector_index.MIN_APPROX_ROWS tickets.
+SEARCH_MODE = os.getenv("KNN_SEARCH_MODE", "exact")
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def embed(summaries, descriptions, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Unit-norm float32 embeddings of the formatted tickets, one row each."""
+    _, model = get_model(MODEL_NAME)
+    return model.encode(
+        format_query_strings(summaries, descriptions),
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+
+
+def open_index(directory: str = INDEX_DIR, approximate: bool = SEARCH_MODE == "approx"):
+    """Opens (or starts) the VectorIndex in directory for the current embedding model."""
+    _, model = get_model(MODEL_NAME)
+    return VectorIndex(
+        directory,
+        MODEL_SPECS[MODEL_NAME]["model_id"],
+        get_revision(MODEL_NAME),
+        model.get_sentence_embedding_dimension(),
+        approximate=approximate,
+    )
+
+
+def get_index():
+    """The process-wide VectorIndex in INDEX_DIR, opened on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = open_index()
+    return _index
+
+
+def index_issues(df, batch_size: int = DEFAULT_BATCH_SIZE, index=None):
+    """
+    Embeds and appends the labelled issues of df whose key is not indexed yet
+    or whose 'Updated' value changed since it was indexed. Returns the count.
+    """
+    if index is None:
+        index = get_index()
+    added = record_store.index_issues(
+        df, index, lambda summaries, descriptions: embed(summaries, descriptions, batch_size)
+    )
+    if added:
+        logger.info(f"Indexed {added} issues ({len(index)} in the index)")
+    return added
+
+
+def build_index(df, directory, batch_size: int = DEFAULT_BATCH_SIZE):
+    """A separate VectorIndex in directory holding only the issues of df, e.g. a training split for evaluation."""
+    index = open_index(directory, approximate=False)
+    index_issues(df, batch_size, index)
+    return index
+
+
+def _vote(neighbours, index):
+    weights = defaultdict(float)
+    for row, score in neighbours:
+        weights[index.team_of(row)] += max(score, 0.0)
+    if not weights:
+        return None
+    return max(weights, key=weights.get)
+
+
+def _search(summaries, descriptions, k, batch_size, index=None):
+    if index is None:
+        index = get_index()
+        if not len(index):
+            index_issues(pd.read_csv(ISSUES_CSV), batch_size, index)
+    if not len(index):
+        raise ValueError(f"The kNN index in {index.directory} has no labelled tickets; "
+                         f"build it with `python -m predictors.predictor_kNN build --data <issues csv>`")
+    with stage("knn.embed"):
+        embeddings = embed(summaries, descriptions, batch_size)
+    with stage("knn.search"):
+        return index, index.search(embeddings, k)
+
+
+def predict_teams(summaries, descriptions, batch_size: int = DEFAULT_BATCH_SIZE,
+                  k: int = K_NEIGHBOURS, index=None, exclude_keys=None) -> list:
+    """
+    Returns the team with the largest summed similarity among each ticket's k
+    neighbours. Uses the shared index (built from ISSUES_CSV if empty) unless
+    another VectorIndex is given; raises ValueError if the index is empty. exclude_keys (one Issue Key per ticket)
+    keeps an indexed ticket from voting for itself when evaluating on
+    tickets that are in the index.
+    """
+    if not len(summaries):
+        return []
+    if exclude_keys is None:
+        index, results = _search(summaries, descriptions, k, batch_size, index)
+    else:
+        # A key has at most one active row, so one extra neighbour covers it.
+        index, results = _search(summaries, descriptions, k + 1, batch_size, index)
+        results = [
+            [(row, score) for row, score in neighbours if index.records[row]["key"] != key][:k]
+            for neighbours, key in zip(results, exclude_keys)
+        ]
+    return [_vote(neighbours, index) for neighbours in results]
+
+
+def model_revision() -> str:
+    """Revision of the embedding model; the votes also depend on the tickets indexed."""
+    return get_revision(MODEL_NAME)
+
+
+def predict_team(summary: str, description: str) -> str:
+    return predict_teams([summary], [description])[0]
+
+
+def similar_tickets(summary: str, description: str, k: int = 5) -> list:
+    """The k most similar indexed tickets as dicts with key, summary, team and score."""
+    index, (neighbours,) = _search([summary], [description], k, DEFAULT_BATCH_SIZE)
+    return [{**index.records[row], "score": score} for row, score in neighbours]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the kNN ticket index")
+    parser.add_argument("command", choices=["build", "update"])
+    parser.add_argument("--data", default=ISSUES_CSV)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "build":
+        get_index().clear()
+    added = index_issues(pd.read_csv(args.data), args.batch_size)
+    print(f"{INDEX_DIR}: added {added}, {len(get_index())} tickets indexed")
+
+
+if __name__ == "__main__":
+    main()
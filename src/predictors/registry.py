@@ -0,0 +1,105 @@
+"""
+Named batch predictors for the app and the offline tools.
+
+Each entry maps a name to the module and function implementing
+predict_teams(summaries, descriptions, batch_size=...) -> list of labels,
+plus fixed keyword arguments. Modules are only imported on first use, so
+listing predictors never loads a model.
+"""
+import functools
+import importlib
+
+PREDICTORS = {
+    "MBERT_base": ("predictors.predictor_MBERT_base", "predict_teams", {}),
+    "MBERT_base-onnx": ("predictors.predictor_MBERT_base", "predict_teams", {"backend": "onnx"}),
+    "MBERT_base-onnx-int8": ("predictors.predictor_MBERT_base", "predict_teams", {"backend": "onnx-int8"}),
+    "kNN": ("predictors.predictor_kNN", "predict_teams", {}),
+    "Qwen": ("predictors.predictor_Qwen", "predict_teams", {}),
+    # WORKER_PREDICTOR (MBERT_base by default) in a pool of forked worker processes.
+    "pool": ("server.worker_pool", "predict_teams", {}),
+    "cascade": ("predictors.cascade", "predict_teams", {}),
+    # Reuses the team of near-duplicate past tickets; DEDUP_FALLBACK scores the rest.
+    "dedup": ("predictors.dedup", "predict_teams", {}),
+}
+
+
+def register_predictor(name, module, function, **kwargs):
+    PREDICTORS[name] = (module, function, kwargs)
+
+
+def get_batch_predictor(name):
+    """Returns predict_teams(summaries, descriptions, **kwargs) for a registered predictor."""
+    try:
+        module, function, kwargs = PREDICTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown predictor {name!r}; choose one of {sorted(PREDICTORS)}") from None
+    predict_fn = getattr(importlib.import_module(module), function)
+    return functools.partial(predict_fn, **kwargs) if kwargs else predict_fn
+
+
+def get_topk_predictor(name):
+    """
+    Returns predict_teams_topk(summaries, descriptions, k=...) -> per-ticket
+    lists of (team, probability) for predictors that expose probabilities.
+    """
+    try:
+        module, _, kwargs = PREDICTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown predictor {name!r}; choose one of {sorted(PREDICTORS)}") from None
+    module = importlib.import_module(module)
+    if not hasattr(module, "predict_teams_topk"):
+        raise ValueError(f"Predictor {name!r} does not return probabilities")
+    return functools.partial(module.predict_teams_topk, **kwargs) if kwargs else module.predict_teams_topk
+
+
+def predictor_revision(name):
+    """
+    "name@revision" of the model(s) a registered predictor currently answers
+    with, from its module's model_revision(**kwargs); just the name when the
+    module does not expose one. Loads the model if needed.
+    """
+    try:
+        module, _, kwargs = PREDICTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown predictor {name!r}; choose one of {sorted(PREDICTORS)}") from None
+    module = importlib.import_module(module)
+    if not hasattr(module, "model_revision"):
+        return name
+    return f"{name}@{module.model_revision(**kwargs)}"
+
+
+def get_index_builder(name):
+    """
+    Returns build_index(df, directory) -> index for predictors that answer from
+    an index of past tickets. Their predict_teams takes that index as index=
+    and accepts exclude_keys=, so an evaluation can index only the training
+    tickets or keep each ticket from matching itself.
+    """
+    try:
+        module, _, _ = PREDICTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown predictor {name!r}; choose one of {sorted(PREDICTORS)}") from None
+    module = importlib.import_module(module)
+    if not hasattr(module, "build_index"):
+        raise ValueError(f"Predictor {name!r} does not answer from a ticket index")
+    return module.build_index
+
+
+def get_tokenized_predictor(name):
+    """
+    Returns (load_pretokenized_dataset, predict_tokenized) for predictors whose
+    module supports running on a pre-tokenized dataset cache.
+    """
+    try:
+        module, _, kwargs = PREDICTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown predictor {name!r}; choose one of {sorted(PREDICTORS)}") from None
+    module = importlib.import_module(module)
+    if not hasattr(module, "predict_tokenized"):
+        raise ValueError(f"Predictor {name!r} does not support pre-tokenized datasets")
+    load_dataset = module.load_pretokenized_dataset
+    predict_tokenized = module.predict_tokenized
+    if kwargs:
+        load_dataset = functools.partial(load_dataset, **kwargs)
+        predict_tokenized = functools.partial(predict_tokenized, **kwargs)
+    return load_dataset, predict_tokenized
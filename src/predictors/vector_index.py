@@ -0,0 +1,119 @@
+"""
+Persistent, append-only vector index of historical tickets.
+
+Layout of an index directory (a utils.record_store.RecordStore):
+
+    meta.json         embedding model, its revision and the vector dimension
+    embeddings.f32    float32 unit vectors, one row of `dim` values per record
+    records.jsonl     one JSON object per row: key, team, summary, updated
+
+Adding tickets appends to both files, so new issues never re-embed the
+corpus, and a ticket added again supersedes its earlier row, which is
+masked out of searches.
+
+Search is exact cosine similarity (a single matrix product over the
+normalized vectors) by default. With approximate=True a small IVF index is
+kept in memory instead: rows are clustered with k-means and a query only
+scores the rows in its `nprobe` nearest clusters.
+"""
+import logging
+import os
+
+import numpy as np
+
+from utils.record_store import RecordStore
+
+logger = logging.getLogger(__name__)
+
+# Below this many rows an exact search is cheaper than probing clusters.
+MIN_APPROX_ROWS = int(os.getenv("VECTOR_INDEX_MIN_APPROX_ROWS", "20000"))
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _kmeans(vectors, n_clusters, iterations=10, seed=0):
+    """Spherical k-means; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = (vectors @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=n_clusters) == 0
+        sums[empty] = centroids[empty]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class VectorIndex(RecordStore):
+    """Append-only embedding store with exact or IVF-approximate cosine search."""
+
+    def __init__(self, directory, model_id, revision, dim, approximate=False, nprobe=8):
+        self.approximate = approximate
+        self.nprobe = nprobe
+        self.dim = dim
+        meta = {"model_id": model_id, "revision": revision, "dim": dim}
+        super().__init__(directory, meta, "embeddings.f32", np.float32, dim)
+
+    @property
+    def embeddings(self):
+        return self.matrix
+
+    def _index_rows(self, start, records, vectors):
+        super()._index_rows(start, records, vectors)
+        if start == 0:
+            self._teams = np.zeros(0, dtype=object)
+            self._centroids = None
+        self._teams = np.concatenate([self._teams, np.array([r["team"] for r in records], dtype=object)])
+        if self._centroids is not None:
+            for row, cluster in enumerate((vectors @ self._centroids.T).argmax(axis=1), start):
+                self._lists[cluster] = np.append(self._lists[cluster], row)
+
+    def add(self, records, vectors):
+        """Appends records (dicts with key, team, summary, updated) and their embeddings."""
+        return super().add(records, _normalize(vectors))
+
+    def _build_ivf(self):
+        n_clusters = max(1, int(np.sqrt(len(self.embeddings))))
+        self._centroids = _kmeans(self.embeddings, n_clusters)
+        assignment = (self.embeddings @ self._centroids.T).argmax(axis=1)
+        self._lists = [np.flatnonzero(assignment == c) for c in range(n_clusters)]
+        logger.info(f"Built IVF index over {len(self.embeddings)} rows with {n_clusters} clusters")
+
+    @staticmethod
+    def _top_k(scores, rows, k):
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def search(self, queries, k=10):
+        """Returns, for each query vector, a list of (row, score) with the k best rows."""
+        queries = _normalize(queries)
+        with self._lock:
+            if not self.records:
+                return [[] for _ in range(len(queries))]
+            if not self.approximate or len(self.records) < MIN_APPROX_ROWS:
+                scores = queries @ self.embeddings.T
+                scores[:, ~self.active] = -np.inf
+                rows = np.arange(len(self.records))
+                return [self._top_k(row_scores, rows, k) for row_scores in scores]
+
+            if self._centroids is None:
+                self._build_ivf()
+            probed = np.argsort(-(queries @ self._centroids.T), axis=1)[:, :self.nprobe]
+            results = []
+            for query, clusters in zip(queries, probed):
+                rows = np.concatenate([self._lists[c] for c in clusters])
+                rows = rows[self.active[rows]]
+                results.append(self._top_k(self.embeddings[rows] @ query, rows, k))
+            return results
+
+    def team_of(self, row):
+        return self._teams[row]
@@ -0,0 +1,178 @@
+"""
+Pre-tokenized, memory-mapped copy of the ticket dataset.
+
+clean -> format -> tokenize runs once for the whole CSV and the result is
+stored as flat numpy arrays under src/data/cache/<key>/:
+
+    token_ids.npy   int32, every ticket's token ids concatenated
+    offsets.npy     int64, ticket i is token_ids[offsets[i]:offsets[i + 1]]
+    lengths.npy     int32, token count per ticket
+    labels.npy      int32, index into label_names ("Fixed By")
+    created.npy     int64, creation time in epoch nanoseconds (for time splits)
+    meta.json       label_names, issue_keys and the inputs of the cache key
+
+The key hashes the CSV contents, the model revision and tokenizer files,
+CLEANER_VERSION and FORMAT_VERSION, so editing any of them makes the next
+load rebuild, and the rebuild deletes the caches of the same CSV that it
+replaces. Loads map the arrays read-only instead of parsing the CSV again.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from preprocessors.preprocessor_MBERT_base import FORMAT_VERSION, format_query_strings
+from utils.text_cleaners import CLEANER_VERSION
+
+logger = logging.getLogger(__name__)
+
+CACHE_ROOT = os.getenv("DATASET_CACHE_DIR", "src/data/cache")
+ARRAYS = ("token_ids", "offsets", "lengths", "labels", "created")
+# Files in a tokenizer's directory that can change its token ids.
+TOKENIZER_FILES = (
+    "tokenizer.json", "tokenizer_config.json", "special_tokens_map.json", "added_tokens.json",
+    "vocab.txt", "vocab.json", "merges.txt", "spiece.model", "sentencepiece.bpe.model", "tokenizer.model",
+)
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer, revision):
+    """
+    Hash of the model revision and the files the tokenizer was loaded from,
+    plus the settings that truncate its output. Hashing the files is cheaper
+    than serialising the loaded tokenizer, and covers a snapshot edited in
+    place without a new revision.
+    """
+    digest = hashlib.sha256(str(revision).encode("utf-8"))
+    directory = tokenizer.name_or_path
+    if os.path.isdir(directory):
+        for name in TOKENIZER_FILES:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                digest.update(f"|{name}:{_file_digest(path)}".encode("utf-8"))
+    digest.update(f"|{tokenizer.model_max_length}|{tokenizer.truncation_side}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cache_key(csv_path, tokenizer, revision):
+    parts = {
+        "csv": _file_digest(csv_path),
+        "tokenizer": tokenizer_fingerprint(tokenizer, revision),
+        "cleaner_version": CLEANER_VERSION,
+        "format_version": FORMAT_VERSION,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:16], parts
+
+
+class TokenizedDataset:
+    """Read-only view over a built cache directory; arrays are memory-mapped."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        self.label_names = self.meta["label_names"]
+        self.issue_keys = self.meta["issue_keys"]
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def input_ids(self, i):
+        return self.token_ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def iter_input_ids(self, indices=None):
+        """Yields each ticket's token ids as a list, without touching the CSV."""
+        for i in (range(len(self)) if indices is None else indices):
+            yield self.input_ids(i).tolist()
+
+    def actual_labels(self, indices=None):
+        indices = range(len(self)) if indices is None else indices
+        return [self.label_names[self.labels[i]] for i in indices]
+
+    def time_split(self, test_fraction=0.2):
+        """(train_indices, test_indices) with the newest test_fraction as test."""
+        order = np.argsort(self.created, kind="stable")
+        cutoff = int(len(order) * (1 - test_fraction))
+        return order[:cutoff], order[cutoff:]
+
+
+def build_dataset_cache(csv_path, tokenizer, revision, directory):
+    df = pd.read_csv(csv_path).dropna(subset=["Fixed By"])
+    query_strings = format_query_strings(df["Summary"].fillna("").tolist(), df["Description"].tolist())
+    encoded = tokenizer(query_strings, truncation=True)["input_ids"]
+
+    lengths = np.fromiter((len(ids) for ids in encoded), dtype=np.int32, count=len(encoded))
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    token_ids = np.fromiter((t for ids in encoded for t in ids), dtype=np.int32, count=int(offsets[-1]))
+
+    label_names = sorted(df["Fixed By"].unique().tolist())
+    label_index = {name: i for i, name in enumerate(label_names)}
+    labels = np.array([label_index[name] for name in df["Fixed By"]], dtype=np.int32)
+    created = pd.to_datetime(df["Created"], utc=True, format="ISO8601").astype("int64").to_numpy()
+
+    # Build in a scratch directory and rename, so readers never see half a cache.
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    scratch = tempfile.mkdtemp(dir=parent)
+    try:
+        for name, array in zip(ARRAYS, (token_ids, offsets, lengths, labels, created)):
+            np.save(os.path.join(scratch, f"{name}.npy"), array)
+        _, parts = cache_key(csv_path, tokenizer, revision)
+        with open(os.path.join(scratch, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "source": csv_path,
+                "key_parts": parts,
+                "label_names": label_names,
+                "issue_keys": df["Issue Key"].tolist(),
+            }, f)
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.replace(scratch, directory)
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+    logger.info(f"Built dataset cache {directory}: {len(lengths)} tickets, {int(offsets[-1])} tokens")
+
+
+def _remove_stale_caches(csv_path, cache_root, keep):
+    """Deletes the caches built from csv_path other than keep; they can only be hit again by a rollback."""
+    for key in os.listdir(cache_root):
+        directory = os.path.join(cache_root, key)
+        if key == keep or not os.path.isfile(os.path.join(directory, "meta.json")):
+            continue
+        try:
+            with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                source = json.load(f).get("source")
+        except (OSError, ValueError):
+            continue
+        if source == csv_path:
+            shutil.rmtree(directory, ignore_errors=True)
+            logger.info(f"Removed stale dataset cache {directory}")
+
+
+def load_dataset_cache(csv_path, tokenizer, revision, cache_root=CACHE_ROOT):
+    """
+    Returns the TokenizedDataset for csv_path as tokenized by the given model
+    revision's tokenizer, building it if it is missing or stale.
+    """
+    key, _ = cache_key(csv_path, tokenizer, revision)
+    directory = os.path.join(cache_root, key)
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        build_dataset_cache(csv_path, tokenizer, revision, directory)
+        _remove_stale_caches(csv_path, cache_root, key)
+    return TokenizedDataset(directory)
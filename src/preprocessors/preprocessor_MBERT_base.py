@@ -1,4 +1,8 @@
-from utils.text_cleaners import clean_description
+from utils.metrics import stage
+from utils.text_cleaners import clean_description, clean_descriptions
+
+# Bump whenever the query string layout changes (invalidates dataset caches).
+FORMAT_VERSION = "1"
 
 def format_query_string(summary: str, description: str) -> str:
     """
@@ -7,4 +11,16 @@ def format_query_string(summary: str, description: str) -> str:
     cleaned_description = clean_description(description)
     query_string = f"Summary: {summary}\nDescription: {cleaned_description}"
     
-    return query_string
\ No newline at end of file
+    return query_string
+
+def format_query_strings(summaries, descriptions) -> list:
+    """
+    Batch version of format_query_string.
+    """
+    with stage("preprocess.clean"):
+        cleaned_descriptions = clean_descriptions(descriptions)
+    with stage("preprocess.format"):
+        return [
+            f"Summary: {summary}\nDescription: {cleaned_description}"
+            for summary, cleaned_description in zip(summaries, cleaned_descriptions)
+        ]
@@ -0,0 +1,35 @@
+from utils.text_cleaners import clean_descriptions
+
+# Descriptions are cut to this many characters; the prompt is scored once per
+# ticket on CPU and the first paragraphs carry the routing signal.
+MAX_DESCRIPTION_CHARS = 2000
+
+
+def format_instruction_prefix(teams) -> str:
+    """
+    The part of the prompt shared by every ticket. Its KV cache is computed
+    once and reused, so nothing ticket-specific may go in here.
+    """
+    team_list = "\n".join(f"- {team}" for team in teams)
+    return (
+        "You route Jira bug tickets to the engineering team that will fix them.\n"
+        f"Teams:\n{team_list}\n\n"
+        "Read the ticket and answer with the name of exactly one team.\n\n"
+    )
+
+
+def format_ticket_prompts(summaries, descriptions) -> list:
+    """
+    The ticket-specific continuation of the prefix, ending where the team
+    name is expected.
+    """
+    cleaned_descriptions = clean_descriptions(descriptions)
+    return [
+        f"Summary: {summary}\nDescription: {cleaned_description[:MAX_DESCRIPTION_CHARS]}\nTeam:"
+        for summary, cleaned_description in zip(summaries, cleaned_descriptions)
+    ]
+
+
+def format_label(team: str) -> str:
+    """A candidate answer; the trailing newline stops 'Core' from also scoring as a prefix of 'Core Infra'."""
+    return f" {team}\n"
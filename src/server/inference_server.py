@@ -0,0 +1,371 @@
+"""
+Standalone asyncio HTTP service in front of the team predictor.
+
+Concurrent /predict requests are put on a bounded queue; a single batching
+loop drains up to MAX_BATCH_SIZE of them (waiting at most MAX_WAIT_MS after
+the first one arrives), runs them through predict_teams as one forward pass
+and resolves each caller's future with its own label. When the queue is full
+the server answers 503 with a Retry-After header instead of queueing more,
+and a body over MAX_BODY_BYTES gets 413 before any of it is read.
+
+GET /metrics serves the per-stage latency histograms (queue wait, batch,
+and the predictor's own stages) in the Prometheus text format, and
+/metrics.json serves them as JSON; with --workers the predictor stages are
+recorded in the worker processes and merged in as each job comes back. With
+--profile the sampling profiler runs for the server's lifetime: GET /profile
+lists the hottest functions, and the folded stacks are written to the given
+file on shutdown. It samples only this process, so it cannot be combined
+with --workers (where /profile answers 404).
+
+Without --workers, a new model version can be rolled out while the server
+keeps answering (see server.model_rollout):
+
+    POST /model/stage     {"local_dir": ...} or {"revision": ...}, optional
+                          "shadow_fraction"; loads and warms it up
+    GET  /model           live / candidate revisions, warm-up cost, shadow
+                          agreement and latency
+    POST /model/promote   optional {"min_agreement": 0.95, "min_tickets": 200}
+    POST /model/rollback, POST /model/discard
+
+Run from the repository root:
+    PYTHONPATH=src python -m server.inference_server --port 8080
+
+    curl -X POST localhost:8080/predict \\
+         -d '{"summary": "Page breaks after login", "description": "..."}'
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from utils import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("MAX_WAIT_MS", "10"))
+MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "1024"))
+# Larger request bodies are answered 413 without being read.
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(1024 * 1024)))
+RETRY_AFTER_SECONDS = 1
+
+
+class QueueFullError(Exception):
+    """Raised when a request arrives while the batching queue is at capacity."""
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-ticket requests into batched calls of
+    predict_batch_fn(summaries, descriptions) -> list of labels.
+    """
+
+    def __init__(self, predict_batch_fn, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait_ms=MAX_WAIT_MS, max_queue_size=MAX_QUEUE_SIZE, max_concurrent_batches=1):
+        self.predict_batch_fn = predict_batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # More than one batch in flight only helps when predict_batch_fn runs
+        # elsewhere (e.g. a WorkerPool); in-process torch already uses every core.
+        self.max_concurrent_batches = max_concurrent_batches
+        self._queue = asyncio.Queue(maxsize=max_queue_size)
+        self.stats = {"requests": 0, "rejected": 0, "batches": 0, "batched_requests": 0}
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    async def submit(self, summary, description):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((summary, description, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"queue is full ({self._queue.maxsize} pending requests)")
+        self.stats["requests"] += 1
+        return await future
+
+    async def _collect_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _predict_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        summaries = [summary for summary, _, _, _ in batch]
+        descriptions = [description for _, description, _, _ in batch]
+        started = time.perf_counter()
+        for _, _, _, enqueued in batch:
+            metrics.observe("server.queue_wait", started - enqueued)
+        try:
+            # The forward pass runs in a worker thread so the event loop
+            # keeps accepting (and queueing) requests meanwhile.
+            teams = await loop.run_in_executor(None, self.predict_batch_fn, summaries, descriptions)
+        except Exception as e:
+            logger.exception("Batch of %d requests failed", len(batch))
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        metrics.observe("server.batch", time.perf_counter() - started)
+        self.stats["batches"] += 1
+        self.stats["batched_requests"] += len(batch)
+        for (_, _, future, _), team in zip(batch, teams):
+            if not future.done():
+                future.set_result(team)
+
+    async def run(self):
+        slots = asyncio.Semaphore(self.max_concurrent_batches)
+        while True:
+            await slots.acquire()
+            batch = await self._collect_batch()
+            task = asyncio.create_task(self._predict_batch(batch))
+            task.add_done_callback(lambda _: slots.release())
+
+
+class InferenceServer:
+    """Minimal HTTP/1.1 front end (keep-alive, JSON bodies) for a MicroBatcher."""
+
+    def __init__(self, batcher, cache=None, rollout=None, workers=0, max_body_bytes=MAX_BODY_BYTES):
+        self.batcher = batcher
+        self.cache = cache
+        self.rollout = rollout
+        self.workers = workers
+        self.max_body_bytes = max_body_bytes
+
+    async def route(self, method, path, body):
+        # Query strings are accepted and ignored.
+        path = urlsplit(path).path
+        if path == "/model" or path.startswith("/model/"):
+            return await self.route_model(method, path, body)
+        if path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}, {}
+        if path == "/metrics":
+            return HTTPStatus.OK, metrics.render_prometheus(), {}
+        if path == "/metrics.json":
+            return HTTPStatus.OK, metrics.snapshot(), {}
+        if path == "/profile":
+            if self.workers:
+                return HTTPStatus.NOT_FOUND, {"error": "the profiler cannot sample --workers processes"}, {}
+            profiler = metrics.get_profiler()
+            if not profiler.running:
+                return HTTPStatus.NOT_FOUND, {"error": "start the server with --profile"}, {}
+            top = [{"function": f, "samples": n, "share": round(share, 4)} for f, n, share in profiler.top(25)]
+            return HTTPStatus.OK, {"samples": profiler.samples, "top": top}, {}
+        if path == "/stats":
+            stats = dict(self.batcher.stats, queue_depth=self.batcher.queue_depth)
+            if stats["batches"]:
+                stats["mean_batch_size"] = stats["batched_requests"] / stats["batches"]
+            if self.cache is not None:
+                stats["cache"] = self.cache.stats()
+            if self.rollout is not None:
+                stats["model"] = self.rollout.status()
+            return HTTPStatus.OK, stats, {}
+        if path != "/predict":
+            return HTTPStatus.NOT_FOUND, {"error": f"unknown path {path}"}, {}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use POST"}, {"Allow": "POST"}
+
+        try:
+            payload = json.loads(body or b"{}")
+            summary = payload["summary"]
+            description = payload["description"]
+        except (ValueError, KeyError, TypeError):
+            return HTTPStatus.BAD_REQUEST, {"error": "body must be JSON with 'summary' and 'description'"}, {}
+
+        try:
+            team = await self.batcher.submit(summary, description)
+        except QueueFullError as e:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}, {"Retry-After": str(RETRY_AFTER_SECONDS)}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}, {}
+        return HTTPStatus.OK, {"team": team}, {}
+
+    async def route_model(self, method, path, body):
+        from server.model_rollout import RolloutError
+
+        if self.rollout is None:
+            return HTTPStatus.CONFLICT, {"error": "model rollouts need in-process inference (no --workers)"}, {}
+        if path == "/model":
+            return HTTPStatus.OK, self.rollout.status(), {}
+        actions = {
+            "/model/stage": lambda payload: self.rollout.stage(
+                payload.get("revision"), payload.get("local_dir"), payload.get("shadow_fraction"),
+            ),
+            "/model/promote": lambda payload: self.rollout.promote(
+                payload.get("min_agreement"), int(payload.get("min_tickets", 0))
+            ),
+            "/model/rollback": lambda payload: self.rollout.rollback(),
+            "/model/discard": lambda payload: self.rollout.discard(),
+        }
+        if path not in actions:
+            return HTTPStatus.NOT_FOUND, {"error": f"unknown path {path}"}, {}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use POST"}, {"Allow": "POST"}
+        try:
+            payload = json.loads(body or b"{}")
+            # None of these block the event loop: staging loads in its own thread.
+            actions[path](payload)
+        except RolloutError as e:
+            return HTTPStatus.CONFLICT, {"error": str(e)}, {}
+        except (ValueError, TypeError, AttributeError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}, {}
+        status = HTTPStatus.ACCEPTED if path == "/model/stage" else HTTPStatus.OK
+        return status, self.rollout.status(), {}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                content_length = int(headers.get("content-length", 0))
+                if content_length > self.max_body_bytes:
+                    # The unread body would be parsed as the next request, so the connection ends here.
+                    error = {"error": f"body of {content_length} bytes is over the {self.max_body_bytes} byte limit"}
+                    writer.write(self._render(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, error, {}, keep_alive=False))
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(content_length)
+
+                status, payload, extra_headers = await self.route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(self._render(status, payload, extra_headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _render(status, payload, extra_headers, keep_alive):
+        # Strings are the Prometheus text exposition; everything else is JSON.
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in extra_headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def serve(predict_batch_fn, host, port, max_batch_size, max_wait_ms, max_queue_size, cache=None,
+                max_concurrent_batches=1, rollout=None, workers=0, max_body_bytes=MAX_BODY_BYTES):
+    batcher = MicroBatcher(predict_batch_fn, max_batch_size, max_wait_ms, max_queue_size, max_concurrent_batches)
+    server = InferenceServer(batcher, cache, rollout, workers, max_body_bytes)
+    batch_task = asyncio.create_task(batcher.run())
+    http_server = await asyncio.start_server(server.handle_connection, host, port)
+    logger.info(
+        f"Serving on http://{host}:{port} "
+        f"(max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}, max_queue_size={max_queue_size})"
+    )
+    try:
+        async with http_server:
+            await http_server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching team prediction server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--max-queue-size", type=int, default=MAX_QUEUE_SIZE)
+    parser.add_argument("--max-body-bytes", type=int, default=MAX_BODY_BYTES)
+    parser.add_argument("--cache", action="store_true", help="Serve through the shared prediction cache")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run predictions in this many forked worker processes (0 = in this process)")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads per worker process")
+    parser.add_argument("--profile", help="Run the sampling profiler and write folded stacks here on shutdown")
+    parser.add_argument("--shadow-fraction", type=float, default=None,
+                        help="Share of live batches a staged model version also scores (default SHADOW_FRACTION)")
+    args = parser.parse_args()
+    if args.profile and args.workers:
+        parser.error("--profile samples only this process; the forward passes of --workers run elsewhere")
+
+    from predictors.predictor_MBERT_base import INFERENCE_BACKEND, MODEL_NAME, predict_teams, load_backend
+    from utils.prediction_cache import get_prediction_cache
+
+    if args.workers:
+        from server.worker_pool import single_thread_parent
+
+        # The parent only dispatches; one torch thread keeps forking multi-threaded workers safe.
+        single_thread_parent()
+    # Load the model before accepting connections so /health means "ready".
+    _, _, revision, _ = load_backend()
+    cache = get_prediction_cache() if args.cache else None
+    rollout = None
+    predict_batch_fn = predict_teams
+    if args.workers:
+        from server.worker_pool import WORKER_THREADS, WorkerPool
+
+        pool = WorkerPool(MODEL_NAME, args.workers, args.threads or WORKER_THREADS)
+        predict_batch_fn = pool.predict_teams
+    elif INFERENCE_BACKEND == "torch":
+        from server.model_rollout import ModelRollout
+
+        # Pins the live version per batch, so /model/promote can swap it at any time.
+        rollout = ModelRollout(MODEL_NAME, cache=cache)
+        if args.shadow_fraction is not None:
+            rollout.shadow_fraction = args.shadow_fraction
+        predict_batch_fn = rollout.predict_teams
+    if cache is not None and rollout is None:
+        uncached_fn = predict_batch_fn
+
+        def predict_batch_fn(summaries, descriptions):
+            return cache.predict_teams(summaries, descriptions, uncached_fn, revision)
+
+    profiler = metrics.get_profiler()
+    if args.profile and not profiler.running:
+        profiler.start()
+    try:
+        asyncio.run(serve(
+            predict_batch_fn, args.host, args.port,
+            args.max_batch_size, args.max_wait_ms, args.max_queue_size, cache,
+            max_concurrent_batches=max(1, args.workers), rollout=rollout, workers=args.workers,
+            max_body_bytes=args.max_body_bytes,
+        ))
+    finally:
+        if args.profile:
+            profiler.stop().write_folded(args.profile)
+            logger.info(f"Wrote {profiler.samples} profiler samples to {args.profile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Zero-downtime rollouts of a new MBERT_base revision.
+
+A rollout moves through these states:
+
+    staging    the candidate is loaded (models.registry.load_version) and
+               warmed up in a background thread while the live model keeps
+               serving
+    ready      warm; if shadow_fraction > 0, that share of the live batches
+               is also scored by the candidate, off the request path, and
+               compared with the live answers
+    promoted   installed with models.registry.swap_model; the replaced
+               version is kept for rollback() unless KEEP_PREVIOUS_VERSION=0
+    failed / discarded
+
+Warm-up runs WARMUP_ROUNDS passes over WARMUP_TICKETS tickets sampled from
+ISSUES_CSV. It records the load time, the first-pass latency and the
+steady-state latency, so the cost of a rollout is measured instead of
+being paid by the first live requests after the swap.
+
+Live predictions go through ModelRollout.predict_teams, which pins the live
+version once per call. A swap therefore never mixes two versions within a
+batch, and batches already running finish on the version they started with.
+
+Shadow scoring shares the CPU with live traffic: a fraction f adds about f
+times the candidate's forward cost. Batches are sampled whole, so the
+latency comparison is between the same tickets with the same padding. When
+the shadow queue is full, sampled batches are dropped rather than delaying
+live requests.
+
+    rollout = ModelRollout()
+    rollout.stage(local_dir="src/models/MBERT_base/retrained", shadow_fraction=0.1)
+    rollout.wait()
+    rollout.status()["shadow"]["agreement"]
+    rollout.promote(min_agreement=0.95)
+"""
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+from models.registry import get_version, load_version, swap_model
+from predictors.predictor_MBERT_base import MODEL_NAME, predict_teams
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+ISSUES_CSV = os.getenv("ISSUES_CSV", "src/data/issues.csv")
+WARMUP_TICKETS = int(os.getenv("WARMUP_TICKETS", "32"))
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "3"))
+SHADOW_FRACTION = float(os.getenv("SHADOW_FRACTION", "0"))
+# Sampled batches waiting for the candidate; more are dropped, not queued.
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "8"))
+KEEP_PREVIOUS_VERSION = os.getenv("KEEP_PREVIOUS_VERSION", "1") != "0"
+MAX_DISAGREEMENTS = 10
+
+
+class RolloutError(Exception):
+    """Raised when a rollout action does not fit the current state (e.g. promoting before warm-up)."""
+
+
+def load_warmup_tickets(path=ISSUES_CSV, n=WARMUP_TICKETS, seed=0):
+    """(summaries, descriptions) of n tickets sampled from path, or placeholder tickets if it is missing."""
+    if not os.path.exists(path):
+        return ["warm up"] * n, ["warm up"] * n
+    df = pd.read_csv(path)
+    df = df.sample(min(n, len(df)), random_state=seed)
+    return df["Summary"].fillna("").tolist(), df["Description"].tolist()
+
+
+def _latency_ms(histogram):
+    if not histogram.count:
+        return None
+    return {
+        "mean": round(histogram.sum / histogram.count * 1000, 3),
+        "p50": round(histogram.quantile(0.5) * 1000, 3),
+        "p99": round(histogram.quantile(0.99) * 1000, 3),
+    }
+
+
+class ModelRollout:
+    """Stages, shadows, promotes and rolls back versions of one model for in-process predictions."""
+
+    def __init__(self, model_name=MODEL_NAME, cache=None, shadow_fraction=SHADOW_FRACTION,
+                 warmup_tickets=None, shadow_queue_size=SHADOW_QUEUE_SIZE, seed=None):
+        self.model_name = model_name
+        self.cache = cache
+        self._warmup_tickets = warmup_tickets
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._rng = random.Random(seed)
+        self._shadow_queue = queue.Queue(maxsize=shadow_queue_size)
+        self._shadow_thread = None
+        self.state = "idle"
+        self.error = None
+        self.candidate = None
+        self.previous = None
+        self.shadow_fraction = shadow_fraction
+        self._generation = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.warmup = {}
+        self.shadow = Counter()
+        self.disagreements = Counter()
+        self.live_latency = metrics.Histogram()
+        self.candidate_latency = metrics.Histogram()
+
+    # Serving
+
+    def predict_teams(self, summaries, descriptions, version=None):
+        """
+        predict_teams on the live version (or the given one), pinned for the
+        whole call; through the prediction cache when one was given.
+        """
+        version = version or get_version(self.model_name)
+        if self.cache is None:
+            return self._predict_live(summaries, descriptions, version)
+
+        def predict_uncached(summaries, descriptions):
+            return self._predict_live(summaries, descriptions, version)
+
+        return self.cache.predict_teams(summaries, descriptions, predict_uncached, version["revision"])
+
+    def _predict_live(self, summaries, descriptions, version):
+        start = time.perf_counter()
+        teams = predict_teams(summaries, descriptions, version=version)
+        live_s = time.perf_counter() - start
+        candidate = self.candidate
+        if (candidate is not None and self.state == "ready" and self.shadow_fraction
+                and self._rng.random() < self.shadow_fraction):
+            try:
+                self._shadow_queue.put_nowait((candidate, summaries, descriptions, teams, live_s))
+            except queue.Full:
+                self.shadow["dropped"] += 1
+        return teams
+
+    def _shadow_loop(self):
+        while True:
+            candidate, summaries, descriptions, live_teams, live_s = self._shadow_queue.get()
+            if candidate is not self.candidate:
+                continue  # promoted or discarded while queued
+            start = time.perf_counter()
+            try:
+                teams = predict_teams(summaries, descriptions, version=candidate)
+            except Exception:
+                logger.exception(f"Shadow prediction on {candidate['revision']} failed")
+                self.shadow["errors"] += 1
+                continue
+            candidate_s = time.perf_counter() - start
+            metrics.observe("rollout.shadow", candidate_s)
+            self.live_latency.observe(live_s)
+            self.candidate_latency.observe(candidate_s)
+            self.shadow["batches"] += 1
+            self.shadow["tickets"] += len(teams)
+            for live, shadow in zip(live_teams, teams):
+                if live == shadow:
+                    self.shadow["agree"] += 1
+                else:
+                    self.disagreements[(live, shadow)] += 1
+
+    # Rollout steps
+
+    def stage(self, revision=None, local_dir=None, shadow_fraction=None):
+        """
+        Starts loading and warming up a candidate version (a Hub revision or a
+        local snapshot directory) in the background; returns immediately.
+        shadow_fraction defaults to the rollout's current one.
+        """
+        if shadow_fraction is None:
+            shadow_fraction = self.shadow_fraction
+        if not 0 <= shadow_fraction <= 1:
+            raise ValueError("shadow_fraction must be between 0 and 1")
+        with self._lock:
+            if self.state in ("staging", "ready"):
+                raise RolloutError(f"A rollout is already {self.state}; promote or discard it first")
+            self.state, self.error, self.candidate = "staging", None, None
+            self.shadow_fraction = shadow_fraction
+            self._reset_stats()
+            self._ready.clear()
+            self._generation += 1
+            generation = self._generation
+        if shadow_fraction and self._shadow_thread is None:
+            self._shadow_thread = threading.Thread(target=self._shadow_loop, name="shadow-model", daemon=True)
+            self._shadow_thread.start()
+        threading.Thread(
+            target=self._stage, args=(generation, revision, local_dir), name="stage-model", daemon=True
+        ).start()
+
+    def _stage(self, generation, revision, local_dir):
+        warmup = {}
+        try:
+            start = time.perf_counter()
+            candidate = load_version(self.model_name, revision, local_dir)
+            warmup["load_s"] = round(time.perf_counter() - start, 3)
+
+            if self._warmup_tickets is None:
+                self._warmup_tickets = load_warmup_tickets()
+            summaries, descriptions = self._warmup_tickets
+            rounds = []
+            for _ in range(max(1, WARMUP_ROUNDS)):
+                start = time.perf_counter()
+                predict_teams(summaries, descriptions, version=candidate)
+                rounds.append(time.perf_counter() - start)
+            steady = sorted(rounds[1:]) or rounds
+            warmup.update({
+                "tickets": len(summaries),
+                "first_pass_ms": round(rounds[0] * 1000, 1),
+                "warm_pass_ms": round(steady[len(steady) // 2] * 1000, 1),
+                "total_s": round(warmup["load_s"] + sum(rounds), 3),
+            })
+        except Exception as e:
+            logger.exception(f"Staging {self.model_name} ({revision or local_dir}) failed")
+            with self._lock:
+                if generation == self._generation and self.state == "staging":
+                    self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+                    self._ready.set()
+            return
+
+        with self._lock:
+            if generation != self._generation or self.state != "staging":  # discarded while loading
+                return
+            self.candidate, self.state, self.warmup = candidate, "ready", warmup
+        logger.info(f"{self.model_name} {candidate['revision']} is warm: {warmup}")
+        self._ready.set()
+
+    def wait(self, timeout=None):
+        """Blocks until the staged candidate is ready (or failed); returns the state."""
+        self._ready.wait(timeout)
+        return self.state
+
+    def promote(self, min_agreement=None, min_tickets=0):
+        """
+        Swaps the warm candidate in. With min_agreement, refuses unless at
+        least min_tickets shadowed tickets were scored and the candidate
+        agreed with the live model on at least that share of them.
+        """
+        with self._lock:
+            if self.state != "ready":
+                raise RolloutError(f"Nothing to promote (rollout is {self.state})")
+            if min_agreement is not None:
+                tickets = self.shadow["tickets"]
+                agreement = self.shadow["agree"] / tickets if tickets else 0.0
+                if tickets < min_tickets or agreement < min_agreement:
+                    raise RolloutError(
+                        f"Shadow agreement {agreement:.1%} on {tickets} tickets is below "
+                        f"{min_agreement:.1%} on {min_tickets}"
+                    )
+            candidate, self.candidate, self.state = self.candidate, None, "promoted"
+            previous = swap_model(self.model_name, candidate)
+            self.previous = previous if KEEP_PREVIOUS_VERSION else None
+        return candidate["revision"]
+
+    def rollback(self):
+        """Makes the version replaced by the last promotion live again."""
+        with self._lock:
+            if self.previous is None:
+                raise RolloutError("No previous version to roll back to")
+            previous, self.previous = self.previous, None
+            swap_model(self.model_name, previous)
+            self.state = "rolled back"
+        return previous["revision"]
+
+    def discard(self):
+        """Drops a staged or staging candidate; the live model is untouched."""
+        with self._lock:
+            if self.state not in ("staging", "ready", "failed"):
+                raise RolloutError(f"Nothing to discard (rollout is {self.state})")
+            self.candidate, self.state = None, "discarded"
+        self._ready.set()
+
+    def status(self):
+        tickets = self.shadow["tickets"]
+        return {
+            "model": self.model_name,
+            "live_revision": get_version(self.model_name)["revision"],
+            "state": self.state,
+            "candidate_revision": self.candidate["revision"] if self.candidate else None,
+            "previous_revision": self.previous["revision"] if self.previous else None,
+            "error": self.error,
+            "warmup": dict(self.warmup),
+            "shadow": {
+                "fraction": self.shadow_fraction,
+                "batches": self.shadow["batches"],
+                "tickets": tickets,
+                "agreement": round(self.shadow["agree"] / tickets, 4) if tickets else None,
+                "pending": self._shadow_queue.qsize(),
+                "dropped": self.shadow["dropped"],
+                "errors": self.shadow["errors"],
+                "live_batch_ms": _latency_ms(self.live_latency),
+                "candidate_batch_ms": _latency_ms(self.candidate_latency),
+                "top_disagreements": [
+                    {"live": live, "candidate": candidate, "count": count}
+                    for (live, candidate), count in self.disagreements.most_common(MAX_DISAGREEMENTS)
+                ],
+            },
+        }
@@ -0,0 +1,391 @@
+"""
+Long-running Jira auto-routing daemon.
+
+Every POLL_INTERVAL_SECONDS it searches Jira for Bug / Transient Bug issues
+created in the last POLL_WINDOW_MINUTES whose "Fixed By" field
+(customfield_14600) is still empty, scores all of them with one call to the
+batched predictor and writes the predicted teams back:
+
+- issues are grouped by predicted team and each group is set with one Jira
+  Cloud bulk-edit request (POST /rest/api/3/bulk/issues/fields, then polled
+  until the task completes); on Jira versions without the bulk API, or for
+  the issues a bulk task reports as failed, it falls back to one
+  PUT /rest/api/2/issue/{key} per issue. A task still running after
+  BULK_TASK_TIMEOUT_SECONDS leaves its issues in_flight and is polled again
+  next cycle, since it may yet write them;
+- utils.routing_state records every issue, with the model revision that
+  predicted its team, so nothing is routed twice even if the search index
+  still shows it as unrouted, and issues that keep failing are moved to a
+  dead-letter queue after ROUTING_MAX_ATTEMPTS;
+- failed issues (including requeued dead letters) and in_flight ones left by
+  a crash are fetched by key every cycle, so they are retried after they
+  have left the window; one whose "Fixed By" is already set is only marked
+  routed, and one that was deleted or can no longer be read counts as a
+  failed attempt;
+- a cascade predictor's "Needs human triage" answer is recorded but never
+  written to Jira.
+
+Each cycle logs issues routed per minute and the routing lag (issue
+creation to confirmed write-back).
+
+Run from the repository root:
+    PYTHONPATH=src python -m server.routing_daemon run
+    PYTHONPATH=src python -m server.routing_daemon dlq            # list dead letters
+    PYTHONPATH=src python -m server.routing_daemon dlq --requeue  # retry them
+"""
+import argparse
+import functools
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+import requests
+from dotenv import load_dotenv
+
+from utils.jira_client import AdaptiveRateLimiter, JiraClient
+from utils.metrics import stage
+from utils.routing_state import RoutingState
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+JIRA_SERVER = os.getenv('JIRA_SERVER')
+JIRA_EMAIL = os.getenv('JIRA_EMAIL')
+JIRA_API_TOKEN = os.getenv('JIRA_API_TOKEN')
+JIRA_RATE_LIMIT = float(os.getenv("JIRA_RATE_LIMIT", "5"))
+JIRA_RATE_BURST = int(os.getenv("JIRA_RATE_BURST", "5"))
+
+ROUTER_PREDICTOR = os.getenv("ROUTER_PREDICTOR", "MBERT_base")
+POLL_INTERVAL_SECONDS = float(os.getenv("POLL_INTERVAL_SECONDS", "30"))
+POLL_WINDOW_MINUTES = int(os.getenv("POLL_WINDOW_MINUTES", "60"))
+MAX_ISSUES_PER_CYCLE = int(os.getenv("MAX_ISSUES_PER_CYCLE", "500"))
+BULK_TASK_TIMEOUT_SECONDS = float(os.getenv("BULK_TASK_TIMEOUT_SECONDS", "60"))
+
+FIXED_BY_FIELD = 'customfield_14600'
+SEARCH_PATH = '/rest/api/2/search'
+ISSUE_PATH = '/rest/api/2/issue/{key}'
+BULK_EDIT_PATH = '/rest/api/3/bulk/issues/fields'
+BULK_TASK_PATH = '/rest/api/3/bulk/queue/{task_id}'
+JIRA_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+PAGE_SIZE = 100
+
+
+def keys_jql(keys):
+    return f'key in ({", ".join(keys)})'
+
+
+def unrouted_jql(window_minutes):
+    # A relative date keeps the window independent of the Jira user's timezone.
+    return (f'issuetype in ("Bug", "Transient Bug") AND {FIXED_BY_FIELD} is EMPTY '
+            f'AND created >= -{window_minutes}m ORDER BY created ASC')
+
+
+class RoutingDaemon:
+    def __init__(self, client, predict_batch_fn, state, revision=None, window_minutes=POLL_WINDOW_MINUTES,
+                 max_issues=MAX_ISSUES_PER_CYCLE, use_bulk=True, triage_label=None,
+                 bulk_task_timeout=BULK_TASK_TIMEOUT_SECONDS):
+        self.client = client
+        self.predict_batch_fn = predict_batch_fn
+        self.state = state
+        self.revision = revision
+        self.window_minutes = window_minutes
+        self.max_issues = max_issues
+        self.use_bulk = use_bulk
+        self.triage_label = triage_label
+        self.bulk_task_timeout = bulk_task_timeout
+        self.started_at = time.time()
+        self._routed_times = deque()
+        self.totals = defaultdict(int)
+
+    # -- fetch ----------------------------------------------------------------
+
+    def _search(self, jql, limit, validate_query='strict'):
+        issues = []
+        while len(issues) < limit:
+            data = self.client.get_json(SEARCH_PATH, params={
+                'jql': jql,
+                'fields': f'summary,description,created,issuetype,{FIXED_BY_FIELD}',
+                'startAt': len(issues),
+                'maxResults': min(PAGE_SIZE, limit - len(issues)),
+                'validateQuery': validate_query,
+            })
+            page = data.get('issues', [])
+            issues.extend(page)
+            if not page or len(issues) >= data.get('total', 0):
+                break
+        return issues
+
+    def fetch_unrouted(self):
+        return self._search(unrouted_jql(self.window_minutes), self.max_issues)
+
+    def fetch_by_key(self, keys):
+        issues = []
+        for i in range(0, len(keys), PAGE_SIZE):
+            chunk = keys[i:i + PAGE_SIZE]
+            # Strict validation answers 400 for the whole query if any key was
+            # deleted or is no longer readable; with 'warn' Jira returns the
+            # others and the caller sees the missing keys as not found.
+            issues.extend(self._search(keys_jql(chunk), len(chunk), validate_query='warn'))
+        return issues
+
+    # -- write-back -----------------------------------------------------------
+
+    def _start_bulk_task(self, team, keys):
+        """Starts one bulk-edit task setting team on keys; returns its task id."""
+        task = self.client.post_json(BULK_EDIT_PATH, {
+            'selectedIssueIdsOrKeys': keys,
+            'selectedActions': [FIXED_BY_FIELD],
+            'editedFieldsInput': {
+                'singleSelectCustomFields': [{'fieldId': FIXED_BY_FIELD, 'option': {'value': team}}],
+            },
+            'sendBulkNotification': False,
+        })
+        return task['taskId']
+
+    def _bulk_task_errors(self, task_id, keys, timeout):
+        """
+        Polls a bulk-edit task for up to timeout seconds. Returns {key: error}
+        for the keys it failed on once it has finished, or None while it is
+        still running.
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.1
+        while True:
+            result = self.client.get_json(BULK_TASK_PATH.format(task_id=task_id))
+            if result.get('status') not in ('ENQUEUED', 'RUNNING'):
+                break
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+        if result.get('status') != 'COMPLETE':
+            return {key: f"bulk task {task_id} ended {result.get('status')}" for key in keys}
+        failed = result.get('failedAccessibleIssues', {})
+        processed = set(result.get('processedAccessibleIssues', []))
+        errors = {key: '; '.join(failed[key]) for key in keys if key in failed}
+        errors.update({key: 'not processed by bulk task' for key in keys if key not in processed and key not in failed})
+        return errors
+
+    def _set_team(self, key, team):
+        self.client.put_json(ISSUE_PATH.format(key=key), {'fields': {FIXED_BY_FIELD: {'value': team}}})
+
+    def _set_each(self, team, keys):
+        errors = {}
+        for key in keys:
+            try:
+                self._set_team(key, team)
+            except Exception as e:
+                errors[key] = str(e)
+        return errors
+
+    def write_back(self, team, keys):
+        """
+        Writes team to every key. Returns ({key: error} for the issues that
+        could not be updated, id of a bulk task still writing the others or
+        None). Issues of a running task must not be written again until it
+        has been polled to the end.
+        """
+        retry = keys
+        if self.use_bulk and len(keys) > 1:
+            try:
+                task_id = self._start_bulk_task(team, keys)
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code in (404, 405):
+                    logger.warning("Bulk edit API not available; falling back to per-issue updates")
+                    self.use_bulk = False
+                else:
+                    logger.error(f"Bulk edit for {team} failed: {e}; retrying issue by issue")
+            else:
+                try:
+                    errors = self._bulk_task_errors(task_id, keys, self.bulk_task_timeout)
+                except requests.RequestException as e:
+                    logger.warning(f"Polling bulk task {task_id} failed: {e}; polling again next cycle")
+                    return {}, task_id
+                if errors is None:
+                    logger.warning(f"Bulk task {task_id} for {team} still running; polling again next cycle")
+                    return {}, task_id
+                retry = list(errors)
+        return self._set_each(team, retry), None
+
+    def resume_bulk_tasks(self):
+        """Polls the bulk tasks earlier cycles left running and records the issues of those that finished."""
+        for task_id, (team, keys) in self.state.bulk_tasks().items():
+            try:
+                errors = self._bulk_task_errors(task_id, keys, timeout=0)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    logger.warning(f"Polling bulk task {task_id} failed: {e}; polling again next cycle")
+                    continue
+                # Expired: the issues are fetched by key next cycle, and the
+                # ones the task did write are then only marked routed.
+                errors = {key: f"bulk task {task_id} not found" for key in keys}
+            except requests.RequestException as e:
+                logger.warning(f"Polling bulk task {task_id} failed: {e}; polling again next cycle")
+                continue
+            else:
+                if errors is None:
+                    continue
+                errors = self._set_each(team, list(errors))
+            routed = [key for key in keys if key not in errors]
+            self.state.mark_done(routed)
+            dead = self.state.mark_failed(errors) if errors else []
+            self._routed_times.extend([time.time()] * len(routed))
+            self.totals['routed'] += len(routed)
+            self.totals['failed'] += len(errors)
+            self.totals['dead'] += len(dead)
+            logger.info(f"Bulk task {task_id} for {team} finished: routed {len(routed)}, failed {len(errors)}")
+
+    # -- one cycle ------------------------------------------------------------
+
+    def poll_once(self):
+        cycle_start = time.time()
+        self.resume_bulk_tasks()
+        with stage("router.fetch"):
+            issues = {issue['key']: issue for issue in self.fetch_unrouted()}
+            retry = [key for key in self.state.retry_keys(self.max_issues) if key not in issues]
+            retried = {issue['key']: issue for issue in self.fetch_by_key(retry)} if retry else {}
+        missing = {key: "issue not found" for key in retry if key not in retried}
+        if missing:
+            self.state.mark_failed(missing)
+        # Written by an earlier attempt (or by hand) after all.
+        already_set = [key for key, issue in retried.items() if issue['fields'].get(FIXED_BY_FIELD)]
+        self.state.mark_done(already_set)
+        issues.update((key, issue) for key, issue in retried.items() if key not in already_set)
+        keys = self.state.unprocessed(issues)
+        if not keys:
+            return {'fetched': len(issues), 'routed': 0, 'failed': 0, 'triage': 0, 'pending': 0}
+
+        created = {}
+        for key in keys:
+            try:
+                created[key] = datetime.strptime(issues[key]['fields']['created'], JIRA_TIMESTAMP_FORMAT).timestamp()
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        from utils.fetch_recent_issues import extract_description_text
+
+        summaries = [issues[key]['fields'].get('summary') or '' for key in keys]
+        descriptions = [extract_description_text(issues[key]['fields'].get('description')) for key in keys]
+        try:
+            with stage("router.predict"):
+                # Read first, so a failure to load the model fails the batch like a failed prediction.
+                revision = self.revision() if callable(self.revision) else self.revision
+                teams = self.predict_batch_fn(summaries, descriptions)
+        except Exception as e:
+            logger.exception(f"Prediction failed for {len(keys)} issues")
+            self.state.mark_failed({key: f"prediction failed: {e}" for key in keys}, created)
+            self.totals['failed'] += len(keys)
+            return {'fetched': len(issues), 'routed': 0, 'failed': len(keys), 'triage': 0, 'pending': 0}
+
+        predictions = dict(zip(keys, teams))
+        self.state.mark_in_flight(predictions, revision, created)
+        triage = [key for key, team in predictions.items() if team == self.triage_label]
+        self.state.mark_done(triage, status='triage')
+
+        by_team = defaultdict(list)
+        for key, team in predictions.items():
+            if team != self.triage_label:
+                by_team[team].append(key)
+        errors = {}
+        pending = []
+        for team, team_keys in by_team.items():
+            with stage("router.write"):
+                team_errors, task_id = self.write_back(team, team_keys)
+            errors.update(team_errors)
+            if task_id is not None:
+                self.state.mark_bulk_task(task_id, team_keys)
+                pending.extend(team_keys)
+            else:
+                self.state.mark_done([key for key in team_keys if key not in team_errors])
+        dead = self.state.mark_failed(errors, created) if errors else []
+
+        routed = len(keys) - len(triage) - len(errors) - len(pending)
+        now = time.time()
+        self._routed_times.extend([now] * routed)
+        self.totals['routed'] += routed
+        self.totals['failed'] += len(errors)
+        self.totals['triage'] += len(triage)
+        self.totals['dead'] += len(dead)
+        logger.info(
+            f"Routed {routed}, triage {len(triage)}, failed {len(errors)} ({len(dead)} dead-lettered), "
+            f"pending {len(pending)} "
+            f"of {len(keys)} new or retried issues in {now - cycle_start:.2f}s"
+        )
+        return {'fetched': len(issues), 'routed': routed, 'failed': len(errors), 'triage': len(triage),
+                'pending': len(pending)}
+
+    def stats(self):
+        """Routing throughput (issues per minute, over the last minute and since start) and lag percentiles."""
+        now = time.time()
+        while self._routed_times and self._routed_times[0] < now - 60:
+            self._routed_times.popleft()
+        lags = sorted(self.state.routing_lags(self.started_at))
+        uptime_minutes = max((now - self.started_at) / 60, 1 / 60)
+        return {
+            'routed_last_minute': len(self._routed_times),
+            'routed_per_minute': self.totals['routed'] / uptime_minutes,
+            'lag_p50_s': statistics.median(lags) if lags else None,
+            'lag_p95_s': lags[min(len(lags) - 1, int(len(lags) * 0.95))] if lags else None,
+            **self.totals,
+        }
+
+    def run(self, poll_interval=POLL_INTERVAL_SECONDS, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        logger.info(f"Routing daemon started: every {poll_interval}s, window {self.window_minutes}m")
+        while not stop_event.is_set():
+            cycle_start = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception:
+                logger.exception("Routing cycle failed; retrying next cycle")
+            stats = self.stats()
+            if stats['routed']:
+                logger.info(
+                    f"{stats['routed_per_minute']:.1f} issues/min, "
+                    f"lag p50 {stats['lag_p50_s'] or 0:.1f}s p95 {stats['lag_p95_s'] or 0:.1f}s"
+                )
+            stop_event.wait(max(0.0, poll_interval - (time.monotonic() - cycle_start)))
+
+
+def build_daemon(state_path=None, predictor=ROUTER_PREDICTOR, **kwargs):
+    from predictors.cascade import TRIAGE_LABEL
+    from predictors.registry import get_batch_predictor, predictor_revision
+
+    client = JiraClient(JIRA_SERVER, JIRA_EMAIL, JIRA_API_TOKEN, AdaptiveRateLimiter(JIRA_RATE_LIMIT, JIRA_RATE_BURST))
+    state = RoutingState(state_path) if state_path else RoutingState()
+    return RoutingDaemon(client, get_batch_predictor(predictor), state,
+                         revision=functools.partial(predictor_revision, predictor),
+                         triage_label=TRIAGE_LABEL, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-route new Jira bugs to teams")
+    parser.add_argument("command", choices=["run", "once", "dlq"])
+    parser.add_argument("--predictor", default=ROUTER_PREDICTOR)
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL_SECONDS)
+    parser.add_argument("--window-minutes", type=int, default=POLL_WINDOW_MINUTES)
+    parser.add_argument("--requeue", action="store_true", help="With dlq: retry every dead-lettered issue")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "dlq":
+        state = RoutingState()
+        if args.requeue:
+            print(f"Requeued {state.requeue_dead()} issues")
+        for key, team, attempts, error in state.dead_letters():
+            print(f"{key}\t{team or '-'}\t{attempts} attempts\t{error}")
+        return
+
+    daemon = build_daemon(predictor=args.predictor, window_minutes=args.window_minutes)
+    if args.command == "once":
+        print(daemon.poll_once())
+    else:
+        daemon.run(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Multi-process CPU execution of a registered predictor.
+
+The parent process loads the model once and then forks WORKER_PROCESSES
+workers. gc.freeze() before the fork keeps the garbage collector from
+writing to the parent's objects, so the weight tensors stay on pages shared
+copy-on-write by every worker instead of being copied N times. Each worker
+pins torch to WORKER_THREADS intra-op threads (and, where the OS allows, to
+its own slice of CPUs), so N x threads matches the cores instead of every
+process defaulting to all of them.
+
+OpenMP (libgomp) does not survive fork: a child that inherits a parent's
+OpenMP thread team and then asks for more than one thread hangs forever.
+Single-threaded workers are always safe to fork. Multi-threaded ones are
+forked only from a parent limited to one torch thread, which cannot have
+started a team, and are spawned otherwise. Entry points that only dispatch
+to the pool, such as the inference server with --workers, call
+single_thread_parent() before loading the model to keep the copy-on-write
+sharing.
+
+A dispatcher hands jobs to whichever worker is free through one shared task
+queue; large predict_teams calls are split into one shard per worker. Each
+worker records the job it is running in shared memory, so when one dies
+(OOM kill, segfault) the dispatcher fails that job's future with a
+WorkerError instead of leaving its caller waiting forever, and starts a
+replacement on the same CPU slice. After WORKER_MAX_RESTARTS replacements
+dead workers stay dead; once none is left every pending and later job fails
+the same way. Every result also carries the latency stages (utils.metrics)
+the worker recorded for the job, which the dispatcher merges into the
+parent's registry so its /metrics covers the forward passes too.
+
+    pool = WorkerPool("MBERT_base", processes=4, threads=2)
+    pool.predict_teams(summaries, descriptions)
+    pool.close()
+"""
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "2"))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "1"))
+# "fork" shares the parent's loaded weights; "spawn" makes every worker load its own copy.
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "fork")
+WORKER_PREDICTOR = os.getenv("WORKER_PREDICTOR", "MBERT_base")
+# How often the dispatcher checks that the workers are still alive.
+WORKER_CHECK_SECONDS = float(os.getenv("WORKER_CHECK_SECONDS", "1"))
+# Replacements started for dead workers over the life of a pool, so a worker that keeps crashing does not loop forever.
+WORKER_MAX_RESTARTS = int(os.getenv("WORKER_MAX_RESTARTS", "10"))
+
+
+class WorkerError(Exception):
+    """Raised in the caller when a worker failed to score its job or died running it."""
+
+
+def _cpu_slices(processes, threads):
+    """Disjoint CPU sets of `threads` cores per worker, or None when there are too few cores."""
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * processes
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < processes * threads:
+        return [None] * processes
+    return [set(cpus[i * threads:(i + 1) * threads]) for i in range(processes)]
+
+
+def _worker_main(predictor, threads, cpus, tasks, results, current):
+    import torch
+    from predictors.registry import get_batch_predictor
+
+    torch.set_num_threads(threads)
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    predict_fn = get_batch_predictor(predictor)
+    # A forked worker inherits the parent's stages (its warm-up among them); the parent already counts those.
+    metrics.drain()
+    while True:
+        job = tasks.get()
+        if job is None:
+            break
+        job_id, summaries, descriptions, kwargs = job
+        current.value = job_id
+        try:
+            teams, error = predict_fn(summaries, descriptions, **kwargs), None
+        except Exception as e:
+            teams, error = None, f"{type(e).__name__}: {e}"
+        results.put((job_id, teams, error, metrics.drain()))
+
+
+def single_thread_parent():
+    """
+    Limits this process to one torch thread. Call it before any torch work in
+    a process that will fork multi-threaded workers, so no OpenMP thread team
+    exists to be inherited.
+    """
+    import torch
+
+    torch.set_num_threads(1)
+
+
+class WorkerPool:
+    """N predictor worker processes behind a shared task queue."""
+
+    def __init__(self, predictor="MBERT_base", processes=WORKER_PROCESSES, threads=WORKER_THREADS,
+                 start_method=WORKER_START_METHOD, max_restarts=WORKER_MAX_RESTARTS):
+        import torch
+        from predictors.registry import get_batch_predictor
+
+        if start_method == "fork" and threads > 1 and torch.get_num_threads() > 1:
+            logger.warning(
+                f"This process may already run {torch.get_num_threads()} OpenMP threads, which forked "
+                f"workers with {threads} threads would deadlock on; starting them with spawn instead "
+                f"(call single_thread_parent() first to keep fork)"
+            )
+            start_method = "spawn"
+        self.predictor = predictor
+        self.processes = processes
+        self.threads = threads
+        self.start_method = start_method
+        self.restarts_left = max_restarts
+        self._context = context = multiprocessing.get_context(start_method)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._futures = {}
+        self._futures_lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._closing = False
+        self._dead = set()
+
+        if start_method == "fork":
+            # Load (and run once, so lazy state is built) before forking; the
+            # workers inherit it instead of loading their own copies.
+            get_batch_predictor(predictor)(["warm up"], ["warm up"])
+            gc.collect()
+        # Id of the job each worker took last; written by the worker, read here once it has died.
+        self._current = [context.Value("q", -1, lock=False) for _ in range(processes)]
+        self._cpus = _cpu_slices(processes, threads)
+        self.workers = self._start_workers(range(processes))
+        self._dispatcher = threading.Thread(target=self._collect_results, daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Started {processes} {predictor} workers x {threads} threads ({start_method})")
+
+    def _start_workers(self, slots):
+        """Starts one worker per slot, each with that slot's CPU slice and current-job value."""
+        if self.start_method == "fork":
+            gc.freeze()
+        workers = []
+        for slot in slots:
+            self._current[slot].value = -1
+            worker = self._context.Process(
+                target=_worker_main,
+                args=(self.predictor, self.threads, self._cpus[slot], self._tasks, self._results, self._current[slot]),
+                daemon=True,
+            )
+            worker.start()
+            workers.append(worker)
+        if self.start_method == "fork":
+            gc.unfreeze()
+        return workers
+
+    def _collect_results(self):
+        last_check = time.monotonic()
+        while True:
+            try:
+                job_id, teams, error, stages = self._results.get(timeout=WORKER_CHECK_SECONDS)
+            except queue.Empty:
+                pass
+            else:
+                if job_id is None:
+                    break
+                metrics.merge(stages)
+                with self._futures_lock:
+                    # Already failed if its worker was declared dead before the result was read.
+                    future = self._futures.pop(job_id, None)
+                if future is not None and error is None:
+                    future.set_result(teams)
+                elif future is not None:
+                    future.set_exception(WorkerError(error))
+            if time.monotonic() - last_check >= WORKER_CHECK_SECONDS:
+                self._check_workers()
+                last_check = time.monotonic()
+
+    def _fail(self, job_ids, message):
+        with self._futures_lock:
+            futures = [self._futures.pop(job_id, None) for job_id in job_ids]
+        for future in futures:
+            if future is not None:
+                future.set_exception(WorkerError(message))
+
+    def _check_workers(self):
+        """
+        Fails the job of every worker that has died since the last check and
+        replaces the worker while restarts are left; fails every job once no
+        worker is left.
+        """
+        if self._closing:
+            return
+        for slot, (worker, current) in enumerate(zip(self.workers, self._current)):
+            if worker.pid in self._dead or worker.is_alive():
+                continue
+            logger.error(f"Worker {worker.pid} died with exit code {worker.exitcode}")
+            self._fail([current.value], f"worker {worker.pid} died with exit code {worker.exitcode}")
+            if self.restarts_left > 0:
+                self.restarts_left -= 1
+                (self.workers[slot],) = self._start_workers([slot])
+                logger.info(f"Started worker {self.workers[slot].pid} in place of {worker.pid} "
+                            f"({self.restarts_left} restarts left)")
+            else:
+                self._dead.add(worker.pid)
+        if self._dead and len(self._dead) == len(self.workers):
+            with self._futures_lock:
+                pending = list(self._futures)
+            self._fail(pending, "no live workers left")
+
+    def submit(self, summaries, descriptions, **kwargs) -> Future:
+        """Queues one job for the next free worker; the future resolves to its labels."""
+        if len(self._dead) == len(self.workers):
+            raise WorkerError("no live workers left")
+        job_id = next(self._job_ids)
+        future = Future()
+        with self._futures_lock:
+            self._futures[job_id] = future
+        self._tasks.put((job_id, list(summaries), list(descriptions), kwargs))
+        return future
+
+    def predict_teams(self, summaries, descriptions, **kwargs) -> list:
+        """
+        predict_teams with the tickets split into one shard per worker (keyword
+        arguments such as batch_size go to every shard); labels come back in
+        input order.
+        """
+        summaries, descriptions = list(summaries), list(descriptions)
+        if not summaries:
+            return []
+        shard = -(-len(summaries) // self.processes)
+        futures = [
+            self.submit(summaries[start:start + shard], descriptions[start:start + shard], **kwargs)
+            for start in range(0, len(summaries), shard)
+        ]
+        return [team for future in futures for team in future.result()]
+
+    @property
+    def pids(self):
+        return [worker.pid for worker in self.workers]
+
+    def close(self):
+        self._closing = True
+        for _ in self.workers:
+            self._tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self._results.put((None, None, None, None))
+        self._dispatcher.join(timeout=10)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Process-wide pool of WORKER_PREDICTOR sized by WORKER_PROCESSES / WORKER_THREADS, started on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WorkerPool(WORKER_PREDICTOR)
+    return _pool
+
+
+def predict_teams(summaries, descriptions, **kwargs) -> list:
+    return get_worker_pool().predict_teams(summaries, descriptions, **kwargs)
+
+
+def model_revision() -> str:
+    """Revision the workers run: forked ones share the parent's model, so it is read here."""
+    from predictors.registry import predictor_revision
+
+    return predictor_revision(get_worker_pool().predictor)
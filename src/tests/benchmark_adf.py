@@ -0,0 +1,167 @@
+"""
+ADF description extraction and the parse worker pool.
+
+1. Extractor throughput on synthetic Atlassian Document Format documents:
+   the previous recursive text-node walker and its iterative rewrite (both
+   kept here as references) against the structure-preserving adf_to_text. "deep" nests lists --depth levels, where the recursive
+   walker overflows the interpreter stack; "large" is --paragraphs
+   paragraphs of marked-up text with lists, code blocks and mentions.
+2. full_sync against tests.mock_jira_server serving issues with large ADF
+   descriptions, parsing in the fetch threads (PARSE_WORKERS=0) and in
+   --workers parse processes. With spare cores the pool parses pages in
+   parallel; even on one core it takes JSON decoding and extraction off the
+   GIL shared by the fetch threads (and here by the mock server).
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_adf --depth 5000 --paragraphs 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from tests.mock_jira_server import MockJira, format_timestamp, make_issue
+from utils.adf_text import adf_to_text
+
+
+def extract_text_only_recursive(content):
+    """The extractor fetch_recent_issues used before utils.adf_text."""
+    texts = []
+    if isinstance(content, list):
+        for item in content:
+            texts.extend(extract_text_only_recursive(item))
+    elif isinstance(content, dict):
+        node_type = content.get('type')
+        if node_type == 'text':
+            texts.append(content.get('text', ''))
+        elif 'content' in content:
+            texts.extend(extract_text_only_recursive(content['content']))
+    return texts
+
+
+def iter_text_nodes(content):
+    """The same walk with an explicit stack: the text of every 'text' node, in document order."""
+    stack = [content]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            if node.get('type') == 'text':
+                yield node.get('text', '')
+            elif 'content' in node:
+                stack.append(node['content'])
+
+
+def text(value, *marks):
+    node = {"type": "text", "text": value}
+    if marks:
+        node["marks"] = [{"type": mark} for mark in marks]
+    return node
+
+
+def deep_document(depth):
+    node = {"type": "paragraph", "content": [text("innermost")]}
+    for level in range(depth):
+        node = {"type": "bulletList", "content": [{"type": "listItem", "content": [
+            {"type": "paragraph", "content": [text(f"level {level}")]}, node]}]}
+    return {"type": "doc", "version": 1, "content": [node]}
+
+
+def large_document(paragraphs):
+    content = []
+    for i in range(paragraphs):
+        if i % 10 == 9:
+            content.append({"type": "codeBlock", "attrs": {"language": "json"},
+                            "content": [text('{"status": 500, "error": "timeout"}')]})
+        elif i % 10 == 5:
+            content.append({"type": "orderedList", "content": [
+                {"type": "listItem", "content": [{"type": "paragraph", "content": [text(f"step {j}")]}]}
+                for j in range(3)]})
+        else:
+            content.append({"type": "paragraph", "content": [
+                text("Order "), text(f"#{i}", "strong"), text(" fails at checkout for "),
+                {"type": "mention", "attrs": {"id": f"u{i}", "text": "@Jane Doe"}},
+                text(" see "), {"type": "inlineCard", "attrs": {"url": f"https://example.com/{i}"}},
+                {"type": "hardBreak"}, text("payment service returned 502", "em", "code")]})
+    return {"type": "doc", "version": 1, "content": content}
+
+
+def count_nodes(document):
+    count, stack = 0, [document]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            count += 1
+            stack.extend(node.get("content") or [])
+    return count
+
+
+def time_extractor(fn, document, repeats):
+    try:
+        fn(document)
+    except RecursionError:
+        return None
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(document)
+    return (time.perf_counter() - start) / repeats
+
+
+def sync_seconds(fetcher, parse_workers, batch_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        fetcher.full_sync(os.path.join(tmp, 'issues.csv'), batch_size=batch_size, parse_workers=parse_workers)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=5000)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--issues", type=int, default=500, help="Issues served by the mock Jira; 0 skips the sync run")
+    parser.add_argument("--issue-paragraphs", type=int, default=200, help="ADF paragraphs per mock issue")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    extractors = [
+        ("recursive text nodes", lambda d: "\n".join(extract_text_only_recursive(d.get("content", [])))),
+        ("iter_text_nodes", lambda d: "\n".join(iter_text_nodes(d.get("content", [])))),
+        ("adf_to_text", adf_to_text),
+    ]
+    print(f"{'document':>18} {'extractor':>22} {'ms/doc':>9} {'nodes/s':>12}")
+    for name, document in [(f"deep ({args.depth})", deep_document(args.depth)),
+                           (f"large ({args.paragraphs})", large_document(args.paragraphs))]:
+        nodes = count_nodes(document)
+        for extractor_name, fn in extractors:
+            seconds = time_extractor(fn, document, args.repeats)
+            if seconds is None:
+                print(f"{name:>18} {extractor_name:>22} {'RecursionError':>22}")
+            else:
+                print(f"{name:>18} {extractor_name:>22} {seconds * 1e3:9.2f} {nodes / seconds:12,.0f}")
+
+    if args.issues:
+        description = large_document(args.issue_paragraphs)
+        created = format_timestamp(datetime.now(timezone.utc) - timedelta(days=1))
+        jira = MockJira(make_issue(f"ADF-{i}", f"Checkout fails {i}", description, "Mavericks", "Bug",
+                                   created, created) for i in range(args.issues))
+        # fetch_recent_issues reads its configuration at import time.
+        os.environ.update({'JIRA_SERVER': jira.start(), 'JIRA_EMAIL': 'bot@example.com', 'JIRA_API_TOKEN': 'token'})
+        from utils import fetch_recent_issues as fetcher
+        print(f"\nfull_sync of {args.issues} issues with {count_nodes(description)}-node ADF descriptions "
+              f"({os.cpu_count()} CPUs):")
+        try:
+            for workers in sorted({0, args.workers}):
+                seconds = sync_seconds(fetcher, workers, args.batch_size)
+                print(f"  PARSE_WORKERS={workers}: {seconds:6.2f}s, {args.issues / seconds:7.1f} issues/s")
+        finally:
+            jira.stop()
+
+
+if __name__ == "__main__":
+    main()
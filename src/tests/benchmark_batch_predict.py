@@ -0,0 +1,58 @@
+"""
+Compares per-ticket latency of predict_team (one forward pass per ticket)
+against predict_teams (length-bucketed batches) on src/data/issues.csv.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_batch_predict --limit 200
+"""
+import argparse
+import time
+
+from tests.eval_utils import load_sample_data
+from predictors.predictor_MBERT_base import predict_team, predict_teams
+
+
+def time_single(summaries, descriptions):
+    start = time.perf_counter()
+    predictions = [predict_team(s, d) for s, d in zip(summaries, descriptions)]
+    return predictions, time.perf_counter() - start
+
+
+def time_batched(summaries, descriptions, batch_size):
+    start = time.perf_counter()
+    predictions = predict_teams(summaries, descriptions, batch_size=batch_size)
+    return predictions, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N tickets")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data)
+    if args.limit:
+        df = df.head(args.limit)
+    summaries = df["Summary"].tolist()
+    descriptions = df["Description"].tolist()
+    n = len(summaries)
+
+    # Warm up so the first measured call does not pay for lazy initialisation.
+    predict_teams(summaries[:4], descriptions[:4])
+
+    single_predictions, single_elapsed = time_single(summaries, descriptions)
+    print(f"single   : {n} tickets in {single_elapsed:.2f}s ({single_elapsed / n * 1000:.2f} ms/ticket)")
+
+    for batch_size in args.batch_sizes:
+        batch_predictions, batch_elapsed = time_batched(summaries, descriptions, batch_size)
+        agreement = sum(a == b for a, b in zip(single_predictions, batch_predictions)) / n
+        print(
+            f"batch={batch_size:<3}: {n} tickets in {batch_elapsed:.2f}s "
+            f"({batch_elapsed / n * 1000:.2f} ms/ticket, {single_elapsed / batch_elapsed:.1f}x speedup, "
+            f"{agreement:.1%} agreement with single)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Throughput / accuracy trade-off of the cascade router's thresholds.
+
+Tickets from src/data/issues.csv are split by creation time. The MBERT_base
+softmax temperature is fitted on the older part, and on the newer part every
+(min_confidence, min_margin) pair from the grid is scored:
+
+    escalated   share of tickets sent past the first stage
+    first_acc   accuracy on the tickets the first stage answered itself
+    cascade_acc accuracy of the whole cascade (triage counts as wrong)
+    tickets/s   estimated from the measured per-ticket cost of each stage
+
+Both stages run once over all test tickets, so the sweep itself is free.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_cascade --escalate-to kNN
+    PYTHONPATH=src python -m tests.benchmark_cascade --save-calibration
+"""
+import argparse
+import time
+
+import torch
+
+from tests.eval_utils import load_sample_data, time_based_split
+from predictors import predictor_MBERT_base
+from predictors.cascade import TRIAGE_LABEL, needs_escalation
+from predictors.registry import PREDICTORS, get_batch_predictor
+from utils.calibration import expected_calibration_error, fit_temperature, save_temperature
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--escalate-to", default=None, choices=sorted(PREDICTORS),
+                        help="Second stage; uncertain tickets go to triage when omitted")
+    parser.add_argument("--confidences", type=float, nargs="+", default=[0.0, 0.3, 0.5, 0.6, 0.7, 0.8, 0.9])
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.0, 0.1, 0.2])
+    parser.add_argument("--save-calibration", action="store_true",
+                        help="Store the fitted temperature for the loaded model revision")
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data).dropna(subset=["Fixed By"])
+    train, test = time_based_split(df, args.test_fraction)
+    _, label_map, revision, _ = predictor_MBERT_base.load_backend()
+    label_index = {team: idx for idx, team in label_map.items()}
+
+    known = train[train["Fixed By"].isin(label_index)]
+    train_logits = predictor_MBERT_base.predict_logits(known["Summary"].fillna("").tolist(), known["Description"].tolist())
+    temperature = fit_temperature(train_logits, [label_index[team] for team in known["Fixed By"]])
+    if args.save_calibration:
+        save_temperature(predictor_MBERT_base.MODEL_NAME, revision, temperature)
+
+    summaries = test["Summary"].fillna("").tolist()
+    descriptions = test["Description"].tolist()
+    actual = test["Fixed By"].tolist()
+
+    start = time.perf_counter()
+    logits = predictor_MBERT_base.predict_logits(summaries, descriptions)
+    first_cost = (time.perf_counter() - start) / len(test)
+    correct = [label_map[idx] == team for idx, team in zip(logits.argmax(dim=-1).tolist(), actual)]
+    for name, t in (("uncalibrated", 1.0), (f"T={temperature:.2f}", temperature)):
+        confidence = torch.softmax(logits / t, dim=-1).max(dim=-1).values
+        print(f"ECE {name:<13} {expected_calibration_error(confidence, correct):.3f}")
+
+    probs = torch.softmax(logits / temperature, dim=-1)
+    top_probs, top_indices = probs.topk(min(3, probs.shape[-1]), dim=-1)
+    tops = [[(label_map[i], p) for i, p in zip(idx, ps)] for idx, ps in zip(top_indices.tolist(), top_probs.tolist())]
+
+    second, second_cost = [TRIAGE_LABEL] * len(test), 0.0
+    if args.escalate_to:
+        predict_fn = get_batch_predictor(args.escalate_to)
+        predict_fn(summaries[:1], descriptions[:1])
+        start = time.perf_counter()
+        second = predict_fn(summaries, descriptions)
+        second_cost = (time.perf_counter() - start) / len(test)
+
+    print(f"\n{len(test)} test tickets; first stage {first_cost * 1000:.1f} ms/ticket, "
+          f"{args.escalate_to or 'triage'} {second_cost * 1000:.1f} ms/ticket")
+    print(f"{'min_conf':>8} {'margin':>6} {'escalated':>9} {'first_acc':>9} {'cascade_acc':>11} {'tickets/s':>9}")
+    for min_confidence in args.confidences:
+        for min_margin in args.margins:
+            escalate = [needs_escalation(top, min_confidence, min_margin) for top in tops]
+            routed = [s if e else top[0][0] for top, s, e in zip(tops, second, escalate)]
+            answered = [c for c, e in zip(correct, escalate) if not e]
+            share = sum(escalate) / len(test)
+            first_acc = f"{sum(answered) / len(answered):.1%}" if answered else "-"
+            print(f"{min_confidence:>8.2f} {min_margin:>6.2f} {share:>9.1%} {first_acc:>9} "
+                  f"{sum(r == a for r, a in zip(routed, actual)) / len(test):>11.1%} "
+                  f"{1 / (first_cost + share * second_cost):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
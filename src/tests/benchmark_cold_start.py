@@ -0,0 +1,54 @@
+"""
+Measures cold-start cost of the MBERT_base predictor in a fresh interpreter:
+time to import the predictor module, time to the first prediction, and
+resident memory (current and peak) afterwards.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_cold_start --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, resource, time
+start = time.perf_counter()
+from predictors.predictor_MBERT_base import predict_team
+imported = time.perf_counter()
+predict_team("Page breaks after login", "Application error: client-side exception on checkout")
+predicted = time.perf_counter()
+with open("/proc/self/statm") as f:
+    rss_pages = int(f.read().split()[1])
+print(json.dumps({
+    "import_s": imported - start,
+    "first_prediction_s": predicted - start,
+    "rss_mb": rss_pages * resource.getpagesize() / 2**20,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def run_once():
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], env=dict(os.environ),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    for key in ("import_s", "first_prediction_s", "rss_mb", "peak_rss_mb"):
+        values = [run[key] for run in runs]
+        print(f"{key:<20} median={statistics.median(values):8.2f}  min={min(values):8.2f}  max={max(values):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
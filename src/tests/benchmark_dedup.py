@@ -0,0 +1,129 @@
+"""
+Near-duplicate short-circuit: how much inference it skips, how often the
+reused team is right, and how fast lookups stay as the index grows.
+
+1. Every labelled ticket in src/data/issues.csv is looked up against an
+   index of all the others (leave-one-out). For each Jaccard threshold the
+   table gives the share of tickets that would skip the model and the
+   precision of the duplicates' team against "Fixed By". Below the LSH
+   S-curve's knee (~0.7 for 16 bands of 8) matches are limited by which
+   pairs share a bucket, not by the threshold.
+2. The dedup router is compared with its fallback on a time-based split:
+   the index holds the older tickets only, and both route the newer ones.
+3. Lookup latency is measured on the real index and on indexes padded with
+   synthetic signatures to --scale sizes. Each synthetic row is a real
+   signature with half its values replaced, so it is a Jaccard ~0.5
+   neighbour that sometimes lands in the same LSH buckets.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_dedup --scale 10000 100000
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from tests.eval_utils import classification_report, load_sample_data, time_based_split
+from predictors import dedup
+from predictors.minhash_index import MinHashIndex, shingles
+from predictors.registry import PREDICTORS, get_batch_predictor
+
+
+def lookup_latencies_us(index, signatures, threshold):
+    latencies = []
+    for signature in signatures:
+        start = time.perf_counter()
+        index.query(signature, threshold)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    latencies.sort()
+    return statistics.median(latencies), latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9])
+    parser.add_argument("--fallback", default=dedup.FALLBACK, choices=sorted(PREDICTORS))
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--scale", type=int, nargs="*", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data).dropna(subset=["Fixed By"])
+    with tempfile.TemporaryDirectory() as directory:
+        index = MinHashIndex(directory)
+        start = time.perf_counter()
+        dedup.index_issues(df, index)
+        build_s = time.perf_counter() - start
+        print(f"indexed {len(index)} tickets in {build_s:.2f}s ({build_s / len(index) * 1e6:.0f} us/ticket)\n")
+
+        keys = df["Issue Key"].tolist()
+        actual = df["Fixed By"].tolist()
+        signatures = index.signatures[[index.row_of_key[key] for key in keys]]
+        print(f"{'threshold':>9} {'skipped':>8} {'precision':>9}")
+        for threshold in args.thresholds:
+            matched = correct = 0
+            for key, team, signature in zip(keys, actual, signatures):
+                matches = index.query(signature, threshold, exclude_key=key)
+                if not matches:
+                    continue
+                matched += 1
+                votes = {}
+                for row, similarity in matches[:dedup.MAX_DUPLICATES]:
+                    votes[index.team_of(row)] = votes.get(index.team_of(row), 0.0) + similarity
+                correct += max(votes, key=votes.get) == team
+            precision = f"{correct / matched:.1%}" if matched else "-"
+            print(f"{threshold:>9.2f} {matched / len(keys):>8.1%} {precision:>9}")
+
+        hashing = []
+        for summary, description in zip(df["Summary"].fillna(""), df["Description"]):
+            start = time.perf_counter()
+            index.hasher.signature(shingles(summary, description, index.shingle_size))
+            hashing.append((time.perf_counter() - start) * 1e6)
+        print(f"\nshingling + MinHash per ticket: p50 {statistics.median(hashing):.0f} us, "
+              f"max {max(hashing):.0f} us")
+        p50, p99 = lookup_latencies_us(index, signatures, dedup.THRESHOLD)
+        print(f"lookup on {len(index)} tickets: p50 {p50:.0f} us, p99 {p99:.0f} us")
+        rng = np.random.default_rng(0)
+        grown = len(index)
+        for size in sorted(args.scale):
+            extra = size - grown
+            if extra <= 0:
+                continue
+            base = signatures[rng.integers(0, len(signatures), extra)]
+            noise = rng.integers(0, 2 ** 32 - 1, base.shape, dtype=np.uint32)
+            synthetic = np.where(rng.random(base.shape) < 0.5, noise, base)
+            index.add([{"key": f"SYN-{grown + i}", "team": "synthetic"} for i in range(extra)], synthetic)
+            grown = size
+            p50, p99 = lookup_latencies_us(index, signatures, dedup.THRESHOLD)
+            print(f"lookup on {len(index)} tickets: p50 {p50:.0f} us, p99 {p99:.0f} us")
+
+    train, test = time_based_split(df, args.test_fraction)
+    summaries = test["Summary"].fillna("").tolist()
+    descriptions = test["Description"].tolist()
+    with tempfile.TemporaryDirectory() as directory:
+        index = MinHashIndex(directory)
+        dedup.index_issues(train, index)
+        fallback = get_batch_predictor(args.fallback)
+        fallback(summaries[:1], descriptions[:1])
+
+        start = time.perf_counter()
+        fallback_teams = fallback(summaries, descriptions)
+        fallback_s = time.perf_counter() - start
+        start = time.perf_counter()
+        results = dedup.route(summaries, descriptions, fallback=args.fallback, index=index)
+        dedup_s = time.perf_counter() - start
+
+    skipped = sum(result["stage"] == "duplicate" for result in results)
+    print(f"\nnewest {len(test)} tickets routed with an index of the {len(train)} older ones "
+          f"(threshold {dedup.THRESHOLD}):")
+    print(f"{args.fallback:>12}: {len(test) / fallback_s:7.1f} tickets/s, "
+          f"accuracy {classification_report(test['Fixed By'].tolist(), fallback_teams)['accuracy']:.1%}")
+    print(f"{'dedup':>12}: {len(test) / dedup_s:7.1f} tickets/s, "
+          f"accuracy {classification_report(test['Fixed By'].tolist(), [r['team'] for r in results])['accuracy']:.1%}, "
+          f"{skipped / len(test):.1%} skipped inference")
+
+
+if __name__ == "__main__":
+    main()
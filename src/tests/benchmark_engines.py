@@ -0,0 +1,72 @@
+"""
+Accuracy parity and speed of the MBERT_base inference backends.
+
+Every backend scores the same tickets from src/data/issues.csv; the report
+gives top-1 agreement with the eager PyTorch engine, accuracy against
+"Fixed By", single-ticket latency and batched throughput.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_engines --backends torch onnx onnx-int8
+"""
+import argparse
+import statistics
+import time
+
+from tests.eval_utils import load_sample_data
+from predictors.predictor_MBERT_base import BACKENDS, load_backend, predict_teams
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--latency-samples", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-agreement", type=float, default=None,
+                        help="Exit non-zero if any backend agrees with torch on fewer tickets than this")
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data)
+    if args.limit:
+        df = df.head(args.limit)
+    summaries = df["Summary"].tolist()
+    descriptions = df["Description"].tolist()
+    actual = df["Fixed By"].tolist()
+
+    reference = None
+    failed = False
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        load_start = time.perf_counter()
+        load_backend(backend)
+        load_s = time.perf_counter() - load_start
+
+        latencies = []
+        for summary, description in list(zip(summaries, descriptions))[:args.latency_samples]:
+            start = time.perf_counter()
+            predict_teams([summary], [description], backend=backend)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        predictions = predict_teams(summaries, descriptions, batch_size=args.batch_size, backend=backend)
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = predictions
+        agreement = sum(a == b for a, b in zip(predictions, reference)) / len(predictions)
+        accuracy = sum(a == b for a, b in zip(predictions, actual)) / len(predictions)
+        latencies.sort()
+        print(
+            f"{backend:<10} load={load_s:6.2f}s  agreement={agreement:7.2%}  accuracy={accuracy:7.2%}  "
+            f"p50={statistics.median(latencies) * 1000:7.1f}ms  p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f}ms  "
+            f"throughput={len(predictions) / elapsed:7.1f} tickets/s"
+        )
+        if args.min_agreement is not None and agreement < args.min_agreement:
+            failed = True
+
+    if failed:
+        raise SystemExit(f"agreement below {args.min_agreement:.2%}")
+
+
+if __name__ == "__main__":
+    main()
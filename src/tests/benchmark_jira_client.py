@@ -0,0 +1,98 @@
+"""
+Sustained pages/sec of the Jira fetcher against a rate-limited local mock.
+
+Runs fetch_recent_issues.full_sync twice against tests.mock_jira_server
+configured to allow --server-rate requests/s (429 + Retry-After beyond that):
+once with the original per-call requests.get fetcher (new TLS connection per
+page, 0.5-1.5 s sleep after every success, per-thread Retry-After handling)
+and once with the shared pooled client and adaptive limiter. Both outputs
+must contain the same rows.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_jira_client --issues 3000 --server-rate 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from tests.mock_jira_server import MockJira
+from tests.benchmark_sync_memory import synthetic_issues
+
+
+def make_legacy_fetch(fetcher):
+    """The fetch_issues_batch implementation this client replaced."""
+    import requests
+    from requests.auth import HTTPBasicAuth
+
+    def fetch_issues_batch(start_at, batch_size, jql=fetcher.JQL):
+        params = dict(fetcher.BASE_PARAMS, jql=jql, startAt=start_at, maxResults=batch_size)
+        for retry in range(fetcher.MAX_RETRIES):
+            response = requests.get(
+                f"{fetcher.JIRA_SERVER}{fetcher.SEARCH_PATH}",
+                headers={'Accept': 'application/json'},
+                params=params,
+                auth=HTTPBasicAuth(fetcher.JIRA_EMAIL, fetcher.JIRA_API_TOKEN)
+            )
+            if response.status_code == 429:
+                time.sleep(int(response.headers.get('Retry-After', fetcher.BASE_RETRY_DELAY * (2 ** retry))))
+                continue
+            response.raise_for_status()
+            data = response.json()
+            time.sleep(random.uniform(0.5, 1.5))
+            return data.get('issues', []), data.get('total', 0)
+        raise Exception(f"Failed to fetch batch at {start_at} after {fetcher.MAX_RETRIES} retries")
+
+    return fetch_issues_batch
+
+
+def run(fetcher, jira, output_file, batch_size):
+    jira.requests = jira.throttled = 0
+    start = time.perf_counter()
+    fetcher.full_sync(output_file, batch_size)
+    elapsed = time.perf_counter() - start
+    pages = -(-len(jira.issues) // batch_size)
+    return elapsed, pages / elapsed, jira.requests, jira.throttled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--issues', type=int, default=3000)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--server-rate', type=int, default=10, help="Requests/s the mock Jira allows")
+    parser.add_argument('--client-rate', type=float, default=None,
+                        help="Initial client rate (default: 2x the server rate, to exercise adaptation)")
+    args = parser.parse_args()
+
+    jira = MockJira(synthetic_issues(args.issues, 1), rate_limit=args.server_rate, retry_after=1)
+    os.environ.update({
+        'JIRA_SERVER': jira.start(), 'JIRA_EMAIL': 'bot@example.com', 'JIRA_API_TOKEN': 'token',
+        'JIRA_RATE_LIMIT': str(args.client_rate or 2 * args.server_rate),
+        'JIRA_RATE_BURST': str(args.server_rate),
+    })
+    from utils import fetch_recent_issues as fetcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pooled_file = os.path.join(tmp, 'pooled.csv')
+        legacy_file = os.path.join(tmp, 'legacy.csv')
+
+        pooled = run(fetcher, jira, pooled_file, args.batch_size)
+        pooled_fetch = fetcher.fetch_issues_batch
+        fetcher.fetch_issues_batch = make_legacy_fetch(fetcher)
+        try:
+            legacy = run(fetcher, jira, legacy_file, args.batch_size)
+        finally:
+            fetcher.fetch_issues_batch = pooled_fetch
+
+        same = fetcher.read_rows(pooled_file) == fetcher.read_rows(legacy_file)
+
+    for label, (elapsed, pages_per_s, requests_sent, throttled) in (('legacy', legacy), ('pooled+adaptive', pooled)):
+        print(f"{label:<16} {elapsed:7.2f}s  {pages_per_s:6.2f} pages/s  requests={requests_sent}  429s={throttled}")
+    print(f"final client rate: {fetcher.get_client().limiter.rate:.2f} req/s")
+    print(f"speedup: {legacy[0] / pooled[0]:.2f}x, identical output: {same}")
+    jira.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+kNN embedding router vs the fine-tuned MBERT_base classifier.
+
+Tickets from src/data/issues.csv are split by creation time; the kNN index is
+built from the older part only (in a scratch directory), and both predictors
+are scored on the newer part: accuracy against "Fixed By", single-ticket
+latency and batched throughput. The approximate (IVF) search is also compared
+with the exact one on recall of the exact top-k neighbours.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_knn
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from tests.eval_utils import classification_report, load_sample_data, time_based_split
+from predictors import predictor_kNN, vector_index
+from predictors.predictor_MBERT_base import predict_teams as predict_teams_mbert
+
+
+def measure(predict_fn, summaries, descriptions, actual, latency_samples, batch_size):
+    start = time.perf_counter()
+    predicted = predict_fn(summaries, descriptions, batch_size=batch_size)
+    throughput = len(summaries) / (time.perf_counter() - start)
+
+    latencies = []
+    for summary, description in list(zip(summaries, descriptions))[:latency_samples]:
+        start = time.perf_counter()
+        predict_fn([summary], [description])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "accuracy": classification_report(actual, predicted)["accuracy"],
+        "p50_ms": statistics.median(latencies),
+        "tickets_per_s": throughput,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--k", type=int, default=predictor_kNN.K_NEIGHBOURS)
+    parser.add_argument("--latency-samples", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    train, test = time_based_split(load_sample_data(args.data).dropna(subset=["Fixed By"]), args.test_fraction)
+    summaries = test["Summary"].fillna("").tolist()
+    descriptions = test["Description"].tolist()
+    actual = test["Fixed By"].tolist()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = predictor_kNN.open_index(directory, approximate=False)
+        start = time.perf_counter()
+        predictor_kNN.index_issues(train, args.batch_size, index)
+        print(f"Indexed {len(index)} training tickets in {time.perf_counter() - start:.1f}s; "
+              f"evaluating on {len(test)} newer tickets")
+
+        def predict_knn(summaries, descriptions, batch_size=args.batch_size):
+            return predictor_kNN.predict_teams(summaries, descriptions, batch_size, k=args.k, index=index)
+
+        predict_knn(summaries[:1], descriptions[:1])
+        predict_teams_mbert(summaries[:1], descriptions[:1])
+        for name, predict_fn in (("kNN", predict_knn), ("MBERT_base", predict_teams_mbert)):
+            result = measure(predict_fn, summaries, descriptions, actual, args.latency_samples, args.batch_size)
+            print(f"  {name:<12} accuracy={result['accuracy']:.2%} p50={result['p50_ms']:.1f}ms "
+                  f"{result['tickets_per_s']:.1f} tickets/s")
+
+        # Recall of approximate search, forced on regardless of corpus size.
+        queries = predictor_kNN.embed(summaries, descriptions, args.batch_size)
+        exact = index.search(queries, args.k)
+        approx_index = predictor_kNN.open_index(directory, approximate=True)
+        approx_index.nprobe = args.nprobe
+        min_rows, vector_index.MIN_APPROX_ROWS = vector_index.MIN_APPROX_ROWS, 0
+        try:
+            approx_index.search(queries[:1], args.k)  # builds the IVF lists
+            start = time.perf_counter()
+            approx = approx_index.search(queries, args.k)
+            approx_s = time.perf_counter() - start
+        finally:
+            vector_index.MIN_APPROX_ROWS = min_rows
+        start = time.perf_counter()
+        index.search(queries, args.k)
+        exact_s = time.perf_counter() - start
+        recall = np.mean([
+            len({row for row, _ in a} & {row for row, _ in e}) / max(1, len(e)) for a, e in zip(approx, exact)
+        ])
+        print(f"  search      exact={exact_s * 1000:.1f}ms approx={approx_s * 1000:.1f}ms "
+              f"(nprobe={args.nprobe}) recall@{args.k}={recall:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Latency and throughput of the Qwen label-scoring predictor.
+
+Compares three ways of routing the same tickets from src/data/issues.csv:
+
+    naive       one full forward pass per (ticket, team), no KV reuse
+    Qwen        shared-prefix KV cache + every team scored in one pass
+    MBERT_base  the fine-tuned classifier
+
+and checks that the fast path picks the same team as the naive one.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_qwen --limit 40
+"""
+import argparse
+import statistics
+import time
+
+import torch
+
+from tests.eval_utils import load_sample_data
+from predictors import predictor_Qwen
+from predictors.predictor_MBERT_base import predict_teams as predict_teams_mbert
+from preprocessors.preprocessor_Qwen import format_instruction_prefix, format_ticket_prompts
+
+
+def naive_predict(summaries, descriptions):
+    scorer = predictor_Qwen.get_scorer()
+    tokenizer, model = scorer.tokenizer, scorer.model
+    prefix_ids = tokenizer(format_instruction_prefix(scorer.teams), add_special_tokens=False)["input_ids"]
+    predictions = []
+    with torch.inference_mode():
+        for prompt in format_ticket_prompts(summaries, descriptions):
+            ticket_ids = tokenizer(
+                prompt, add_special_tokens=False, truncation=True, max_length=predictor_Qwen.MAX_TICKET_TOKENS
+            )["input_ids"]
+            context = prefix_ids + ticket_ids
+            scores = []
+            for label_ids in scorer.label_ids:
+                logits = model(input_ids=torch.tensor([context + label_ids], device=model.device)).logits[0]
+                log_probs = torch.log_softmax(logits.float(), dim=-1)
+                scores.append(sum(log_probs[len(context) + j - 1, t].item() for j, t in enumerate(label_ids)))
+            predictions.append(scorer.teams[max(range(len(scores)), key=scores.__getitem__)])
+    return predictions
+
+
+def measure(predict_fn, summaries, descriptions, latency_samples):
+    start = time.perf_counter()
+    predicted = predict_fn(summaries, descriptions)
+    throughput = len(summaries) / (time.perf_counter() - start)
+    latencies = []
+    for summary, description in list(zip(summaries, descriptions))[:latency_samples]:
+        start = time.perf_counter()
+        predict_fn([summary], [description])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return predicted, statistics.median(latencies), throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--limit", type=int, default=40)
+    parser.add_argument("--naive-limit", type=int, default=10, help="The naive baseline is slow; score fewer tickets")
+    parser.add_argument("--batch-size", type=int, default=predictor_Qwen.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--latency-samples", type=int, default=10)
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data).dropna(subset=["Fixed By"]).head(args.limit)
+    summaries = df["Summary"].fillna("").tolist()
+    descriptions = df["Description"].tolist()
+    actual = df["Fixed By"].tolist()
+
+    start = time.perf_counter()
+    scorer = predictor_Qwen.get_scorer()
+    print(f"Qwen ready in {time.perf_counter() - start:.1f}s: {len(scorer.teams)} teams, "
+          f"{scorer.prefix_length}-token shared prefix, {len(scorer.label_block)} label tokens per pass")
+    predict_teams_mbert(summaries[:1], descriptions[:1])
+
+    def predict_qwen(summaries, descriptions):
+        return predictor_Qwen.predict_teams(summaries, descriptions, batch_size=args.batch_size)
+
+    results = {}
+    for name, predict_fn, n in (
+        ("naive", naive_predict, args.naive_limit),
+        ("Qwen", predict_qwen, args.limit),
+        ("MBERT_base", predict_teams_mbert, args.limit),
+    ):
+        predicted, p50, throughput = measure(predict_fn, summaries[:n], descriptions[:n], min(n, args.latency_samples))
+        results[name] = predicted
+        accuracy = sum(p == a for p, a in zip(predicted, actual)) / len(predicted)
+        print(f"  {name:<11} accuracy={accuracy:.2%} p50={p50:.1f}ms {throughput:.2f} tickets/s ({n} tickets)")
+
+    agree = sum(a == b for a, b in zip(results["naive"], results["Qwen"]))
+    print(f"Qwen agrees with the naive scorer on {agree}/{len(results['naive'])} tickets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Cost of a live MBERT_base rollout under load.
+
+Client threads send batches of sample tickets through ModelRollout.predict_teams
+for the whole run, which has four phases:
+
+    baseline   only the live model
+    staging    the candidate loads and warms up in the background
+    shadow     --shadow-fraction of the live batches are also scored by it
+    promoted   after the swap
+
+For each phase the table gives calls, latency percentiles and failed calls.
+A rollout without downtime has no failures and no gap in calls. The
+warm-up line shows the load time and how much slower the first pass is than
+a warm one: that is the cost the first live requests would pay after a cold
+swap. The shadow line reports agreement with the live model and the batch
+latency of both.
+
+Without --candidate the live snapshot itself is staged again. --perturb
+adds Gaussian noise of that scale to a copy's classifier head, which gives a
+candidate that disagrees on some tickets.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_rollout --duration 60 --shadow-fraction 0.25 --perturb 0.05
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import torch
+
+from tests.eval_utils import load_sample_data
+from models.registry import MODEL_SPECS, get_version
+from predictors.predictor_MBERT_base import MODEL_NAME
+from server.model_rollout import ModelRollout
+
+
+def perturbed_copy(local_dir, scale, directory):
+    """A copy of the snapshot in local_dir whose classifier weights have noise of the given scale added."""
+    import transformers
+
+    shutil.copytree(local_dir, directory, dirs_exist_ok=True)
+    model = transformers.AutoModelForSequenceClassification.from_pretrained(directory, local_files_only=True)
+    generator = torch.Generator().manual_seed(0)
+    with torch.no_grad():
+        for name, parameter in model.named_parameters():
+            if name.startswith("classifier"):
+                parameter.add_(torch.randn(parameter.shape, generator=generator) * scale)
+    model.save_pretrained(directory, safe_serialization=True)
+    for name in ("pytorch_model.bin", ".registry_manifest.json"):
+        if os.path.exists(os.path.join(directory, name)):
+            os.remove(os.path.join(directory, name))
+    return directory
+
+
+def percentile_ms(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--candidate", help="Snapshot directory to roll out (default: the live one)")
+    parser.add_argument("--perturb", type=float, default=0.0)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of load, split over the phases")
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--shadow-fraction", type=float, default=0.25)
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data)
+    summaries = df["Summary"].fillna("").tolist()
+    descriptions = df["Description"].tolist()
+
+    start = time.perf_counter()
+    live = get_version(MODEL_NAME)
+    print(f"live {live['revision']} cold load: {time.perf_counter() - start:.2f}s")
+    rollout = ModelRollout(MODEL_NAME, shadow_fraction=args.shadow_fraction, seed=0)
+    rollout.predict_teams(summaries[:args.batch_size], descriptions[:args.batch_size])
+
+    phase = ["baseline"]
+    calls = {}
+    failures = {}
+    stop = threading.Event()
+
+    def client(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            rows = rng.sample(range(len(summaries)), args.batch_size)
+            current = phase[0]
+            start = time.perf_counter()
+            try:
+                rollout.predict_teams([summaries[i] for i in rows], [descriptions[i] for i in rows])
+            except Exception:
+                failures[current] = failures.get(current, 0) + 1
+                continue
+            calls.setdefault(current, []).append(time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        candidate_dir = args.candidate or MODEL_SPECS[MODEL_NAME]["local_dir"]
+        if args.perturb:
+            candidate_dir = perturbed_copy(candidate_dir, args.perturb, os.path.join(tmp, "candidate"))
+
+        clients = [threading.Thread(target=client, args=(seed,)) for seed in range(args.clients)]
+        for thread in clients:
+            thread.start()
+        time.sleep(args.duration / 4)
+
+        phase[0] = "staging"
+        rollout.stage(local_dir=candidate_dir)
+        if rollout.wait() != "ready":
+            stop.set()
+            raise SystemExit(f"staging failed: {rollout.error}")
+        phase[0] = "shadow"
+        time.sleep(args.duration / 2)
+
+        status = rollout.status()
+        start = time.perf_counter()
+        rollout.promote()
+        swap_us = (time.perf_counter() - start) * 1e6
+        phase[0] = "promoted"
+        time.sleep(args.duration / 4)
+        stop.set()
+        for thread in clients:
+            thread.join()
+
+    print(f"\n{'phase':>9} {'calls':>6} {'p50 ms':>8} {'p99 ms':>8} {'failed':>6}")
+    for name in ("baseline", "staging", "shadow", "promoted"):
+        latencies = calls.get(name, [])
+        if latencies:
+            print(f"{name:>9} {len(latencies):>6} {statistics.median(latencies) * 1000:8.1f} "
+                  f"{percentile_ms(latencies, 0.99):8.1f} {failures.get(name, 0):>6}")
+        else:
+            print(f"{name:>9} {0:>6} {'-':>8} {'-':>8} {failures.get(name, 0):>6}")
+
+    warmup = status["warmup"]
+    print(f"\nwarm-up of {status['candidate_revision']}: load {warmup['load_s']:.2f}s, "
+          f"first pass {warmup['first_pass_ms']:.0f} ms vs warm {warmup['warm_pass_ms']:.0f} ms "
+          f"over {warmup['tickets']} tickets, {warmup['total_s']:.2f}s in total")
+    shadow = status["shadow"]
+    if shadow["tickets"]:
+        print(f"shadow ({shadow['fraction']:.0%} of batches): {shadow['batches']} batches, "
+              f"{shadow['tickets']} tickets, agreement {shadow['agreement']:.1%}, "
+              f"{shadow['pending']} pending, {shadow['dropped']} dropped; mean batch live "
+              f"{shadow['live_batch_ms']['mean']:.1f} ms vs candidate {shadow['candidate_batch_ms']['mean']:.1f} ms")
+    print(f"swap: {swap_us:.0f} us; live revision now {rollout.status()['live_revision']}")
+
+
+if __name__ == "__main__":
+    main()
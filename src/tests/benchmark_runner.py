@@ -0,0 +1,202 @@
+"""
+Offline evaluation and performance benchmark for any registered predictor.
+
+Scores every ticket of src/data/issues.csv (or only the newest --test-fraction
+with --split time) and reports accuracy, per-team precision/recall/F1, a
+confusion matrix, single-ticket p50/p95/p99 latency, tickets/s for each
+batch size x torch thread count, and peak RSS. Results are written as JSON;
+pass a previous result as --baseline to flag regressions (non-zero exit).
+
+Predictors that answer from an index of past tickets (kNN, dedup) get a
+fresh index for the run, so no ticket is scored against itself. With
+--split time it holds only the older (training) tickets. With --split all
+it holds every ticket, and each ticket's own key is excluded from its
+lookup.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_runner --predictor MBERT_base \\
+        --split time --batch-sizes 1 8 32 --threads 1 4 --output bench.json
+    PYTHONPATH=src python -m tests.benchmark_runner --predictor MBERT_base-onnx-int8 \\
+        --baseline bench.json
+"""
+import argparse
+import functools
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import torch
+
+from predictors.registry import PREDICTORS, get_batch_predictor, get_index_builder, get_tokenized_predictor
+from tests.eval_utils import classification_report, load_sample_data, time_based_split
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure_latency(predict, inputs, samples):
+    latencies = []
+    for item in inputs[:samples]:
+        start = time.perf_counter()
+        predict([item])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "samples": len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+    }
+
+
+def measure_throughput(predict, inputs, batch_sizes, thread_counts):
+    default_threads = torch.get_num_threads()
+    results = []
+    try:
+        for threads in thread_counts:
+            torch.set_num_threads(threads)
+            for batch_size in batch_sizes:
+                start = time.perf_counter()
+                predict(inputs, batch_size=batch_size)
+                elapsed = time.perf_counter() - start
+                results.append({
+                    "threads": threads,
+                    "batch_size": batch_size,
+                    "tickets_per_s": len(inputs) / elapsed,
+                })
+                print(f"  threads={threads:<3} batch_size={batch_size:<4} {results[-1]['tickets_per_s']:8.1f} tickets/s")
+    finally:
+        torch.set_num_threads(default_threads)
+    return results
+
+
+def compare_to_baseline(result, baseline, max_accuracy_drop, max_slowdown):
+    """Returns a list of human-readable regressions of result against baseline."""
+    regressions = []
+    accuracy_drop = baseline["quality"]["accuracy"] - result["quality"]["accuracy"]
+    if accuracy_drop > max_accuracy_drop:
+        regressions.append(
+            f"accuracy {result['quality']['accuracy']:.2%} vs baseline {baseline['quality']['accuracy']:.2%}"
+        )
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        if result["latency"][key] > baseline["latency"][key] * (1 + max_slowdown):
+            regressions.append(f"{key} {result['latency'][key]:.1f} vs baseline {baseline['latency'][key]:.1f}")
+    baseline_throughput = {(r["threads"], r["batch_size"]): r["tickets_per_s"] for r in baseline["throughput"]}
+    for run in result["throughput"]:
+        previous = baseline_throughput.get((run["threads"], run["batch_size"]))
+        if previous and run["tickets_per_s"] < previous / (1 + max_slowdown):
+            regressions.append(
+                f"throughput threads={run['threads']} batch_size={run['batch_size']}: "
+                f"{run['tickets_per_s']:.1f} vs baseline {previous:.1f} tickets/s"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--predictor", default="MBERT_base", choices=sorted(PREDICTORS))
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--split", choices=["all", "time"], default="all")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--pretokenized", action="store_true",
+                        help="Stream tickets from the memory-mapped dataset cache instead of the CSV")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--threads", type=int, nargs="+", default=[torch.get_num_threads()])
+    parser.add_argument("--latency-samples", type=int, default=100)
+    parser.add_argument("--output", default=None, help="Write the JSON result here")
+    parser.add_argument("--baseline", default=None, help="Previous JSON result to compare against")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    parser.add_argument("--max-slowdown", type=float, default=0.15, help="Allowed relative latency/throughput loss")
+    args = parser.parse_args()
+    if args.pretokenized:
+        try:
+            load_dataset, predict_tokenized = get_tokenized_predictor(args.predictor)
+        except ValueError as e:
+            parser.error(f"--pretokenized: {e}")
+
+    load_start = time.perf_counter()
+    if args.pretokenized:
+        dataset = load_dataset(args.data)
+        indices = dataset.time_split(args.test_fraction)[1] if args.split == "time" else None
+        inputs = list(dataset.iter_input_ids(indices))
+        actual = dataset.actual_labels(indices)
+
+        def predict(items, **kwargs):
+            return predict_tokenized(items, **kwargs)
+    else:
+        df = train = load_sample_data(args.data).dropna(subset=["Fixed By"])
+        if args.split == "time":
+            train, df = time_based_split(df, args.test_fraction)
+        inputs = list(zip(df["Summary"].fillna("").tolist(), df["Description"].tolist(), df["Issue Key"].tolist()))
+        actual = df["Fixed By"].tolist()
+        predict_fn = get_batch_predictor(args.predictor)
+        try:
+            build_index = get_index_builder(args.predictor)
+        except ValueError:
+            build_index = None
+        if build_index is not None:
+            index_dir = tempfile.TemporaryDirectory()
+            predict_fn = functools.partial(predict_fn, index=build_index(train, index_dir.name))
+        exclude_own_key = build_index is not None and args.split == "all"
+
+        def predict(items, **kwargs):
+            if exclude_own_key:
+                kwargs["exclude_keys"] = [key for _, _, key in items]
+            return predict_fn([summary for summary, _, _ in items], [description for _, description, _ in items],
+                              **kwargs)
+    dataset_load_s = time.perf_counter() - load_start
+
+    load_start = time.perf_counter()
+    predict(inputs[:1])
+    load_s = time.perf_counter() - load_start
+
+    print(f"Evaluating {args.predictor} on {len(inputs)} tickets ({args.split} split, dataset ready in {dataset_load_s:.2f}s)")
+    predicted = predict(inputs)
+    quality = classification_report(actual, predicted)
+    print(f"  accuracy={quality['accuracy']:.2%} macro_f1={quality['macro_f1']:.3f}")
+
+    latency = measure_latency(predict, inputs, args.latency_samples)
+    print(f"  latency p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms p99={latency['p99_ms']:.1f}ms")
+    throughput = measure_throughput(predict, inputs, args.batch_sizes, args.threads)
+
+    result = {
+        "predictor": args.predictor,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "platform": {"python": platform.python_version(), "torch": torch.__version__, "machine": platform.machine()},
+        "dataset": {"path": args.data, "split": args.split, "tickets": len(inputs),
+                    "pretokenized": args.pretokenized, "load_s": dataset_load_s},
+        "first_call_s": load_s,
+        "quality": quality,
+        "latency": latency,
+        "throughput": throughput,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    print(f"  peak RSS={result['peak_rss_mb']:.0f} MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(result, baseline, args.max_accuracy_drop, args.max_slowdown)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
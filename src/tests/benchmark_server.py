@@ -0,0 +1,150 @@
+"""
+Local load generator for server.inference_server.
+
+Starts the server twice as a subprocess, once with --max-batch-size 1 (one
+forward pass per request) and once with micro-batching enabled, drives each
+with the same number of concurrent keep-alive clients and reports throughput,
+latency percentiles and rejected (503) requests.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_server --requests 500 --concurrency 32
+
+Pass --url to drive an already running server instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from tests.eval_utils import load_sample_data
+
+
+async def _post(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+         f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run_load(url, tickets, total_requests, concurrency):
+    parts = urlsplit(url)
+    latencies = []
+    statuses = {}
+    counter = iter(range(total_requests))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        try:
+            for i in counter:
+                summary, description = tickets[i % len(tickets)]
+                start = time.perf_counter()
+                status = await _post(reader, writer, parts.hostname, "/predict",
+                                     {"summary": summary, "description": description})
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total_requests,
+        "elapsed_s": elapsed,
+        "throughput_rps": statuses.get(200, 0) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "statuses": statuses,
+    }
+
+
+def wait_until_healthy(host, port, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            async def probe():
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                line = await reader.readline()
+                writer.close()
+                return line.startswith(b"HTTP/1.1 200")
+            if asyncio.run(probe()):
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"server on {host}:{port} did not become healthy in {timeout}s")
+
+
+def run_against_subprocess(port, tickets, args, max_batch_size):
+    cmd = [
+        sys.executable, "-m", "server.inference_server", "--port", str(port),
+        "--max-batch-size", str(max_batch_size), "--max-wait-ms", str(args.max_wait_ms),
+        "--max-queue-size", str(args.max_queue_size),
+    ]
+    process = subprocess.Popen(cmd, env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_healthy("127.0.0.1", port)
+        # Warm-up round so neither mode pays for first-call initialisation.
+        asyncio.run(run_load(f"http://127.0.0.1:{port}", tickets, args.concurrency, args.concurrency))
+        return asyncio.run(run_load(f"http://127.0.0.1:{port}", tickets, args.requests, args.concurrency))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def report(label, result):
+    print(
+        f"{label:<22} {result['throughput_rps']:8.1f} req/s  "
+        f"p50={result['p50_ms']:.1f}ms  p95={result['p95_ms']:.1f}ms  statuses={result['statuses']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Benchmark an already running server")
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--max-queue-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data)
+    tickets = list(zip(df["Summary"].fillna(""), df["Description"].fillna("")))
+
+    if args.url:
+        report(args.url, asyncio.run(run_load(args.url, tickets, args.requests, args.concurrency)))
+        return
+
+    unbatched = run_against_subprocess(args.port, tickets, args, max_batch_size=1)
+    report("one forward/request", unbatched)
+    batched = run_against_subprocess(args.port + 1, tickets, args, max_batch_size=args.max_batch_size)
+    report(f"micro-batched (<= {args.max_batch_size})", batched)
+    print(f"speedup: {batched['throughput_rps'] / unbatched['throughput_rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
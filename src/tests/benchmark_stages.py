@@ -0,0 +1,96 @@
+"""
+Where prediction time goes, stage by stage, and what measuring it costs.
+
+Runs the tickets from src/data/issues.csv through a registered predictor
+--repeats times with stage timing on and prints the per-stage table from
+utils.metrics (clean, format, tokenize, pad, forward, ...). It then reports
+the timing overhead three ways:
+- the cost of one stage() call with metrics on and off, and that cost times
+  the number of stage() calls per run as a share of the run time;
+- the end-to-end throughput with metrics off and on, alternated so drift
+  affects both equally;
+- the same run with the sampling profiler on, plus its hottest functions.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_stages --repeats 3 --prometheus --profile stages.folded
+"""
+import argparse
+import time
+
+from tests.eval_utils import load_sample_data
+from predictors.registry import PREDICTORS, get_batch_predictor
+from utils import metrics
+
+
+def stage_call_ns(calls=200_000):
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        with metrics.stage("benchmark.noop"):
+            pass
+    return (time.perf_counter_ns() - start) / calls
+
+
+def timed_run(predict_fn, summaries, descriptions, batch_size):
+    start = time.perf_counter()
+    predict_fn(summaries, descriptions, batch_size=batch_size)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--predictor", default="MBERT_base", choices=sorted(PREDICTORS))
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--limit", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--prometheus", action="store_true", help="Also print the Prometheus exposition")
+    parser.add_argument("--json", help="Write the stage snapshot to this file")
+    parser.add_argument("--profile", help="Write the profiled run's folded stacks to this file")
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data).head(args.limit)
+    summaries = df["Summary"].fillna("").tolist()
+    descriptions = df["Description"].tolist()
+    predict_fn = get_batch_predictor(args.predictor)
+    predict_fn(summaries[:args.batch_size], descriptions[:args.batch_size], batch_size=args.batch_size)
+
+    metrics.set_enabled(True)
+    metrics.registry.reset()
+    run_seconds = min(timed_run(predict_fn, summaries, descriptions, args.batch_size) for _ in range(args.repeats))
+    calls_per_run = sum(s["count"] for s in metrics.snapshot().values()) / args.repeats
+    print(f"{args.predictor}: {len(df)} tickets x {args.repeats} runs, batch size {args.batch_size}\n")
+    print(metrics.format_table())
+    if args.prometheus:
+        print()
+        print(metrics.render_prometheus(), end="")
+    if args.json:
+        metrics.dump_json(args.json)
+
+    on_ns = stage_call_ns()
+    metrics.set_enabled(False)
+    off_ns = stage_call_ns()
+    print(f"\nstage() call: {on_ns:.0f} ns enabled, {off_ns:.0f} ns disabled; "
+          f"{calls_per_run:.0f} calls per run = {calls_per_run * on_ns / 1e9 / run_seconds:.4%} of the run")
+
+    seconds = {False: [], True: []}
+    for _ in range(args.repeats):
+        for enabled in (False, True):
+            metrics.set_enabled(enabled)
+            seconds[enabled].append(timed_run(predict_fn, summaries, descriptions, args.batch_size))
+    off, on = min(seconds[False]), min(seconds[True])
+    print(f"metrics off: {len(df) / off:8.1f} tickets/s")
+    print(f"metrics on:  {len(df) / on:8.1f} tickets/s ({(on - off) / off:+.2%})")
+
+    profiler = metrics.SamplingProfiler().start()
+    profiled = min(timed_run(predict_fn, summaries, descriptions, args.batch_size) for _ in range(args.repeats))
+    profiler.stop()
+    print(f"profiler on: {len(df) / profiled:8.1f} tickets/s ({(profiled - on) / on:+.2%}), "
+          f"{profiler.samples} samples\n")
+    for function, samples, share in profiler.top(10):
+        print(f"{share:>7.1%} {samples:>6}  {function}")
+    if args.profile:
+        profiler.write_folded(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Peak Python heap of a full Jira crawl as the number of issues grows.
+
+Seeds tests.mock_jira_server with synthetic issues (about --description-kb
+of text each) and runs fetch_recent_issues.full_sync for every size, tracing
+allocations with tracemalloc. With the streaming sink the peak should stay
+roughly flat instead of growing with the issue count. Wall-clock times are
+inflated by tracemalloc and only meaningful relative to each other.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_sync_memory --sizes 1000 4000 8000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from tests.mock_jira_server import MockJira, make_issue
+
+
+def synthetic_issues(count, description_kb):
+    teams = ['Avengers', 'Titans', 'Supernovas', 'Falcons']
+    body = ('Steps to reproduce: open the app and tap checkout. ' * 64)[:description_kb * 1024]
+    stamp = '2030-01-01T10:00:00.000+0000'
+    return [
+        make_issue(f'SYN-{i}', f'Synthetic bug {i}', body, teams[i % len(teams)],
+                   'Bug' if i % 3 else 'Transient Bug', stamp, stamp)
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 4000, 8000])
+    parser.add_argument('--description-kb', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    jira = MockJira()
+    os.environ.update({'JIRA_SERVER': jira.start(), 'JIRA_EMAIL': 'bot@example.com', 'JIRA_API_TOKEN': 'token'})
+    from utils import fetch_recent_issues as fetcher
+
+    for size in args.sizes:
+        jira.issues = {issue['key']: issue for issue in synthetic_issues(size, args.description_kb)}
+        with tempfile.TemporaryDirectory() as tmp:
+            tracemalloc.start()
+            start = time.perf_counter()
+            written = fetcher.full_sync(os.path.join(tmp, 'issues.csv'), args.batch_size)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        print(f"{size:>7} issues: wrote {written} in {elapsed:6.1f}s, peak traced memory {peak / 2**20:7.1f} MB")
+    jira.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Parity check and throughput micro-benchmark for utils.text_cleaners.
+
+The parity check runs the original four-pass cleaner (kept below as
+reference_clean_description) and the current clean_description /
+clean_descriptions over every description in src/data/issues.csv and fails
+if any output differs by a single byte.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_text_cleaners --repeat 20 --n-jobs 4
+"""
+import argparse
+import re
+import sys
+import time
+
+import pandas as pd
+
+from tests.eval_utils import load_sample_data
+from utils.text_cleaners import clean_description, clean_descriptions
+
+
+def reference_clean_description(text):
+    """The cleaner as originally written, without logging."""
+    if pd.isna(text) or text is None:
+        return ""
+    text = str(text)
+    text = re.sub(r'\[https:\/\/.*?\|.*?\]', '[LINK]', text)
+    text = re.sub(r'\[.*?\|.*?\]', '[LINK]', text)
+    text = re.sub(r'!.*?!', '[FILE ATTACHMENT]', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+EDGE_CASES = [
+    None, float("nan"), "", "   ", 42,
+    "[a [https://x|y] tail |z]", "[https://drive|doc] and [text|url]",
+    "!img.png! text ! unmatched", "tabs\tand\nnewlines\r\n\x0b\x0c  end ",
+]
+
+
+def check_parity(descriptions):
+    mismatches = 0
+    for text in list(descriptions) + EDGE_CASES:
+        if clean_description(text).encode("utf-8") != reference_clean_description(text).encode("utf-8"):
+            mismatches += 1
+            print(f"MISMATCH for {text!r:.120}")
+    batch = clean_descriptions(pd.Series(descriptions))
+    reference = [reference_clean_description(text) for text in descriptions]
+    mismatches += sum(a != b for a, b in zip(batch.tolist(), reference))
+    return mismatches
+
+
+def throughput(fn, descriptions, repeat):
+    megabytes = sum(len(str(text).encode("utf-8")) for text in descriptions if isinstance(text, str)) * repeat / 2**20
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(descriptions)
+    return megabytes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--n-jobs", type=int, default=None, help="Also time the process pool path")
+    args = parser.parse_args()
+
+    descriptions = load_sample_data(args.data)["Description"].tolist()
+
+    mismatches = check_parity(descriptions)
+    print(f"parity: {len(descriptions) + len(EDGE_CASES)} descriptions, {mismatches} mismatches")
+
+    reference_mbps = throughput(lambda texts: [reference_clean_description(t) for t in texts], descriptions, args.repeat)
+    single_mbps = throughput(lambda texts: [clean_description(t) for t in texts], descriptions, args.repeat)
+    batch_mbps = throughput(clean_descriptions, descriptions, args.repeat)
+    print(f"reference (4x re.sub)   : {reference_mbps:8.2f} MB/s")
+    print(f"clean_description       : {single_mbps:8.2f} MB/s")
+    print(f"clean_descriptions      : {batch_mbps:8.2f} MB/s")
+    if args.n_jobs:
+        # Replicate the corpus so the pool has enough work to be worth starting.
+        corpus = descriptions * args.repeat
+        pool_mbps = throughput(lambda texts: clean_descriptions(texts, n_jobs=args.n_jobs), corpus, 1)
+        print(f"clean_descriptions x{args.n_jobs:<3}: {pool_mbps:8.2f} MB/s")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Processes x threads sweep for the multi-process worker pool.
+
+For every "PxT" configuration a WorkerPool of P forked workers with T torch
+threads each serves the tickets from src/data/issues.csv to --clients
+concurrent callers, each sending --request-size tickets per request. The
+report gives throughput, per-request latency and memory of the parent plus
+its workers: RSS counts shared pages once per process, PSS splits them
+between the processes sharing them, so the PSS total shows how much the
+copy-on-write weight sharing actually saves. "0xT" is the in-process
+baseline (no pool, torch with T threads). Pool configurations run before the
+baselines: a baseline starts OpenMP threads in this process, and workers
+with several threads each cannot be forked safely after that (see
+server.worker_pool), so they would be spawned without shared weights.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.benchmark_worker_pool --configs 0x8 1x8 2x4 4x2 8x1
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from tests.eval_utils import load_sample_data
+from predictors.registry import PREDICTORS, get_batch_predictor
+from server.worker_pool import WorkerPool, single_thread_parent
+
+
+def memory_mb(pids):
+    """(total RSS, total PSS) in MB over pids, from /proc/<pid>/smaps_rollup."""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except FileNotFoundError:
+            return None, None
+    return rss / 1024, pss / 1024
+
+
+def run_load(predict_fn, summaries, descriptions, clients, request_size):
+    requests = [
+        (summaries[start:start + request_size], descriptions[start:start + request_size])
+        for start in range(0, len(summaries), request_size)
+    ]
+
+    def timed(request):
+        start = time.perf_counter()
+        predict_fn(*request)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = sorted(executor.map(timed, requests))
+    elapsed = time.perf_counter() - start
+    return {
+        "tickets_per_s": len(summaries) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def main():
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--predictor", default="MBERT_base", choices=sorted(PREDICTORS))
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--limit", type=int, default=256)
+    parser.add_argument("--configs", nargs="+",
+                        default=[f"0x{cores}", f"1x{cores}", f"2x{max(1, cores // 2)}", f"{cores}x1"],
+                        help="processes x threads; 0 processes = in-process baseline")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--request-size", type=int, default=4)
+    args = parser.parse_args()
+
+    df = load_sample_data(args.data).head(args.limit)
+    summaries = df["Summary"].fillna("").tolist()
+    descriptions = df["Description"].tolist()
+    print(f"{len(df)} tickets, {args.clients} clients x {args.request_size} tickets/request, {cores} cores")
+    print(f"{'config':>7} {'tickets/s':>9} {'p50_ms':>8} {'p95_ms':>8} {'RSS_MB':>8} {'PSS_MB':>8}")
+
+    single_thread_parent()
+    configs = list(dict.fromkeys(args.configs))
+    for config in sorted(configs, key=lambda config: config.startswith("0x")):
+        processes, threads = (int(n) for n in config.split("x"))
+        if processes == 0:
+            torch.set_num_threads(threads)
+            predict_fn = get_batch_predictor(args.predictor)
+            predict_fn(summaries[:1], descriptions[:1])
+            pool, pids = None, [os.getpid()]
+        else:
+            pool = WorkerPool(args.predictor, processes, threads)
+            predict_fn = pool.predict_teams
+            pids = [os.getpid()] + pool.pids
+            # Every worker scores once so lazy per-process state is in the numbers.
+            for future in [pool.submit(summaries[:1], descriptions[:1]) for _ in range(processes * 2)]:
+                future.result()
+
+        result = run_load(predict_fn, summaries, descriptions, args.clients, args.request_size)
+        rss, pss = memory_mb(pids)
+        print(f"{config:>7} {result['tickets_per_s']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+              f"{(rss or 0):>8.0f} {(pss or 0):>8.0f}")
+        if pool is not None:
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+End-to-end check of the incremental Jira sync against tests.mock_jira_server.
+
+1. full crawl of the stand-in Jira into A (this also stores the watermark)
+2. simulate activity: re-route and edit issues, unassign some, file new ones
+3. incremental sync of A, then a fresh full crawl into B
+4. A and B must hold exactly the same rows per Issue Key
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.check_incremental_sync
+"""
+import os
+import sys
+import tempfile
+import time
+
+from tests.mock_jira_server import MockJira, make_issue
+
+
+def main():
+    jira = MockJira.from_csv()
+    base_url = jira.start()
+    # fetch_recent_issues reads its configuration at import time.
+    os.environ.update({'JIRA_SERVER': base_url, 'JIRA_EMAIL': 'bot@example.com', 'JIRA_API_TOKEN': 'token'})
+    from utils import fetch_recent_issues as fetcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        incremental_file = os.path.join(tmp, 'incremental.csv')
+        full_file = os.path.join(tmp, 'full.csv')
+
+        start = time.perf_counter()
+        fetcher.full_sync(incremental_file)
+        full_s = time.perf_counter() - start
+        requests_full = jira.requests
+
+        keys = sorted(jira.issues)
+        teams = sorted({issue['fields']['customfield_14600']['value'] for issue in jira.issues.values()})
+        for i, key in enumerate(keys[:10]):
+            jira.update_issue(key, fixed_by=teams[i % len(teams)], summary=f'Edited summary {i}')
+        for key in keys[10:12]:
+            jira.update_issue(key, fixed_by=None)
+        for i in range(5):
+            jira.add_issue(make_issue(
+                f'NEW-{i}', f'New bug {i}', f'Something "broke" {i}\nagain', teams[i], 'Bug', jira.now(), jira.now()
+            ))
+
+        start = time.perf_counter()
+        requests_before = jira.requests
+        fetcher.incremental_sync(incremental_file)
+        incremental_s = time.perf_counter() - start
+        requests_incremental = jira.requests - requests_before
+
+        fetcher.full_sync(full_file)
+
+        incremental_rows = fetcher.read_rows(incremental_file)
+        full_rows = fetcher.read_rows(full_file)
+
+    mismatched = sorted(
+        key for key in set(incremental_rows) | set(full_rows)
+        if incremental_rows.get(key) != full_rows.get(key)
+    )
+    print(f"full crawl:       {full_s:6.2f}s, {requests_full} requests")
+    print(f"incremental sync: {incremental_s:6.2f}s, {requests_incremental} requests")
+    print(f"rows: incremental={len(incremental_rows)} full={len(full_rows)} mismatched={len(mismatched)}")
+    jira.stop()
+    if mismatched:
+        print(f"MISMATCH: {mismatched[:20]}")
+        sys.exit(1)
+    print("OK: incremental sync matches a full crawl")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+End-to-end check of the auto-routing daemon against tests.mock_jira_server.
+
+1. seed the stand-in Jira with the dataset (already routed) plus --new
+   unrouted bugs filed in the last few minutes, two of which reject writes
+2. run routing cycles, filing more bugs between them, clearing the team
+   on some routed issues to mimic a search index that lags behind writes
+   and deleting one of the rejecting bugs while it is waiting to be retried
+3. let one dead-lettered bug start accepting writes and move it out of the
+   poll window, requeue it and run one more cycle
+4. every writable new issue (including the requeued one) must have been
+   written exactly once, the other rejecting one must end up in the
+   dead-letter queue as not found, and nothing routed before the daemon
+   started may have been touched
+
+Runs against the bulk edit API, against it with a zero bulk task timeout
+(every task is still running when first polled, so it must be polled again
+next cycle instead of its issues being rewritten) and against a Jira
+without it (per-issue PUT fallback), then reports issues routed per minute
+and the routing lag.
+
+Run from the repository root:
+    PYTHONPATH=src python -m tests.check_routing_daemon
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from predictors.cascade import TRIAGE_LABEL
+from predictors.registry import PREDICTORS, get_batch_predictor
+from server.routing_daemon import RoutingDaemon
+from tests.mock_jira_server import MockJira, format_timestamp, make_issue
+from utils.jira_client import AdaptiveRateLimiter, JiraClient
+from utils.routing_state import RoutingState
+
+
+def new_issues(jira, prefix, count):
+    templates = list(jira.issues.values())
+    issues = []
+    for i in range(count):
+        fields = templates[i % len(templates)]['fields']
+        issues.append(make_issue(
+            f'{prefix}-{i}', fields['summary'], fields['description'], None, 'Bug', jira.now(), jira.now()
+        ))
+    return issues
+
+
+def run_scenario(predict_fn, bulk_api, args, bulk_task_timeout=60.0):
+    jira = MockJira.from_csv(args.data, fail_keys={'NEW-0', 'NEW-1'}, bulk_api=bulk_api)
+    rejecting, requeued, deleted = set(jira.fail_keys), 'NEW-1', 'NEW-0'
+    preexisting = set(jira.issues)
+    first = new_issues(jira, 'NEW', args.new)
+    later = new_issues(jira, 'LATER', args.new // 2)
+    for issue in first:
+        jira.add_issue(issue)
+    client = JiraClient(jira.start(), 'bot@example.com', 'token', AdaptiveRateLimiter(50, 50))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = RoutingState(os.path.join(tmp, 'state.sqlite3'), max_attempts=3)
+        daemon = RoutingDaemon(client, predict_fn, state, revision=args.predictor, window_minutes=30,
+                               triage_label=TRIAGE_LABEL, bulk_task_timeout=bulk_task_timeout)
+        start = time.perf_counter()
+        daemon.poll_once()
+        for issue in later:
+            jira.add_issue(issue)
+        # Fetched by key together with the other retries from now on.
+        jira.delete_issue(deleted)
+        # A stale search index returns already-routed issues as unrouted.
+        for key in [issue['key'] for issue in first[2:7]]:
+            with jira.lock:
+                jira.issues[key]['fields']['customfield_14600'] = None
+        for _ in range(3):
+            daemon.poll_once()
+        dead_before_requeue = {key for key, *_ in state.dead_letters()}
+        # Fixed in Jira, then requeued once it is older than the poll window.
+        jira.fail_keys.discard(requeued)
+        jira.update_issue(requeued, created=format_timestamp(datetime.now(timezone.utc) - timedelta(hours=2)))
+        state.requeue_dead([requeued])
+        daemon.poll_once()
+        for _ in range(3):
+            if not state.bulk_tasks():
+                break
+            daemon.poll_once()
+        elapsed = time.perf_counter() - start
+        stats = daemon.stats()
+        dead = {key: error for key, _, _, error in state.dead_letters()}
+        counts = state.counts()
+        state.close()
+    jira.stop()
+    client.close()
+
+    expected = {issue['key'] for issue in first + later} - jira.fail_keys
+    triaged = counts.get('triage', 0)
+    problems = []
+    written_twice = sorted(key for key, n in jira.writes.items() if n > 1)
+    if written_twice:
+        problems.append(f"written more than once: {written_twice}")
+    touched = sorted(set(jira.writes) & preexisting)
+    if touched:
+        problems.append(f"pre-existing issues written: {touched}")
+    if len(set(jira.writes) & expected) + triaged != len(expected):
+        problems.append(f"{len(expected) - len(jira.writes) - triaged} new issues never routed")
+    if dead_before_requeue != rejecting:
+        problems.append(f"dead letters {sorted(dead_before_requeue)} != {sorted(rejecting)}")
+    if jira.writes.get(requeued) != 1:
+        problems.append(f"requeued {requeued} written {jira.writes.get(requeued, 0)} times")
+    if set(dead) != jira.fail_keys:
+        problems.append(f"dead letters after requeue {sorted(dead)} != {sorted(jira.fail_keys)}")
+    if dead.get(deleted) != "issue not found":
+        problems.append(f"deleted {deleted} dead-lettered with {dead.get(deleted)!r}")
+
+    label = ("bulk edit" if bulk_task_timeout else "slow bulk edit") if bulk_api else "per-issue PUT"
+    print(f"{label:>14}: {stats['routed']} routed, {triaged} triage, {len(dead)} dead-lettered in {elapsed:.2f}s "
+          f"({stats['routed'] / elapsed * 60:.0f}/min), {jira.requests} requests ({jira.bulk_requests} bulk), "
+          f"lag p50 {stats['lag_p50_s']:.2f}s p95 {stats['lag_p95_s']:.2f}s")
+    for problem in problems:
+        print(f"  FAIL: {problem}")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--predictor", default="MBERT_base", choices=sorted(PREDICTORS))
+    parser.add_argument("--data", default="src/data/issues.csv")
+    parser.add_argument("--new", type=int, default=60, help="Unrouted bugs filed before the first cycle")
+    args = parser.parse_args()
+
+    predict_fn = get_batch_predictor(args.predictor)
+    ok = all([run_scenario(predict_fn, bulk_api, args, timeout)
+              for bulk_api, timeout in ((True, 60.0), (True, 0.0), (False, 60.0))])
+    if not ok:
+        sys.exit(1)
+    print("OK: every new issue routed once, failures dead-lettered, requeued issue routed, deleted issue not found")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,3 +19,62 @@ def evaluate_prediction(sample_row, predict_fn):
         "actual": actual_team,
         "is_correct": predicted_team == actual_team
     }
+
+def evaluate_predictions(samples, predict_batch_fn):
+    """
+    Batched counterpart of evaluate_prediction: runs predict_batch_fn once over
+    every row of the samples DataFrame and returns one result dict per row.
+    """
+    summaries = samples["Summary"].tolist()
+    descriptions = samples["Description"].tolist()
+    actual_teams = samples["Fixed By"].tolist()
+    predicted_teams = predict_batch_fn(summaries, descriptions)
+    return [
+        {
+            "summary": summary,
+            "description": description,
+            "predicted": predicted_team,
+            "actual": actual_team,
+            "is_correct": predicted_team == actual_team
+        }
+        for summary, description, predicted_team, actual_team
+        in zip(summaries, descriptions, predicted_teams, actual_teams)
+    ]
+
+def time_based_split(df, test_fraction=0.2, time_column="Created"):
+    """
+    Splits df into (train, test) by creation time: the newest test_fraction of
+    tickets form the test set, mimicking routing tickets filed after training.
+    """
+    ordered = df.assign(_ts=pd.to_datetime(df[time_column], utc=True, format="ISO8601")).sort_values("_ts")
+    cutoff = int(len(ordered) * (1 - test_fraction))
+    ordered = ordered.drop(columns="_ts")
+    return ordered.iloc[:cutoff], ordered.iloc[cutoff:]
+
+def classification_report(actual, predicted):
+    """
+    Accuracy, per-team precision/recall/F1/support and a confusion matrix
+    (confusion[actual][predicted] = count) for two equal-length label lists.
+    """
+    labels = sorted(set(actual) | set(predicted), key=str)
+    confusion = {a: {p: 0 for p in labels} for a in labels}
+    for a, p in zip(actual, predicted):
+        confusion[a][p] += 1
+
+    per_team = {}
+    for label in labels:
+        true_positive = confusion[label][label]
+        predicted_total = sum(confusion[a][label] for a in labels)
+        support = sum(confusion[label].values())
+        precision = true_positive / predicted_total if predicted_total else 0.0
+        recall = true_positive / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_team[label] = {"precision": precision, "recall": recall, "f1": f1, "support": support}
+
+    scored = [m for m in per_team.values() if m["support"]]
+    return {
+        "accuracy": sum(a == p for a, p in zip(actual, predicted)) / len(actual) if actual else 0.0,
+        "macro_f1": sum(m["f1"] for m in scored) / len(scored) if scored else 0.0,
+        "per_team": per_team,
+        "confusion_matrix": confusion,
+    }
@@ -0,0 +1,361 @@
+"""
+Local stand-in for the parts of the Jira REST API used by this repo.
+
+Serves GET /rest/api/2/search with the JQL subset our fetchers emit
+(key in (...), issuetype in (...), created/updated >= "<date>" or -<n>m/h/d/w,
+customfield_N is EMPTY, ORDER BY), paginated with startAt/maxResults.
+Like Jira, a key in (...) naming an issue that does not exist is answered
+with 400 unless validateQuery=warn (or none) is sent, in which case the
+other issues are returned with a warning.
+Issues are seeded from src/data/issues.csv with their timestamps shifted so
+the newest one is "now", and can be edited or added while the server runs to
+simulate activity in Jira.
+
+Field writes go through PUT /rest/api/2/issue/{key} or the Jira Cloud bulk
+edit API (POST /rest/api/3/bulk/issues/fields, then polling
+GET /rest/api/3/bulk/queue/{taskId}). Every successful write is counted per
+issue, and writes to the keys in fail_keys are rejected, so callers can check
+idempotency and failure handling.
+
+Optionally enforces a global request rate, answering 429 with Retry-After
+like Jira Cloud does when a client exceeds it.
+"""
+import csv
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+JIRA_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+RELATIVE_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+ISSUE_PATH = re.compile(r'^/rest/api/2/issue/([^/]+)$')
+BULK_TASK_PATH = re.compile(r'^/rest/api/3/bulk/queue/([^/]+)$')
+
+CLAUSE_KEY = re.compile(r'\bkey\s+in\s*\(([^)]*)\)', re.IGNORECASE)
+CLAUSE_ISSUETYPE = re.compile(r'issuetype\s+in\s*\(([^)]*)\)', re.IGNORECASE)
+CLAUSE_DATE = re.compile(r'(created|updated)\s*>=\s*"([^"]+)"', re.IGNORECASE)
+CLAUSE_RELATIVE_DATE = re.compile(r'(created|updated)\s*>=\s*-(\d+)([mhdw])\b', re.IGNORECASE)
+CLAUSE_EMPTY = re.compile(r'(customfield_\d+)\s+is\s+EMPTY', re.IGNORECASE)
+CLAUSE_ORDER = re.compile(r'ORDER\s+BY\s+(\w+)\s*(ASC|DESC)?', re.IGNORECASE)
+
+
+def format_timestamp(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.') + f'{value.microsecond // 1000:03d}' + value.strftime('%z')
+
+
+def parse_timestamp(value):
+    return datetime.strptime(value, JIRA_TIMESTAMP_FORMAT)
+
+
+def parse_jql_date(value):
+    for fmt in ('%Y-%m-%d %H:%M', '%Y/%m/%d %H:%M', '%Y-%m-%d', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    raise ValueError(f"Unsupported JQL date {value!r}")
+
+
+def make_issue(key, summary, description, fixed_by, issue_type, created, updated,
+               reporter='Reporter', assignee='Assignee', status='Open'):
+    return {
+        'key': key,
+        'fields': {
+            'summary': summary,
+            'description': description,
+            'reporter': {'displayName': reporter},
+            'assignee': {'displayName': assignee},
+            'status': {'name': status},
+            'created': created,
+            'updated': updated,
+            'customfield_14600': {'value': fixed_by} if fixed_by else None,
+            'issuetype': {'name': issue_type},
+        },
+    }
+
+
+class MockJira:
+    """Issue store plus a threaded HTTP server speaking the search API."""
+
+    def __init__(self, issues=(), rate_limit=None, retry_after=1, bulk_api=True, fail_keys=()):
+        self.issues = {issue['key']: issue for issue in issues}
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.bulk_api = bulk_api
+        self.fail_keys = set(fail_keys)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.writes = {}
+        self.bulk_requests = 0
+        self._tasks = {}
+        self._task_ids = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._server = None
+
+    @classmethod
+    def from_csv(cls, path='src/data/issues.csv', **kwargs):
+        """Seeds issues from a dataset written by fetch_recent_issues, rebased to now."""
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        newest = max(parse_timestamp(row['Created']) for row in rows)
+        shift = datetime.now(timezone.utc) - newest
+        issues = [
+            make_issue(
+                # The fetcher doubles quotes before csv escapes them again.
+                row['Issue Key'], row['Summary'].replace('""', '"'), row['Description'].replace('""', '"'),
+                row['Fixed By'], row['Issue Type'],
+                format_timestamp(parse_timestamp(row['Created']) + shift),
+                format_timestamp(parse_timestamp(row['Updated']) + shift),
+                row['Reporter'], row['Assignee'], row['Status'],
+            )
+            for row in rows
+        ]
+        return cls(issues, **kwargs)
+
+    # -- simulated Jira activity -------------------------------------------
+
+    def now(self):
+        return format_timestamp(datetime.now(timezone.utc))
+
+    def update_issue(self, key, **fields):
+        """Edits an issue's fields and bumps its 'updated' timestamp."""
+        with self.lock:
+            issue = self.issues[key]
+            if 'fixed_by' in fields:
+                value = fields.pop('fixed_by')
+                issue['fields']['customfield_14600'] = {'value': value} if value else None
+            issue['fields'].update(fields)
+            issue['fields']['updated'] = self.now()
+
+    def add_issue(self, issue):
+        with self.lock:
+            self.issues[issue['key']] = issue
+
+    def delete_issue(self, key):
+        with self.lock:
+            del self.issues[key]
+
+    # -- writes ---------------------------------------------------------------
+
+    def _write_field(self, key, field, value):
+        """Sets one field under self.lock; returns an error message or None."""
+        if key not in self.issues:
+            return f'Issue {key} does not exist'
+        if key in self.fail_keys:
+            return f'Field {field} cannot be set on {key}'
+        fields = self.issues[key]['fields']
+        fields[field] = value
+        fields['updated'] = self.now()
+        self.writes[key] = self.writes.get(key, 0) + 1
+        return None
+
+    def edit_issue(self, key, fields):
+        with self.lock:
+            for field, value in fields.items():
+                error = self._write_field(key, field, value)
+                if error:
+                    return error
+        return None
+
+    def bulk_edit(self, payload):
+        """Applies a bulk field edit and queues a task whose first poll reports RUNNING."""
+        fields = payload.get('editedFieldsInput', {}).get('singleSelectCustomFields', [])
+        with self.lock:
+            self.bulk_requests += 1
+            failed, processed = {}, []
+            for key in payload.get('selectedIssueIdsOrKeys', []):
+                for field in fields:
+                    error = self._write_field(key, field['fieldId'], {'value': field['option']['value']})
+                    if error:
+                        failed[key] = [error]
+                        break
+                else:
+                    processed.append(key)
+            self._task_ids += 1
+            task_id = str(self._task_ids)
+            self._tasks[task_id] = {'taskId': task_id, 'status': 'RUNNING', 'progressPercent': 50,
+                                    'processedAccessibleIssues': processed, 'failedAccessibleIssues': failed}
+        return {'taskId': task_id}
+
+    def bulk_task(self, task_id):
+        with self.lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            result = dict(task)
+            task.update(status='COMPLETE', progressPercent=100)
+        if result['status'] == 'RUNNING':
+            result = {key: result[key] for key in ('taskId', 'status', 'progressPercent')}
+        return result
+
+    # -- search ---------------------------------------------------------------
+
+    def search(self, jql, start_at, max_results, validate_query='strict'):
+        """Returns (status, payload)."""
+        keys = None
+        match = CLAUSE_KEY.search(jql)
+        if match:
+            keys = {key.strip().strip('"') for key in match.group(1).split(',')}
+        issue_types = None
+        match = CLAUSE_ISSUETYPE.search(jql)
+        if match:
+            issue_types = {name.strip().strip('"') for name in match.group(1).split(',')}
+        date_filters = [(field.lower(), parse_jql_date(value)) for field, value in CLAUSE_DATE.findall(jql)]
+        now = datetime.now(timezone.utc)
+        date_filters += [
+            (field.lower(), now - timedelta(**{RELATIVE_UNITS[unit.lower()]: int(amount)}))
+            for field, amount, unit in CLAUSE_RELATIVE_DATE.findall(jql)
+        ]
+        empty_fields = CLAUSE_EMPTY.findall(jql)
+
+        with self.lock:
+            unknown = sorted(keys - set(self.issues)) if keys else []
+            messages = [f"An issue with key '{key}' does not exist for field 'key'." for key in unknown]
+            if messages and validate_query not in ('warn', 'none', 'false'):
+                return 400, {'errorMessages': messages, 'warningMessages': []}
+            matches = []
+            for issue in self.issues.values():
+                fields = issue['fields']
+                if keys is not None and issue['key'] not in keys:
+                    continue
+                if issue_types and fields['issuetype']['name'] not in issue_types:
+                    continue
+                if any(parse_timestamp(fields[field]) < since for field, since in date_filters):
+                    continue
+                if any(fields.get(field) for field in empty_fields):
+                    continue
+                matches.append(issue)
+
+        order = CLAUSE_ORDER.search(jql)
+        if order:
+            field, direction = order.group(1).lower(), (order.group(2) or 'ASC').upper()
+            matches.sort(key=lambda issue: parse_timestamp(issue['fields'][field]), reverse=direction == 'DESC')
+        else:
+            matches.sort(key=lambda issue: issue['key'])
+        result = {
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': len(matches),
+            'issues': json.loads(json.dumps(matches[start_at:start_at + max_results])),
+        }
+        if messages:
+            result['warningMessages'] = messages
+        return 200, result
+
+    def _admit(self):
+        """Fixed one-second window rate limiter; returns False when over the limit."""
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            if self._window_count > self.rate_limit:
+                self.throttled += 1
+                return False
+            return True
+
+    # -- HTTP -----------------------------------------------------------------
+
+    def _handler(self):
+        jira = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload, headers=()):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _admitted(self):
+                with jira.lock:
+                    jira.requests += 1
+                if jira._admit():
+                    return True
+                self._send(429, {'errorMessages': ['Rate limit exceeded']},
+                           [('Retry-After', str(jira.retry_after))])
+                return False
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_PUT(self):
+                payload = self._read_json()
+                if not self._admitted():
+                    return
+                match = ISSUE_PATH.match(urlsplit(self.path).path)
+                if not match:
+                    self._send(404, {'errorMessages': [f'No route for {self.path}']})
+                    return
+                error = jira.edit_issue(match.group(1), payload.get('fields', {}))
+                if error:
+                    self._send(400, {'errorMessages': [error]})
+                    return
+                self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                payload = self._read_json()
+                if not self._admitted():
+                    return
+                path = urlsplit(self.path).path
+                if path != '/rest/api/3/bulk/issues/fields' or not jira.bulk_api:
+                    self._send(404, {'errorMessages': [f'No route for {path}']})
+                    return
+                self._send(201, jira.bulk_edit(payload))
+
+            def do_GET(self):
+                if not self._admitted():
+                    return
+                url = urlsplit(self.path)
+                task = BULK_TASK_PATH.match(url.path)
+                if task and jira.bulk_api:
+                    result = jira.bulk_task(task.group(1))
+                    if result is None:
+                        self._send(404, {'errorMessages': [f'No task {task.group(1)}']})
+                    else:
+                        self._send(200, result)
+                    return
+                if url.path != '/rest/api/2/search':
+                    self._send(404, {'errorMessages': [f'No route for {url.path}']})
+                    return
+                query = parse_qs(url.query)
+                status, result = jira.search(
+                    query.get('jql', [''])[0],
+                    int(query.get('startAt', ['0'])[0]),
+                    int(query.get('maxResults', ['50'])[0]),
+                    query.get('validateQuery', ['strict'])[0].lower(),
+                )
+                self._send(status, result)
+
+        return Handler
+
+    def start(self, host='127.0.0.1', port=0):
+        """Starts serving in a daemon thread and returns the base URL."""
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f'http://{host}:{self._server.server_address[1]}'
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,92 @@
+"""
+Text extraction from Atlassian Document Format (ADF) descriptions.
+
+ADF is a tree of nodes ({"type": ..., "content": [...], "attrs": {...}}).
+The walker keeps an explicit stack instead of recursing, so a deeply
+nested document cannot hit Python's recursion limit. It is a generator,
+so nothing is copied per level.
+
+iter_adf_text keeps the structure that plain text nodes lose, rendered the
+way Jira wiki markup (what /rest/api/2 returns for descriptions) spells it:
+
+    paragraphs, headings, quotes   one line each
+    list items                     "* item" / "# item", "** nested"
+    code blocks                    {code:lang} ... {code}
+    mentions, emoji                their display text ("@Jane Doe", ":bug:")
+    smart links                    the URL
+    hard breaks                    a newline
+    table cells                    "| cell | cell"
+"""
+
+BLOCK_TYPES = frozenset({
+    "paragraph", "heading", "blockquote", "panel", "rule", "tableRow", "expand", "nestedExpand",
+    "mediaSingle", "mediaGroup", "decisionItem", "taskItem",
+})
+CARD_TYPES = frozenset({"inlineCard", "blockCard", "embedCard"})
+LIST_MARKERS = {"bulletList": "*", "orderedList": "#"}
+# Deeper lists keep the marker of this depth, so pathological nesting costs
+# O(depth) rather than O(depth^2) in marker strings.
+MAX_LIST_DEPTH = 8
+
+
+def iter_adf_text(document):
+    """Yields text fragments of an ADF document (or node list) in order; join them to get the text."""
+    # Entries are (node, list marker, inside a table cell); plain strings are
+    # emitted as-is, except that a table cell stays on its row's line.
+    stack = [(document, "", False)]
+    while stack:
+        node, marker, in_cell = stack.pop()
+        if isinstance(node, str):
+            yield node.replace("\n", " ") if in_cell else node
+            continue
+        if isinstance(node, list):
+            stack.extend((child, marker, in_cell) for child in reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        node_type = node.get("type")
+        attrs = node.get("attrs") or {}
+        if node_type == "text":
+            yield node.get("text", "")
+            continue
+        if node_type == "hardBreak":
+            yield " " if in_cell else "\n"
+            continue
+        if node_type == "mention":
+            yield attrs.get("text") or f"@{attrs.get('id', 'someone')}"
+            continue
+        if node_type == "emoji":
+            yield attrs.get("text") or attrs.get("shortName", "")
+            continue
+        if node_type in CARD_TYPES:
+            yield attrs.get("url", "")
+            continue
+
+        content = node.get("content") or []
+        if node_type in LIST_MARKERS:
+            child_marker = marker + LIST_MARKERS[node_type] if len(marker) < MAX_LIST_DEPTH else marker
+            stack.append(("\n", marker, in_cell))
+            stack.extend((child, child_marker, in_cell) for child in reversed(content))
+        elif node_type == "listItem":
+            stack.append(("\n", marker, in_cell))
+            stack.extend((child, marker, in_cell) for child in reversed(content))
+            stack.append((f"\n{marker} ", marker, in_cell))
+        elif node_type == "codeBlock":
+            language = attrs.get("language")
+            stack.append(("\n{code}\n", marker, in_cell))
+            stack.extend((child, marker, in_cell) for child in reversed(content))
+            stack.append((f"\n{{code:{language}}}\n" if language else "\n{code}\n", marker, in_cell))
+        elif node_type in ("tableCell", "tableHeader"):
+            stack.extend((child, marker, True) for child in reversed(content))
+            stack.append(("| ", marker, True))
+        else:
+            if node_type in BLOCK_TYPES:
+                stack.append(("\n", marker, in_cell))
+            stack.extend((child, marker, in_cell) for child in reversed(content))
+
+
+def adf_to_text(document):
+    """iter_adf_text joined into lines, with blank lines and surrounding whitespace dropped."""
+    text = "".join(iter_adf_text(document))
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
@@ -0,0 +1,101 @@
+"""
+Background bulk routing of a ticket DataFrame.
+
+A BulkRoutingJob feeds the tickets through a batch predictor
+(predict_teams(summaries, descriptions) -> labels) in a daemon thread, one
+batch at a time, and publishes each finished batch right away. A UI can poll
+snapshot() on every refresh to show partial results and the running accuracy
+without ever blocking on the model.
+"""
+import logging
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ("Summary", "Description")
+
+
+class BulkRoutingJob:
+    def __init__(self, df, predict_batch_fn, batch_size=64):
+        missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+        if missing:
+            raise ValueError(f"CSV is missing the column(s) {', '.join(missing)}")
+        self.df = df.reset_index(drop=True)
+        self.predict_batch_fn = predict_batch_fn
+        self.batch_size = batch_size
+        self.has_labels = "Fixed By" in df.columns
+
+        self._lock = threading.Lock()
+        self._predictions = []
+        self._correct = 0
+        self._labelled = 0
+        self._cancelled = threading.Event()
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        summaries = self.df["Summary"].fillna("").astype(str).tolist()
+        descriptions = self.df["Description"].tolist()
+        actual = self.df["Fixed By"].tolist() if self.has_labels else None
+        try:
+            for start in range(0, len(self.df), self.batch_size):
+                if self._cancelled.is_set():
+                    break
+                end = start + self.batch_size
+                teams = self.predict_batch_fn(summaries[start:end], descriptions[start:end])
+                correct = labelled = 0
+                if actual is not None:
+                    for team, expected in zip(teams, actual[start:end]):
+                        if pd.notna(expected):
+                            labelled += 1
+                            correct += team == expected
+                with self._lock:
+                    self._predictions.extend(teams)
+                    self._correct += correct
+                    self._labelled += labelled
+        except Exception as e:
+            logger.exception("Bulk routing failed")
+            self.error = e
+        finally:
+            self.finished_at = time.monotonic()
+
+    def snapshot(self):
+        """
+        A consistent view of the progress so far: the routed rows as a DataFrame
+        (input columns plus "Predicted Team" and, when labels exist, "Correct")
+        and a dict of counters.
+        """
+        with self._lock:
+            predictions = list(self._predictions)
+            correct, labelled = self._correct, self._labelled
+        done = len(predictions)
+        results = self.df.iloc[:done].copy()
+        results["Predicted Team"] = predictions
+        if self.has_labels:
+            results["Correct"] = results["Predicted Team"] == results["Fixed By"]
+        elapsed = (self.finished_at or time.monotonic()) - (self.started_at or time.monotonic())
+        return results, {
+            "done": done,
+            "total": len(self.df),
+            "accuracy": correct / labelled if labelled else None,
+            "tickets_per_s": done / elapsed if elapsed > 0 else 0.0,
+            "running": self.running,
+            "error": self.error,
+        }
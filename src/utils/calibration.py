@@ -0,0 +1,81 @@
+"""
+Temperature scaling for classifier confidences.
+
+A fine-tuned classifier's softmax is usually over-confident. Dividing the
+logits by a single temperature T fitted on held-out tickets (minimising the
+negative log-likelihood) keeps the argmax unchanged but makes the
+probabilities usable as thresholds. Fitted temperatures are stored per model
+and revision in CALIBRATION_FILE; an uncalibrated revision uses T = 1.
+"""
+import json
+import logging
+import os
+import threading
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_FILE = os.getenv("CALIBRATION_FILE", "src/data/calibration.json")
+
+_lock = threading.Lock()
+# (path, model_name, revision) -> temperature, so predictions do not reread
+# CALIBRATION_FILE; save_temperature keeps it current.
+_temperatures = {}
+
+
+def fit_temperature(logits, labels, max_iter=200):
+    """Temperature minimising the NLL of labels (class indices) under softmax(logits / T)."""
+    logits = torch.as_tensor(logits, dtype=torch.float32)
+    labels = torch.as_tensor(labels, dtype=torch.long)
+    log_t = torch.zeros(1, requires_grad=True)
+    optimizer = torch.optim.LBFGS([log_t], lr=0.1, max_iter=max_iter)
+
+    def closure():
+        optimizer.zero_grad()
+        loss = torch.nn.functional.cross_entropy(logits / log_t.exp(), labels)
+        loss.backward()
+        return loss
+
+    optimizer.step(closure)
+    return float(log_t.exp())
+
+
+def expected_calibration_error(probabilities, correct, bins=10):
+    """Weighted mean |accuracy - confidence| over equal-width confidence bins."""
+    probabilities = torch.as_tensor(probabilities, dtype=torch.float32)
+    correct = torch.as_tensor(correct, dtype=torch.float32)
+    error = 0.0
+    for low in torch.linspace(0, 1, bins + 1)[:-1]:
+        in_bin = (probabilities > low) & (probabilities <= low + 1 / bins)
+        if in_bin.any():
+            error += in_bin.float().mean() * (correct[in_bin].mean() - probabilities[in_bin].mean()).abs()
+    return float(error)
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_temperature(model_name, revision, path=CALIBRATION_FILE):
+    key = (path, model_name, revision)
+    temperature = _temperatures.get(key)
+    if temperature is None:
+        with _lock:
+            temperature = _temperatures[key] = _read(path).get(model_name, {}).get(revision, 1.0)
+    return temperature
+
+
+def save_temperature(model_name, revision, temperature, path=CALIBRATION_FILE):
+    with _lock:
+        calibration = _read(path)
+        calibration.setdefault(model_name, {})[revision] = temperature
+        temp_file = f"{path}.temp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(calibration, f, indent=2)
+        os.replace(temp_file, path)
+        _temperatures[(path, model_name, revision)] = temperature
+    logger.info(f"Saved temperature {temperature:.3f} for {model_name} ({revision})")
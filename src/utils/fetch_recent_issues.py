@@ -1,14 +1,21 @@
 from jira import JIRA
+import argparse
 import csv
+import importlib
+import json
 import logging
-import requests
-from requests.auth import HTTPBasicAuth
 import os
+import threading
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime, timedelta
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from utils.adf_text import adf_to_text
+from utils.issue_sink import IssueSink
+from utils.jira_client import AdaptiveRateLimiter, JiraClient
+from utils.metrics import dump_json, format_table, get_profiler, stage
+from utils.record_store import RECORDS_FILE
+from datetime import datetime, timedelta, timezone
 import time
-import random
 
 load_dotenv()
 # Jira credentials (replace with your actual values)
@@ -16,6 +23,14 @@ JIRA_SERVER = os.getenv('JIRA_SERVER')
 JIRA_EMAIL = os.getenv('JIRA_EMAIL')
 JIRA_API_TOKEN = os.getenv('JIRA_API_TOKEN')
 DAYS_BACK = int(os.getenv("DAYS_BACK", "60"))  # Default to 60 days
+OUTPUT_FILE = os.getenv("ISSUES_CSV", "src/data/issues.csv")
+# Incremental syncs re-query this many hours before the stored watermark. JQL
+# dates are read in the Jira user's timezone, so the overlap must cover any
+# UTC offset; re-fetched issues are simply upserted again.
+WATERMARK_OVERLAP_HOURS = int(os.getenv("WATERMARK_OVERLAP_HOURS", "24"))
+# Ticket indexes (see INDEX_UPDATERS) that every incremental sync adds its
+# upserted issues to; an index is only updated once it has been built.
+SYNC_INDEXES = [name.strip() for name in os.getenv("SYNC_INDEXES", "knn,dedup").split(",") if name.strip()]
 TEAM_WHITELIST = os.getenv("TEAM_WHITELIST", "")
 print(f"TEAM_WHITELIST: {TEAM_WHITELIST}")
 
@@ -26,16 +41,24 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # JQL query to fetch both Bug and Transient Bug issue types
-JQL = JQL = f'issuetype in ("Bug", "Transient Bug") AND created >= "{N_DAYS_AGO}"'
+JQL_TEMPLATE = 'issuetype in ("Bug", "Transient Bug") AND created >= "{since}"'
+JQL = JQL_TEMPLATE.format(since=N_DAYS_AGO)
 
-# API endpoint for searching issues
-SEARCH_URL = f'{JIRA_SERVER}/rest/api/2/search'
+CSV_HEADER = [
+    'Issue Key', 'Summary', 'Reporter', 'Assignee', 'Status',
+    'Created', 'Updated', 'Fixed By', 'Description', 'Issue Type'
+]
+JIRA_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
 
-# Headers for the request
-HEADERS = {
-    'Accept': 'application/json'
+# name -> module with INDEX_DIR and index_issues(df), imported only when used
+INDEX_UPDATERS = {
+    'knn': 'predictors.predictor_kNN',
+    'dedup': 'predictors.dedup',
 }
 
+# API endpoint for searching issues
+SEARCH_PATH = '/rest/api/2/search'
+
 # Base parameters for the request.
 # We request 'customfield_14600' which is used for "Fixed By", 
 # and the 'description' field for the full ticket body.
@@ -48,23 +71,19 @@ BASE_PARAMS = {
 MAX_RETRIES = 5
 BASE_RETRY_DELAY = 10  # seconds
 MAX_WORKERS = 5  # Reduced from 10 to avoid overwhelming the API
+# Processes that decode and convert fetched pages while the fetch threads keep
+# downloading; 0 parses in the fetch threads themselves.
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Requests per second shared by all workers; lowered automatically on 429s
+JIRA_RATE_LIMIT = float(os.getenv("JIRA_RATE_LIMIT", "5"))
+JIRA_RATE_BURST = int(os.getenv("JIRA_RATE_BURST", "5"))
 
-def extract_text_only(content):
-    """
-    Extracts only 'text' type nodes from ADF content blocks.
-    Ignores all other node types.
-    """
-    texts = []
-    if isinstance(content, list):
-        for item in content:
-            texts.extend(extract_text_only(item))
-    elif isinstance(content, dict):
-        node_type = content.get('type')
-        if node_type == 'text':  # Only process 'text' nodes
-            texts.append(content.get('text', ''))
-        elif 'content' in content:  # Recursively process nested content
-            texts.extend(extract_text_only(content['content']))
-    return texts
+# One pass instead of chained .replace calls: double quotes for the CSV,
+# line breaks flattened to spaces.
+SANITIZE_TABLE = str.maketrans({'"': '""', '\n': ' ', '\r': None})
+
+_client = None
+_client_lock = threading.Lock()
 
 def extract_description_text(description):
     """
@@ -75,192 +94,349 @@ def extract_description_text(description):
     if isinstance(description, str):
         return description.strip()
     if isinstance(description, dict):
-        extracted_text = '\n'.join(extract_text_only(description.get('content', []))).strip()
-        return extracted_text
+        # Atlassian Document Format; lists, code blocks and mentions are kept.
+        return adf_to_text(description)
     logger.warning(f"Unexpected description format: {type(description)}")
     return ""
 
-def fetch_issues_batch(start_at, batch_size):
+def get_client():
+    """
+    Process-wide JiraClient shared by all fetch workers: one pooled keep-alive
+    session and one adaptive rate limiter, so a 429 seen by any worker slows
+    down all of them.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = JiraClient(
+                JIRA_SERVER, JIRA_EMAIL, JIRA_API_TOKEN,
+                AdaptiveRateLimiter(JIRA_RATE_LIMIT, JIRA_RATE_BURST),
+                pool_size=MAX_WORKERS,
+                max_retries=MAX_RETRIES,
+                base_retry_delay=BASE_RETRY_DELAY,
+            )
+    return _client
+
+def fetch_issues_batch(start_at, batch_size, jql=JQL):
     """
     Fetches a batch of issues starting at 'start_at' with 'batch_size' results.
-    Includes retry logic for rate limits.
+    Rate limits and retries are handled by the shared client.
     Returns a tuple of (issues, total_count).
     """
     params = BASE_PARAMS.copy()
+    params['jql'] = jql
     params['startAt'] = start_at
     params['maxResults'] = batch_size
     
-    for retry in range(MAX_RETRIES):
-        try:
-            response = requests.get(
-                SEARCH_URL,
-                headers=HEADERS,
-                params=params,
-                auth=HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN)
-            )
-            
-            # Check for rate limiting response
-            if response.status_code == 429:
-                # Get retry-after header if available, or use exponential backoff
-                retry_after = int(response.headers.get('Retry-After', BASE_RETRY_DELAY * (2 ** retry)))
-                logger.warning(f"Rate limit hit at {start_at}. Retrying after {retry_after} seconds (attempt {retry+1}/{MAX_RETRIES})")
-                time.sleep(retry_after)
-                continue
-            
-            response.raise_for_status()
-            data = response.json()
-            issues = data.get('issues', [])
-            total = data.get('total', 0)
-            
-            # Add a small delay between requests even on success to be nice to the API
-            time.sleep(random.uniform(0.5, 1.5))
-            
-            return issues, total
-            
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 429:  # Too Many Requests
-                # This should be handled above, but just in case
-                retry_after = int(response.headers.get('Retry-After', BASE_RETRY_DELAY * (2 ** retry)))
-                logger.warning(f"Rate limit hit at {start_at}. Retrying after {retry_after} seconds (attempt {retry+1}/{MAX_RETRIES})")
-                time.sleep(retry_after)
-            else:
-                logger.error(f"HTTP error at {start_at}: {e}")
-                if retry < MAX_RETRIES - 1:
-                    wait_time = BASE_RETRY_DELAY * (2 ** retry)
-                    logger.info(f"Retrying in {wait_time} seconds... (attempt {retry+1}/{MAX_RETRIES})")
-                    time.sleep(wait_time)
-                else:
-                    raise
-        except Exception as e:
-            logger.error(f"Error fetching batch at {start_at}: {e}")
-            if retry < MAX_RETRIES - 1:
-                wait_time = BASE_RETRY_DELAY * (2 ** retry)
-                logger.info(f"Retrying in {wait_time} seconds... (attempt {retry+1}/{MAX_RETRIES})")
-                time.sleep(wait_time)
-            else:
-                raise
-    
-    # If we got here, all retries failed
-    raise Exception(f"Failed to fetch batch at {start_at} after {MAX_RETRIES} retries")
+    try:
+        with stage("fetch.request"):
+            data = get_client().get_json(SEARCH_PATH, params=params)
+    except Exception as e:
+        logger.error(f"Error fetching batch at {start_at}: {e}")
+        raise
+    return data.get('issues', []), data.get('total', 0)
 
-def write_issues_to_csv(csv_writer, issues):
+def fetch_issues_page(start_at, batch_size, jql=JQL):
+    """fetch_issues_batch without decoding: returns the raw response body for the parse stage."""
+    params = BASE_PARAMS.copy()
+    params['jql'] = jql
+    params['startAt'] = start_at
+    params['maxResults'] = batch_size
+    with stage("fetch.request"):
+        return get_client().get_content(SEARCH_PATH, params=params)
+
+def parse_issues_page(content):
+    """Parse stage: decodes a search response and converts its issues to CSV rows. Returns (rows, total)."""
+    data = json.loads(content)
+    return list(issues_to_rows(data.get('issues', []))), data.get('total', 0)
+
+def start_parse_pool(workers=PARSE_WORKERS):
     """
-    Writes the list of issues to CSV using the given csv_writer.
-    Skips issues where the Fixed By field is 'unassigned'.
+    Process pool for parse_issues_page, or None when workers is 0 or the
+    platform cannot fork (Windows). Forked workers inherit this module's
+    configuration. They are all started by a first job here, before any
+    fetch thread exists, because forking while other threads run can copy a
+    held lock into the child.
     """
-    for issue in issues:
-        fields = issue['fields']
-        # Use customfield_14600 for Fixed By.
-        fixed_by_field = fields.get('customfield_14600')
-        # fixed_by = (fixed_by_field.get('value') 
-        #             if fixed_by_field and fixed_by_field.get('value') and fixed_by_field.get('value').lower() != "unassigned"
-        #             else "unassigned")
-        # # Skip issues with Fixed By as unassigned
-        # if fixed_by.lower() == "unassigned":
-        #     continue
-        fixed_by = (fixed_by_field.get('value') 
-                    if fixed_by_field and fixed_by_field.get('value') and fixed_by_field.get('value').lower() != "unassigned"
-                    else "unassigned")
-
-        # Skip if unassigned or not in the whitelisted teams
-        if fixed_by.lower() == "unassigned" or (TEAM_WHITELIST and fixed_by.lower() not in TEAM_WHITELIST):
-            continue
-            
-        # Get issue type
-        issue_type = fields.get('issuetype', {}).get('name', 'Unknown')
-
-        description = extract_description_text(fields.get('description'))
-        
-        # Sanitize fields for CSV
-        summary = fields.get('summary', '').replace('"', '""').replace('\n', ' ').replace('\r', '')
-        description = description.replace('"', '""').replace('\n', ' ').replace('\r', '')
-        
-        csv_writer.writerow([
-            issue['key'],
-            summary,
-            fields.get('reporter', {}).get('displayName', 'Unknown'),
-            fields.get('assignee', {}).get('displayName', 'Unassigned'),
-            fields.get('status', {}).get('name'),
-            fields.get('created'),
-            fields.get('updated'),
-            fixed_by,
-            description,
-            issue_type
-        ])
-
-def save_progress(all_batches, output_file):
+    if workers <= 0:
+        return None
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        logger.warning("fork is not available on this platform; parsing pages in the fetch threads")
+        return None
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    pool.submit(int).result()
+    return pool
+
+def fetch_and_parse(start_at, batch_size, parse_pool=None, jql=JQL):
+    """Fetches one page and returns (rows, total), parsing it in parse_pool when one is given."""
+    content = fetch_issues_page(start_at, batch_size, jql)
+    with stage("fetch.parse"):
+        if parse_pool is None:
+            return parse_issues_page(content)
+        return parse_pool.submit(parse_issues_page, content).result()
+
+def issue_to_row(issue):
     """
-    Save the current progress to avoid losing data in case of failure
+    Converts a Jira issue to a CSV row, or returns None for issues that are
+    not kept (Fixed By unassigned or not in the whitelisted teams).
     """
-    # Flatten the list of batches into a single list of issues
-    all_issues = [issue for batch in all_batches for issue in batch]
+    fields = issue['fields']
+    # Use customfield_14600 for Fixed By.
+    fixed_by_field = fields.get('customfield_14600')
+    # fixed_by = (fixed_by_field.get('value') 
+    #             if fixed_by_field and fixed_by_field.get('value') and fixed_by_field.get('value').lower() != "unassigned"
+    #             else "unassigned")
+    # # Skip issues with Fixed By as unassigned
+    # if fixed_by.lower() == "unassigned":
+    #     continue
+    fixed_by = (fixed_by_field.get('value') 
+                if fixed_by_field and fixed_by_field.get('value') and fixed_by_field.get('value').lower() != "unassigned"
+                else "unassigned")
+
+    # Skip if unassigned or not in the whitelisted teams
+    if fixed_by.lower() == "unassigned" or (TEAM_WHITELIST and fixed_by.lower() not in TEAM_WHITELIST):
+        return None
+        
+    # Get issue type
+    issue_type = fields.get('issuetype', {}).get('name', 'Unknown')
+
+    description = extract_description_text(fields.get('description'))
+    
+    # Sanitize fields for CSV
+    summary = fields.get('summary', '').translate(SANITIZE_TABLE)
+    description = description.translate(SANITIZE_TABLE)
     
-    # Write to a temporary file first to avoid corrupting the main output
+    return [
+        issue['key'],
+        summary,
+        fields.get('reporter', {}).get('displayName', 'Unknown'),
+        fields.get('assignee', {}).get('displayName', 'Unassigned'),
+        fields.get('status', {}).get('name'),
+        fields.get('created'),
+        fields.get('updated'),
+        fixed_by,
+        description,
+        issue_type
+    ]
+
+def issues_to_rows(issues):
+    """Generator stage: converts fetched issues to CSV rows, dropping skipped ones."""
+    for issue in issues:
+        row = issue_to_row(issue)
+        if row is not None:
+            yield row
+
+def write_fetched_batch(sink, start, rows):
+    with stage("fetch.write"):
+        return sink.write_batch(start, rows)
+
+def iter_fetched_batches(start_indices, batch_size, failed_indices, chunk_size=50, parse_pool=None, jql=JQL):
+    """
+    Generator stage: yields (start, rows) as soon as each batch is fetched and
+    parsed. Each fetch thread hands its page to parse_pool and waits for the
+    rows; while it waits, the other MAX_WORKERS - 1 threads keep downloading,
+    so decoding and ADF extraction overlap with the network and the
+    consumer's writes, but never with more than MAX_WORKERS pages at a time.
+    At most chunk_size batches are in flight, and a batch is dropped as soon
+    as the consumer has written it, so memory does not grow with the
+    dataset. Starts that still fail after the client's retries are appended
+    to failed_indices.
+    """
+    for chunk_start in range(0, len(start_indices), chunk_size):
+        current_indices = start_indices[chunk_start:chunk_start + chunk_size]
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            future_to_start = {
+                executor.submit(fetch_and_parse, start, batch_size, parse_pool, jql): start
+                for start in current_indices
+            }
+            for future in as_completed(future_to_start):
+                start = future_to_start.pop(future)
+                try:
+                    rows, _ = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching batch starting at {start}: {e}")
+                    failed_indices.append(start)
+                    continue
+                yield start, rows
+
+def watermark_path(output_file):
+    return f"{output_file}.watermark.json"
+
+def parse_jira_timestamp(value):
+    return datetime.strptime(value, JIRA_TIMESTAMP_FORMAT)
+
+def load_watermark(output_file):
+    """
+    Returns the highest 'updated' timestamp seen by the last successful sync
+    of output_file, or None if it has never been synced.
+    """
+    path = watermark_path(output_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return parse_jira_timestamp(json.load(f)['updated'])
+
+def save_watermark(output_file, updated_values, previous=None):
+    """
+    Stores the highest of the given Jira 'updated' timestamps (never moving the
+    watermark backwards) and returns it.
+    """
+    timestamps = [parse_jira_timestamp(value) for value in updated_values if value]
+    if previous is not None:
+        timestamps.append(previous)
+    if not timestamps:
+        return previous
+    watermark = max(timestamps)
+    temp_file = f"{watermark_path(output_file)}.temp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump({'updated': watermark.strftime(JIRA_TIMESTAMP_FORMAT)}, f)
+    os.replace(temp_file, watermark_path(output_file))
+    return watermark
+
+def read_rows(output_file):
+    """Reads the existing dataset as an ordered {Issue Key: row} dict."""
+    if not os.path.exists(output_file):
+        return {}
+    with open(output_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        return {row[0]: row for row in reader}
+
+def write_rows(rows, output_file):
     temp_file = f"{output_file}.temp"
     with open(temp_file, mode='w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
-        # Write CSV header with Issue Type added
-        writer.writerow([
-            'Issue Key', 'Summary', 'Reporter', 'Assignee', 'Status',
-            'Created', 'Updated', 'Fixed By', 'Description', 'Issue Type'
-        ])
-        write_issues_to_csv(writer, all_issues)
-    
-    # Rename the temp file to the actual output file
-    if os.path.exists(output_file):
-        os.remove(output_file)
-    os.rename(temp_file, output_file)
-    
-    return len(all_issues)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(rows)
+    os.replace(temp_file, output_file)
 
-def main():
-    output_file = '/home/sourjyamukherjee/Projects/jira_router/src/data/issues.csv'
-    batch_size = 50  # Reduced batch size to avoid overwhelming the API
-    
+def update_indexes(rows, names=SYNC_INDEXES):
+    """
+    Adds rows (CSV rows as written to the dataset) to the named ticket
+    indexes. Indexes that were never built are left to their predictor's
+    build command, and a failure is logged without failing the sync: the
+    next `update` run catches up, as it skips rows already indexed.
+    """
+    if not rows:
+        return
+    import pandas as pd
+
+    df = pd.DataFrame(rows, columns=CSV_HEADER)
+    for name in names:
+        try:
+            module = importlib.import_module(INDEX_UPDATERS[name])
+            if not os.path.exists(os.path.join(module.INDEX_DIR, RECORDS_FILE)):
+                continue
+            with stage(f"fetch.index.{name}"):
+                added = module.index_issues(df)
+            logger.info(f"Added {added} synced issues to the {name} index")
+        except Exception as e:
+            logger.error(f"Updating the {name} index failed: {e}; "
+                         f"run `python -m {INDEX_UPDATERS.get(name)} update` to catch up")
+
+def incremental_sync(output_file, batch_size=50):
+    """
+    Fetches only issues updated since the stored watermark and upserts them
+    into output_file by Issue Key, then into the SYNC_INDEXES. Issues that are no longer kept (e.g. Fixed By
+    reset to unassigned) are removed, as are rows created before the DAYS_BACK
+    window, so the result matches a full crawl. Issues deleted in Jira are only
+    dropped by a full resync.
+    """
+    watermark = load_watermark(output_file)
+    since = (watermark - timedelta(hours=WATERMARK_OVERLAP_HOURS)).astimezone(timezone.utc)
+    jql = f'{JQL} AND updated >= "{since.strftime("%Y-%m-%d %H:%M")}" ORDER BY updated ASC'
+    logger.info(f"Incremental sync of issues updated since {since.isoformat()}")
+
+    issues = []
+    total = None
+    while total is None or len(issues) < total:
+        batch, total = fetch_issues_batch(len(issues), batch_size, jql=jql)
+        if not batch:
+            break
+        issues.extend(batch)
+
+    rows = read_rows(output_file)
+    inserted = updated = removed = 0
+    upserted = []
+    with stage("fetch.parse"):
+        for issue in issues:
+            row = issue_to_row(issue)
+            if row is None:
+                removed += rows.pop(issue['key'], None) is not None
+                continue
+            if issue['key'] in rows:
+                updated += 1
+            else:
+                inserted += 1
+            rows[issue['key']] = row
+            upserted.append(row)
+
+    window_start = datetime.strptime(N_DAYS_AGO, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    expired = [key for key, row in rows.items() if row[5] and parse_jira_timestamp(row[5]) < window_start]
+    for key in expired:
+        del rows[key]
+
+    with stage("fetch.write"):
+        write_rows(rows.values(), output_file)
+    save_watermark(output_file, (issue['fields'].get('updated') for issue in issues), previous=watermark)
+    update_indexes(upserted)
+    logger.info(
+        f"Incremental sync fetched {len(issues)} changed issues: {inserted} inserted, {updated} updated, "
+        f"{removed + len(expired)} removed; {len(rows)} issues in {output_file}"
+    )
+    return len(rows)
+
+def full_sync(output_file, batch_size=50, parse_workers=PARSE_WORKERS, parse_pool=None):
+    """
+    Crawls every issue matching JQL and streams it into output_file.
+
+    Batches are written through an IssueSink as they arrive, so an interrupted
+    crawl resumes from its checkpoint instead of starting over, and the
+    statistics are kept as running counts rather than re-reading the file.
+    Pages are parsed by parse_workers processes while others are fetched,
+    or by parse_pool (left running) when the caller has already started one.
+
+    The window start is kept in the checkpoint, so a crawl resumed on a later
+    day still pages through the same query, and issues are ordered by
+    creation. Batches are addressed by offset, so a resume only trusts the
+    completed ones while the query still matches as many issues as when the
+    crawl started; otherwise every batch is fetched again. Rows an offset
+    shift made appear twice are dropped when the sink is finalized. If
+    batches still fail after the retries, output_file is left untouched and
+    the checkpoint kept; the next run fetches only the missing batches.
+    """
+    sink = IssueSink(output_file, CSV_HEADER, f"{JQL_TEMPLATE}|{DAYS_BACK}|{batch_size}", parse_jira_timestamp,
+                     params={'since': N_DAYS_AGO})
+    jql = f"{JQL_TEMPLATE.format(since=sink.params['since'])} ORDER BY created ASC"
+    own_pool = parse_pool is None
+    if own_pool:
+        parse_pool = start_parse_pool(parse_workers)
     try:
         # First call to determine the total count
-        first_batch, total = fetch_issues_batch(0, batch_size)
+        first_rows, total = fetch_and_parse(0, batch_size, parse_pool, jql)
         logger.info(f"Total issues to fetch: {total}")
+        if sink.params.get('total', total) != total:
+            # Issues deleted, created or moved between the runs shift every
+            # later page, so the completed offsets would skip rows.
+            logger.warning(f"The query now matches {total} issues instead of {sink.params['total']}; "
+                           f"fetching every batch again")
+            sink.refetch_all()
+        sink.params['total'] = total
+        write_fetched_batch(sink, 0, first_rows)
+        del first_rows
         
-        # List to hold all batches of issues
-        all_batches = [first_batch]
-        
-        # Save initial batch to have something in case of failure
-        save_progress(all_batches, output_file)
-        
-        # Prepare the list of start indices for the remaining batches
-        start_indices = list(range(batch_size, total, batch_size))
-        total_batches = len(start_indices) + 1
-        
-        # Use ThreadPoolExecutor to fetch batches concurrently, but with fewer workers
-        completed = 1
+        # Prepare the list of start indices for the remaining batches, skipping
+        # those a previous interrupted run already wrote
+        start_indices = [start for start in range(batch_size, total, batch_size) if start not in sink.completed]
+        total_batches = len(range(0, total, batch_size))
         failed_indices = []
         
-        # Process in smaller chunks to save progress periodically
-        chunk_size = 50  # Number of batches to process before saving
-        for chunk_start in range(0, len(start_indices), chunk_size):
-            chunk_end = min(chunk_start + chunk_size, len(start_indices))
-            current_indices = start_indices[chunk_start:chunk_end]
-            
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                future_to_start = {
-                    executor.submit(fetch_issues_batch, start, batch_size): start 
-                    for start in current_indices
-                }
-                for future in as_completed(future_to_start):
-                    start = future_to_start[future]
-                    try:
-                        issues, _ = future.result()
-                        all_batches.append(issues)
-                        completed += 1
-                        logger.info(f"Fetched batch starting at {start}, progress: {completed}/{total_batches} ({completed/total_batches:.1%})")
-                    except Exception as e:
-                        logger.error(f"Error fetching batch starting at {start}: {e}")
-                        failed_indices.append(start)
-            
-            # Save progress after each chunk
-            issues_saved = save_progress(all_batches, output_file)
-            logger.info(f"Progress saved: {issues_saved} issues written to {output_file}")
+        for start, rows in iter_fetched_batches(start_indices, batch_size, failed_indices, parse_pool=parse_pool,
+                                                jql=jql):
+            write_fetched_batch(sink, start, rows)
+            completed = len(sink.completed)
+            logger.info(f"Fetched batch starting at {start}, progress: {completed}/{total_batches} ({completed/total_batches:.1%})")
+        logger.info(f"Progress saved: {sink.rows_written} issues written to {sink.partial_file}")
         
         # Retry failed batches
         if failed_indices:
@@ -275,42 +451,75 @@ def main():
                         logger.info(f"Retrying batch at {start} (attempt {retry_count})")
                         # Add a longer delay before retry
                         time.sleep(BASE_RETRY_DELAY)
-                        issues, _ = fetch_issues_batch(start, batch_size)
-                        all_batches.append(issues)
+                        rows, _ = fetch_and_parse(start, batch_size, parse_pool, jql)
+                        write_fetched_batch(sink, start, rows)
                         logger.info(f"Successfully retried batch at {start}")
                     except Exception as e:
                         logger.error(f"Retry failed for batch at {start}: {e}")
                         still_failed.append(start)
                 
                 failed_indices = still_failed
-                
-                # Save progress after retries
-                issues_saved = save_progress(all_batches, output_file)
-                logger.info(f"Progress after retries: {issues_saved} issues written to {output_file}")
-        
-        # Final stats
-        with open(output_file, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader)  # Skip header
-            rows = list(reader)
+                logger.info(f"Progress after retries: {sink.rows_written} issues written to {sink.partial_file}")
         
-        final_count = len(rows)
-        bug_count = sum(1 for row in rows if row[9] == 'Bug')
-        transient_bug_count = sum(1 for row in rows if row[9] == 'Transient Bug')
+        if failed_indices:
+            # Keep the partial file and its checkpoint so the next run only
+            # fetches these batches; output_file keeps its previous contents.
+            logger.error(f"Some batches could not be fetched after multiple retries: {failed_indices}; "
+                         f"run again to resume from {sink.checkpoint_file}")
+            return sink.rows_written
+        sink.finalize()
+        # Only a complete crawl may set the watermark; otherwise issues in
+        # the missing batches would never be picked up incrementally.
+        save_watermark(output_file, [sink.latest_updated])
         
+        # Final stats
+        final_count = sink.rows_written
         logger.info(f"Final statistics:")
         logger.info(f"  Total issues: {final_count}")
-        logger.info(f"  Bug issues: {bug_count}")
-        logger.info(f"  Transient Bug issues: {transient_bug_count}")
-        
-        if failed_indices:
-            logger.warning(f"Some batches could not be fetched after multiple retries: {failed_indices}")
+        logger.info(f"  Bug issues: {sink.issue_types['Bug']}")
+        logger.info(f"  Transient Bug issues: {sink.issue_types['Transient Bug']}")
         
         print(f"Successfully wrote {final_count} issues to {output_file}")
+        return final_count
         
     except Exception as e:
         logger.error(f"An error occurred during execution: {e}")
         raise
+    finally:
+        sink.close()
+        if own_pool and parse_pool is not None:
+            parse_pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync recent Bug / Transient Bug issues from Jira to CSV")
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--batch-size', type=int, default=50)  # Reduced batch size to avoid overwhelming the API
+    parser.add_argument('--full', action='store_true', help="Re-crawl the whole DAYS_BACK window")
+    parser.add_argument('--metrics-json', help="Write per-stage timings (request / parse / write) to this file")
+    parser.add_argument('--profile', help="Sample the sync's stacks and write them here as folded stacks")
+    args = parser.parse_args()
+
+    # An interrupted full crawl is resumed before any incremental sync.
+    full = (args.full or os.path.exists(IssueSink.checkpoint_path(args.output))
+            or load_watermark(args.output) is None or not os.path.exists(args.output))
+    # Fork the parse workers before the profiler's sampling thread exists.
+    parse_pool = start_parse_pool() if full else None
+    profiler = get_profiler()
+    if args.profile and not profiler.running:
+        profiler.start()
+    try:
+        if full:
+            # parse_pool already holds the PARSE_WORKERS processes (None if there are none).
+            return full_sync(args.output, args.batch_size, parse_workers=0, parse_pool=parse_pool)
+        return incremental_sync(args.output, args.batch_size)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        logger.info(f"Stage timings:\n{format_table()}")
+        if args.metrics_json:
+            dump_json(args.metrics_json)
+        if args.profile:
+            profiler.stop().write_folded(args.profile)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
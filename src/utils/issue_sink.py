@@ -0,0 +1,162 @@
+import csv
+import json
+import logging
+import os
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class IssueSink:
+    """
+    Append-only CSV writer for fetched issue batches with crash-safe checkpoints.
+
+    Rows are appended to '<output>.partial' as each batch arrives. After every
+    batch the file is fsynced and '<output>.checkpoint.json' records the ids of
+    the completed batches, the byte offset of the last complete batch and the
+    running statistics. A run started with the same fingerprint (e.g. the JQL
+    and page size) resumes from the checkpoint, truncating any half-written
+    batch; finalize() atomically moves the finished file into place.
+
+    params are query values that must stay fixed for the whole crawl but are
+    not part of the fingerprint (e.g. a date computed from the clock): they
+    are saved with the checkpoint, and a resumed run gets the saved ones.
+    """
+
+    def __init__(self, output_file, header, fingerprint, parse_timestamp, params=None):
+        self.output_file = output_file
+        self.partial_file = f"{output_file}.partial"
+        self.checkpoint_file = self.checkpoint_path(output_file)
+        self.fingerprint = fingerprint
+        self.parse_timestamp = parse_timestamp
+        self._type_column = header.index('Issue Type')
+        self._team_column = header.index('Fixed By')
+        self._updated_column = header.index('Updated')
+
+        checkpoint = self._load_checkpoint()
+        if checkpoint is not None:
+            self.completed = set(checkpoint['completed'])
+            self.rows_written = checkpoint['rows_written']
+            self.issue_types = Counter(checkpoint['issue_types'])
+            self.teams = Counter(checkpoint['teams'])
+            self.latest_updated = checkpoint['latest_updated']
+            self.params = checkpoint.get('params', params or {})
+            self._file = open(self.partial_file, 'r+', newline='', encoding='utf-8')
+            self._file.truncate(checkpoint['offset'])
+            self._file.seek(checkpoint['offset'])
+            logger.info(f"Resuming {self.partial_file}: {len(self.completed)} batches, {self.rows_written} issues already written")
+        else:
+            self.completed = set()
+            self.rows_written = 0
+            self.issue_types = Counter()
+            self.teams = Counter()
+            self.latest_updated = None
+            self.params = params or {}
+            self._file = open(self.partial_file, 'w', newline='', encoding='utf-8')
+            csv.writer(self._file).writerow(header)
+            self._file.flush()
+            self._save_checkpoint()
+        self._writer = csv.writer(self._file)
+
+    @staticmethod
+    def checkpoint_path(output_file):
+        return f"{output_file}.checkpoint.json"
+
+    def _load_checkpoint(self):
+        if not (os.path.exists(self.checkpoint_file) and os.path.exists(self.partial_file)):
+            return None
+        with open(self.checkpoint_file, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('fingerprint') != self.fingerprint:
+            logger.info("Checkpoint belongs to a different query; starting over")
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self):
+        checkpoint = {
+            'fingerprint': self.fingerprint,
+            'completed': sorted(self.completed),
+            'offset': self._file.tell(),
+            'rows_written': self.rows_written,
+            'issue_types': dict(self.issue_types),
+            'teams': dict(self.teams),
+            'latest_updated': self.latest_updated,
+            'params': self.params,
+        }
+        temp_file = f"{self.checkpoint_file}.temp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(temp_file, self.checkpoint_file)
+
+    def _count(self, row):
+        self.issue_types[row[self._type_column]] += 1
+        self.teams[row[self._team_column]] += 1
+        updated = row[self._updated_column]
+        if updated and (self.latest_updated is None
+                        or self.parse_timestamp(updated) > self.parse_timestamp(self.latest_updated)):
+            self.latest_updated = updated
+
+    def write_batch(self, batch_id, rows):
+        """Appends one batch of rows (any iterable) and checkpoints it."""
+        if batch_id in self.completed:
+            return 0
+        count = 0
+        for row in rows:
+            self._writer.writerow(row)
+            count += 1
+            self._count(row)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed.add(batch_id)
+        self.rows_written += count
+        self._save_checkpoint()
+        return count
+
+    def refetch_all(self):
+        """
+        Forgets which batches are complete (their rows stay in the file), for
+        when the batch ids no longer address the same issues.
+        """
+        self.completed.clear()
+        self._save_checkpoint()
+
+    def _deduplicate(self):
+        """
+        Rewrites the partial file keeping only the last row written for each
+        Issue Key, and recounts the statistics from the rows kept. Rows are
+        streamed twice, so only the keys are held in memory.
+        """
+        with open(self.partial_file, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)
+            last_row_of = {row[0]: i for i, row in enumerate(reader)}
+        if len(last_row_of) == self.rows_written:
+            return
+        logger.info(f"Dropping {self.rows_written - len(last_row_of)} rows of issues fetched more than once")
+        self.issue_types, self.teams, self.latest_updated = Counter(), Counter(), None
+        temp_file = f"{self.partial_file}.temp"
+        with open(self.partial_file, newline='', encoding='utf-8') as src, \
+                open(temp_file, 'w', newline='', encoding='utf-8') as dst:
+            reader, writer = csv.reader(src), csv.writer(dst)
+            writer.writerow(next(reader))
+            for i, row in enumerate(reader):
+                if last_row_of[row[0]] == i:
+                    writer.writerow(row)
+                    self._count(row)
+        os.replace(temp_file, self.partial_file)
+        self.rows_written = len(last_row_of)
+
+    def finalize(self):
+        """
+        Moves the completed file, without rows repeated by page offsets that
+        shifted during the crawl, over output_file and removes the checkpoint.
+        """
+        self._file.close()
+        self._deduplicate()
+        os.replace(self.partial_file, self.output_file)
+        os.remove(self.checkpoint_file)
+
+    def close(self):
+        """Closes without finalizing, leaving the checkpoint for a later resume."""
+        if not self._file.closed:
+            self._file.close()
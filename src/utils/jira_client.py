@@ -0,0 +1,234 @@
+"""
+Shared, pooled and rate-limited HTTP client for the Jira REST API.
+
+One requests.Session (keep-alive, connection pool sized for the fetch
+workers) is shared by every thread, and every request first takes a token
+from a single AdaptiveRateLimiter. The limiter is AIMD: each 429 halves the
+request rate and blocks *all* workers until the Retry-After time has passed,
+and each success raises the rate again by a small step up to the configured
+maximum. AsyncAdaptiveRateLimiter / AsyncJiraClient are the asyncio variants.
+
+5xx answers and timeouts are retried with exponential backoff for GET and
+PUT only: a POST (e.g. starting a bulk edit) may already have taken effect,
+so it is retried only when it never reached Jira or was rejected with 429.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {'GET', 'PUT'}
+
+
+class RateLimitedError(Exception):
+    """Raised when a request is still throttled after all retries."""
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe token bucket whose rate adapts to throttling signals.
+    acquire() blocks until a token is available and no Retry-After pause is
+    in effect.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=0.5, increase_step=0.5, decrease_factor=0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.min_rate = min_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _reserve(self):
+        """Takes a token if possible; otherwise returns how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttled(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = 0.0
+            self._last = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            logger.warning(f"Throttled by Jira; rate lowered to {self.rate:.2f} req/s, pausing {retry_after or 0}s")
+
+
+class AsyncAdaptiveRateLimiter(AdaptiveRateLimiter):
+    """AdaptiveRateLimiter whose acquire() awaits instead of blocking the thread."""
+
+    async def acquire(self):
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def parse_retry_after(response, default):
+    try:
+        return float(response.headers.get('Retry-After', default))
+    except (TypeError, ValueError):
+        return default
+
+
+def retry_error(method, error, retry, max_retries):
+    """Whether a request that raised error may be sent again; a POST only if it never reached Jira."""
+    if retry == max_retries - 1:
+        return False
+    return method in IDEMPOTENT_METHODS or isinstance(error, requests.exceptions.ConnectTimeout)
+
+
+def retry_status(method, status_code, retry, max_retries):
+    """Whether a 5xx answer is worth retrying."""
+    return status_code >= 500 and method in IDEMPOTENT_METHODS and retry < max_retries - 1
+
+
+class JiraClient:
+    """GETs JSON from Jira through one pooled session and a shared limiter."""
+
+    def __init__(self, server, email, api_token, limiter, pool_size=10,
+                 max_retries=5, base_retry_delay=10, timeout=60):
+        self.server = server.rstrip('/') if server else server
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_retry_delay = base_retry_delay
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(email, api_token)
+        self.session.headers.update({'Accept': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _request(self, method, path, **kwargs):
+        """
+        Sends one request through the limiter, retrying 429s (after the shared
+        pause) and transient errors with exponential backoff.
+        """
+        for retry in range(self.max_retries):
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, f"{self.server}{path}", timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if not retry_error(method, e, retry, self.max_retries):
+                    raise
+                wait_time = self.base_retry_delay * (2 ** retry)
+                logger.error(f"Error requesting {path}: {e}; retrying in {wait_time}s (attempt {retry+1}/{self.max_retries})")
+                time.sleep(wait_time)
+                continue
+
+            if response.status_code == 429:
+                self.limiter.on_throttled(parse_retry_after(response, self.base_retry_delay * (2 ** retry)))
+                continue
+            if retry_status(method, response.status_code, retry, self.max_retries):
+                wait_time = self.base_retry_delay * (2 ** retry)
+                logger.error(f"HTTP {response.status_code} for {path}; retrying in {wait_time}s (attempt {retry+1}/{self.max_retries})")
+                time.sleep(wait_time)
+                continue
+
+            response.raise_for_status()
+            self.limiter.on_success()
+            return response
+        raise RateLimitedError(f"{method} {path} still throttled after {self.max_retries} attempts")
+
+    def get_json(self, path, params=None):
+        return self._request('GET', path, params=params).json()
+
+    def get_content(self, path, params=None):
+        """The undecoded response body, for callers that parse it elsewhere (e.g. in another process)."""
+        return self._request('GET', path, params=params).content
+
+    def post_json(self, path, payload):
+        return self._request('POST', path, json=payload).json()
+
+    def put_json(self, path, payload):
+        """PUTs payload; Jira answers most edits with 204 No Content, so nothing is returned."""
+        self._request('PUT', path, json=payload)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncJiraClient:
+    """
+    asyncio front end for JiraClient: requests share the same pooled session
+    (run in worker threads), while waiting for tokens and Retry-After pauses
+    happens on the event loop through an AsyncAdaptiveRateLimiter.
+    """
+
+    def __init__(self, server, email, api_token, limiter, pool_size=10,
+                 max_retries=5, base_retry_delay=10, timeout=60):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_retry_delay = base_retry_delay
+        self._client = JiraClient(server, email, api_token, limiter, pool_size,
+                                  max_retries, base_retry_delay, timeout)
+
+    async def get_json(self, path, params=None):
+        """Same retry policy as JiraClient._request, with the backoff sleeps on the event loop."""
+        client = self._client
+        for retry in range(self.max_retries):
+            await self.limiter.acquire()
+            try:
+                response = await asyncio.to_thread(
+                    client.session.get, f"{client.server}{path}", params=params, timeout=client.timeout
+                )
+            except requests.exceptions.RequestException as e:
+                if not retry_error('GET', e, retry, self.max_retries):
+                    raise
+                wait_time = self.base_retry_delay * (2 ** retry)
+                logger.error(f"Error requesting {path}: {e}; retrying in {wait_time}s (attempt {retry+1}/{self.max_retries})")
+                await asyncio.sleep(wait_time)
+                continue
+
+            if response.status_code == 429:
+                self.limiter.on_throttled(parse_retry_after(response, self.base_retry_delay * (2 ** retry)))
+                continue
+            if retry_status('GET', response.status_code, retry, self.max_retries):
+                wait_time = self.base_retry_delay * (2 ** retry)
+                logger.error(f"HTTP {response.status_code} for {path}; retrying in {wait_time}s (attempt {retry+1}/{self.max_retries})")
+                await asyncio.sleep(wait_time)
+                continue
+            response.raise_for_status()
+            self.limiter.on_success()
+            return response.json()
+        raise RateLimitedError(f"GET {path} still throttled after {self.max_retries} attempts")
+
+    def close(self):
+        self._client.close()
@@ -0,0 +1,324 @@
+"""
+Per-stage latency histograms for the prediction and fetch pipelines, plus an
+opt-in sampling profiler.
+
+Code marks a stage with
+
+    with metrics.stage("mbert.forward"):
+        ...
+
+and every stage gets a cumulative histogram (fixed buckets, exact sum, count
+and max). render_prometheus() returns them in the Prometheus text exposition
+format and snapshot() as a JSON-ready dict with estimated percentiles.
+Stages are timed once per batch, not per ticket, so the couple of
+microseconds a timer costs vanish next to a forward pass. METRICS_ENABLED=0
+(or set_enabled(False)) turns stage() into a shared no-op context manager.
+
+The SamplingProfiler is off unless started (PROFILE_SAMPLING=1 for the
+process-wide one). It samples every thread's Python stack every
+PROFILE_INTERVAL_MS from a background thread. The result is written as
+folded stacks, which flamegraph.pl and speedscope read directly, and it also
+gives the functions with the most self time.
+"""
+import bisect
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+PROFILE_SAMPLING = os.getenv("PROFILE_SAMPLING", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+METRIC_NAME = "jira_router_stage_seconds"
+
+# Seconds; wide enough for a 50 us regex pass and a 30 s Jira backfill page.
+BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# Leaf frames of threads that are blocked rather than running Python code;
+# their samples are counted as idle instead of polluting the profile.
+IDLE_FRAMES = {("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get")}
+
+_enabled = METRICS_ENABLED
+_NOOP = contextlib.nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def state(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum, self.max
+
+    def merge(self, state):
+        """Adds the observations of another histogram's state() to this one."""
+        counts, count, total, maximum = state
+        with self._lock:
+            self.counts = [a + b for a, b in zip(self.counts, counts)]
+            self.count += count
+            self.sum += total
+            self.max = max(self.max, maximum)
+
+    def quantile(self, q):
+        """Linear interpolation inside the bucket holding the q-th observation, like PromQL histogram_quantile."""
+        with self._lock:
+            counts, count, maximum = list(self.counts), self.count, self.max
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else maximum
+                return min(maximum, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return maximum
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def drain(self):
+        """
+        {stage: state} of everything observed since the last drain, which
+        starts again from empty; for shipping a worker process's stages to
+        the parent's registry.
+        """
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+        return {name: histogram.state() for name, histogram in histograms.items()}
+
+    def merge(self, states):
+        for name, state in states.items():
+            self.histogram(name).merge(state)
+
+    def _items(self):
+        # A copy: another thread may add a stage while the caller iterates.
+        with self._lock:
+            return sorted(self._histograms.items())
+
+    def render_prometheus(self):
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each prediction / fetch pipeline stage.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for name, histogram in self._items():
+            with histogram._lock:
+                counts, count, total = list(histogram.counts), histogram.count, histogram.sum
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {total:.9g}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """{stage: {count, total_s, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}"""
+        result = {}
+        for name, histogram in self._items():
+            with histogram._lock:
+                count, total, maximum = histogram.count, histogram.sum, histogram.max
+            if not count:
+                continue
+            result[name] = {
+                "count": count,
+                "total_s": round(total, 6),
+                "mean_ms": round(total / count * 1000, 4),
+                **{
+                    f"p{int(q * 100)}_ms": round(histogram.quantile(q) * 1000, 4)
+                    for q in (0.5, 0.95, 0.99)
+                },
+                "max_ms": round(maximum * 1000, 4),
+            }
+        return result
+
+
+registry = MetricsRegistry()
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = enabled
+
+
+def stage(name):
+    """Context manager timing one pass through a pipeline stage."""
+    if not _enabled:
+        return _NOOP
+    return _StageTimer(registry.histogram(name))
+
+
+def observe(name, seconds):
+    """Records a duration measured elsewhere (e.g. time spent waiting in a queue)."""
+    if _enabled:
+        registry.histogram(name).observe(seconds)
+
+
+def drain():
+    return registry.drain()
+
+
+def merge(states):
+    """Adds the drain() result of another process to this process's stages."""
+    registry.merge(states)
+
+
+def render_prometheus():
+    return registry.render_prometheus()
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+def dump_json(path):
+    temp_file = f"{path}.temp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(temp_file, path)
+
+
+def format_table(stats=None):
+    """Plain-text table of snapshot(), slowest total first."""
+    stats = snapshot() if stats is None else stats
+    lines = [f"{'stage':<24} {'count':>7} {'total_s':>9} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9}"]
+    for name, s in sorted(stats.items(), key=lambda item: -item[1]["total_s"]):
+        lines.append(
+            f"{name:<24} {s['count']:>7} {s['total_s']:>9.3f} {s['mean_ms']:>9.3f} "
+            f"{s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['max_ms']:>9.3f}"
+        )
+    return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """Statistical profiler: periodically records the Python stack of every other busy thread."""
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    self.idle_samples += 1
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        """Folded stacks ("root;...;leaf count" per line) for flamegraph.pl / speedscope."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+
+    def top(self, n=15):
+        """[(function, self samples, share of samples)] for the n functions most often on top of a stack."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [(function, count, count / total) for function, count in leaves.most_common(n)]
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """The process-wide SamplingProfiler, already running when PROFILE_SAMPLING=1."""
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = SamplingProfiler()
+                if PROFILE_SAMPLING:
+                    _profiler.start()
+                    logger.info(f"Sampling profiler running every {PROFILE_INTERVAL_MS} ms")
+    return _profiler
@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from preprocessors.preprocessor_MBERT_base import format_query_strings
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH", "src/data/prediction_cache.sqlite3")
+MAX_MEMORY_ENTRIES = int(os.getenv("PREDICTION_CACHE_MEMORY_ENTRIES", "4096"))
+MAX_DISK_ENTRIES = int(os.getenv("PREDICTION_CACHE_DISK_ENTRIES", "200000"))
+TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+def cache_key(query_string, revision):
+    """Hash of the formatted model input plus the model revision that scored it."""
+    return hashlib.sha256(f"{revision}\0{query_string}".encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    """
+    Two-tier cache of predicted labels: a bounded in-memory LRU in front of a
+    persistent SQLite table with size-based eviction. Both tiers expire
+    entries ttl_seconds after they were scored.
+
+    Entries are keyed on format_query_string output plus the model revision,
+    so deploying a new model invalidates it automatically. Processes serving
+    different revisions can share one file: rows of a revision no longer
+    asked for simply stop being read and leave through the TTL and the
+    least-recently-used size eviction.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_memory_entries=MAX_MEMORY_ENTRIES,
+                 max_disk_entries=MAX_DISK_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "memory_evictions": 0, "disk_evictions": 0, "expired": 0,
+        }
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                key TEXT PRIMARY KEY,
+                revision TEXT NOT NULL,
+                team TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS predictions_last_access ON predictions (last_access)")
+        self._db.commit()
+
+    def _remember(self, key, team, created_at):
+        self._memory[key] = (team, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.counters["memory_evictions"] += 1
+
+    def get_many(self, keys):
+        """Returns {key: team} for every key that is cached and not expired."""
+        now = time.time()
+        found = {}
+        # A ticket repeated within one batch is one lookup, not several misses.
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            disk_keys = []
+            expired = []
+            for key in keys:
+                if key not in self._memory:
+                    disk_keys.append(key)
+                    continue
+                team, created_at = self._memory[key]
+                if now - created_at > self.ttl_seconds:
+                    # The disk row is just as old; it is deleted below.
+                    del self._memory[key]
+                    expired.append(key)
+                    continue
+                self._memory.move_to_end(key)
+                found[key] = team
+                self.counters["memory_hits"] += 1
+
+            for start in range(0, len(disk_keys), 500):
+                chunk = disk_keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, team, created_at FROM predictions WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, team, created_at in rows:
+                    if now - created_at > self.ttl_seconds:
+                        expired.append(key)
+                        continue
+                    found[key] = team
+                    self._remember(key, team, created_at)
+                    self.counters["disk_hits"] += 1
+
+            if expired:
+                self._db.executemany("DELETE FROM predictions WHERE key = ?", [(key,) for key in expired])
+                self.counters["expired"] += len(expired)
+            touched = [(now, key) for key in disk_keys if key in found]
+            if touched:
+                self._db.executemany("UPDATE predictions SET last_access = ? WHERE key = ?", touched)
+            self._db.commit()
+            self.counters["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items, revision):
+        """Stores {key: team} for the given revision and enforces the size limit."""
+        now = time.time()
+        with self._lock:
+            for key, team in items.items():
+                self._remember(key, team, now)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO predictions (key, revision, team, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, revision, team, now, now) for key, team in items.items()]
+            )
+            self._evict_disk()
+            self._db.commit()
+
+    def _evict_disk(self):
+        self.counters["expired"] += self._db.execute(
+            "DELETE FROM predictions WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        excess = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY last_access LIMIT ?)", (excess,)
+            )
+            self.counters["disk_evictions"] += excess
+
+    def predict_teams(self, summaries, descriptions, predict_batch_fn, revision):
+        """
+        Cached wrapper around predict_batch_fn(summaries, descriptions):
+        only tickets that miss both tiers are sent to the model, in one call.
+        """
+        keys = [cache_key(query_string, revision) for query_string in format_query_strings(summaries, descriptions)]
+        found = self.get_many(keys)
+
+        # First index of each uncached key, so a repeated ticket is scored once.
+        first = {}
+        for i, key in enumerate(keys):
+            if key not in found:
+                first.setdefault(key, i)
+        missing = list(first.values())
+        if missing:
+            teams = predict_batch_fn([summaries[i] for i in missing], [descriptions[i] for i in missing])
+            computed = {keys[i]: team for i, team in zip(missing, teams)}
+            self.put_many(computed, revision)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM predictions")
+            self._db.commit()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Process-wide PredictionCache at CACHE_PATH, opened on first use."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = PredictionCache()
+    return _shared_cache
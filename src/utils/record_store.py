@@ -0,0 +1,172 @@
+"""
+Persistent, append-only store of historical tickets, each paired with one
+fixed-width row of a numpy matrix (an embedding, a MinHash signature).
+
+Layout of a store directory:
+
+    meta.json         whatever identifies how the rows were computed
+    <matrix file>     one row of `width` values of `dtype` per record
+    records.jsonl     one JSON object per row: key, team, summary, updated
+
+Adding tickets appends to both files, so new issues never recompute the
+corpus. A ticket added again (e.g. after it was edited in Jira) supersedes
+its earlier row, which stays on disk but is marked inactive. Rows are only
+visible once their record line is written, and a half-written tail from a
+crash is dropped on the next load. A store opened with different meta
+starts over.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RECORDS_FILE = "records.jsonl"
+
+
+class RecordStore:
+    """
+    records, matrix, row_of_key and active mirror the files. Subclasses keep
+    their own lookup structures current by overriding _index_rows, which is
+    called under self._lock for the rows loaded and for every append.
+    """
+
+    def __init__(self, directory, meta, matrix_file, dtype, width):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self._lock = threading.Lock()
+        self._matrix_file = os.path.join(directory, matrix_file)
+        self._records_file = os.path.join(directory, RECORDS_FILE)
+        os.makedirs(directory, exist_ok=True)
+
+        meta_file = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file, encoding="utf-8") as f:
+                existing = json.load(f)
+            if existing != meta:
+                logger.info(f"Index {directory} was built with {existing}; starting a new one")
+                self._remove_files()
+        with open(meta_file, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        with self._lock:
+            self._load()
+
+    def _remove_files(self):
+        for path in (self._matrix_file, self._records_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def clear(self):
+        """Drops every stored ticket, e.g. before a full rebuild."""
+        with self._lock:
+            self._remove_files()
+            self._load()
+
+    def _load(self):
+        self.records = []
+        torn = False
+        if os.path.exists(self._records_file):
+            with open(self._records_file, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line) if line.endswith("\n") else None
+                    except json.JSONDecodeError:
+                        record = None
+                    if record is None:
+                        torn = True
+                        break
+                    self.records.append(record)
+        matrix = np.zeros((0, self.width), dtype=self.dtype)
+        matrix_bytes = 0
+        if os.path.exists(self._matrix_file):
+            matrix_bytes = os.path.getsize(self._matrix_file)
+            matrix = np.fromfile(self._matrix_file, dtype=self.dtype)
+            matrix = matrix[:len(matrix) // self.width * self.width].reshape(-1, self.width)
+        rows = min(len(self.records), len(matrix))
+        # Half-written lines and matrix rows count too: the next append would start inside them.
+        if torn or rows != len(self.records) or rows * self.width * self.dtype.itemsize != matrix_bytes:
+            logger.warning(f"Dropping a partially written tail from {self.directory}")
+            self._truncate(rows)
+        self.records = self.records[:rows]
+        self.matrix = np.ascontiguousarray(matrix[:rows])
+
+        self.row_of_key = {}
+        self.active = np.ones(rows, dtype=bool)
+        self._index_rows(0, self.records, self.matrix)
+
+    def _truncate(self, rows):
+        # Either file may be missing if a crash came between creating them.
+        if os.path.exists(self._matrix_file):
+            with open(self._matrix_file, "r+b") as f:
+                f.truncate(rows * self.width * self.dtype.itemsize)
+        if os.path.exists(self._records_file):
+            with open(self._records_file, "r+", encoding="utf-8") as f:
+                lines = f.readlines()[:rows]
+                f.seek(0)
+                f.writelines(lines)
+                f.truncate()
+
+    def _index_rows(self, start, records, matrix):
+        """Marks the rows superseded by records (rows start.. of the store) inactive."""
+        for row, record in enumerate(records, start):
+            previous = self.row_of_key.get(record["key"])
+            if previous is not None:
+                self.active[previous] = False
+            self.row_of_key[record["key"]] = row
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def updated_of(self, key):
+        row = self.row_of_key.get(key)
+        return None if row is None else self.records[row].get("updated")
+
+    def add(self, records, matrix):
+        """Appends records (dicts with key, team, summary, updated) and their matrix rows."""
+        if not records:
+            return 0
+        matrix = np.ascontiguousarray(matrix, dtype=self.dtype)
+        with self._lock:
+            with open(self._matrix_file, "ab") as f:
+                f.write(matrix.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._records_file, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            start = len(self.records)
+            self.records.extend(records)
+            self.matrix = np.concatenate([self.matrix, matrix])
+            self.active = np.concatenate([self.active, np.ones(len(records), dtype=bool)])
+            self._index_rows(start, records, matrix)
+        return len(records)
+
+    def team_of(self, row):
+        return self.records[row]["team"]
+
+
+def index_issues(df, store, compute_rows):
+    """
+    Appends the labelled issues of df whose key is not in store yet or whose
+    'Updated' value changed since it was added, with
+    compute_rows(summaries, descriptions) as their matrix rows. Returns the
+    count.
+    """
+    df = df.dropna(subset=["Fixed By"])
+    df = df[[store.updated_of(key) != str(updated) for key, updated in zip(df["Issue Key"], df["Updated"])]]
+    if df.empty:
+        return 0
+    summaries = df["Summary"].fillna("").tolist()
+    matrix = compute_rows(summaries, df["Description"].tolist())
+    records = [
+        {"key": key, "team": team, "summary": summary, "updated": str(updated)}
+        for key, team, summary, updated in zip(df["Issue Key"], df["Fixed By"], summaries, df["Updated"])
+    ]
+    return store.add(records, matrix)
@@ -0,0 +1,194 @@
+"""
+Persistent bookkeeping for the auto-routing daemon.
+
+Every issue the daemon touches gets one row keyed on its issue key, so a
+restart, an overlapping poll window or Jira's search index lagging behind a
+write never routes the same issue twice:
+
+    in_flight   predicted, write-back not confirmed yet (retried after a crash,
+                or polled again while its bulk-edit task is still running)
+    routed      team written to Jira
+    triage      left for a human (the predictor was not confident)
+    failed      last attempt failed; retried until MAX_ATTEMPTS
+    dead        gave up; listed in the dead-letter queue until requeued
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STATE_PATH = os.getenv("ROUTING_STATE_PATH", "src/data/routing_state.sqlite3")
+MAX_ATTEMPTS = int(os.getenv("ROUTING_MAX_ATTEMPTS", "3"))
+
+FINAL_STATUSES = ("routed", "triage", "dead")
+
+
+class RoutingState:
+    def __init__(self, path=STATE_PATH, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS issues (
+                key TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                team TEXT,
+                revision TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created REAL,
+                seen_at REAL NOT NULL,
+                routed_at REAL,
+                task TEXT
+            )
+        """)
+        columns = {name for _, name, *_ in self._db.execute("PRAGMA table_info(issues)")}
+        if "task" not in columns:  # state files from before bulk tasks were tracked
+            self._db.execute("ALTER TABLE issues ADD COLUMN task TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS issues_status ON issues (status)")
+        self._db.commit()
+
+    def unprocessed(self, keys):
+        """The subset of keys that still need work (and no bulk task is writing), in input order."""
+        keys = list(keys)
+        if not keys:
+            return []
+        with self._lock:
+            done = {
+                key for (key,) in self._db.execute(
+                    f"SELECT key FROM issues WHERE (status IN ({','.join('?' * len(FINAL_STATUSES))}) "
+                    f"OR task IS NOT NULL) AND key IN ({','.join('?' * len(keys))})",
+                    (*FINAL_STATUSES, *keys),
+                )
+            }
+        return [key for key in keys if key not in done]
+
+    def mark_in_flight(self, predictions, revision, created):
+        """predictions: {key: team}; created: {key: epoch seconds the issue was filed}."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                """
+                INSERT INTO issues (key, status, team, revision, created, seen_at) VALUES (?, 'in_flight', ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET status = 'in_flight', team = excluded.team, revision = excluded.revision
+                """,
+                [(key, team, revision, created.get(key), now) for key, team in predictions.items()],
+            )
+            self._db.commit()
+
+    def mark_done(self, keys, status="routed"):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE issues SET status = ?, routed_at = ?, error = NULL, task = NULL WHERE key = ?",
+                [(status, now, key) for key in keys],
+            )
+            self._db.commit()
+
+    def mark_failed(self, errors, created=None):
+        """
+        errors: {key: message}. Each failure counts as an attempt; issues that
+        reach max_attempts move to the dead-letter queue. Returns the keys that
+        were dead-lettered.
+        """
+        now = time.time()
+        created = created or {}
+        dead = []
+        with self._lock:
+            for key, error in errors.items():
+                self._db.execute(
+                    """
+                    INSERT INTO issues (key, status, attempts, error, created, seen_at) VALUES (?, 'failed', 1, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET status = 'failed', attempts = attempts + 1, error = excluded.error,
+                        task = NULL
+                    """,
+                    (key, str(error), created.get(key), now),
+                )
+                (attempts,) = self._db.execute("SELECT attempts FROM issues WHERE key = ?", (key,)).fetchone()
+                if attempts >= self.max_attempts:
+                    self._db.execute("UPDATE issues SET status = 'dead' WHERE key = ?", (key,))
+                    dead.append(key)
+            self._db.commit()
+        for key in dead:
+            logger.error(f"Dead-lettered {key} after {self.max_attempts} attempts: {errors[key]}")
+        return dead
+
+    def mark_bulk_task(self, task_id, keys):
+        """Leaves keys in_flight while the bulk-edit task task_id writes them."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE issues SET status = 'in_flight', task = ? WHERE key = ?", [(task_id, key) for key in keys]
+            )
+            self._db.commit()
+
+    def bulk_tasks(self):
+        """{task_id: (team, keys)} for the bulk-edit tasks still to be polled."""
+        tasks = {}
+        with self._lock:
+            for task_id, team, key in self._db.execute(
+                "SELECT task, team, key FROM issues WHERE task IS NOT NULL AND status = 'in_flight' ORDER BY task, key"
+            ):
+                tasks.setdefault(task_id, (team, []))[1].append(key)
+        return tasks
+
+    def retry_keys(self, limit=None):
+        """
+        Keys of failed issues and of in_flight ones left by a crash, oldest
+        first. They may have left the poll window, so the daemon fetches them
+        by key.
+        """
+        with self._lock:
+            return [
+                key for (key,) in self._db.execute(
+                    "SELECT key FROM issues WHERE status IN ('failed', 'in_flight') AND task IS NULL "
+                    "ORDER BY seen_at, key LIMIT ?",
+                    (-1 if limit is None else limit,),
+                )
+            ]
+
+    def dead_letters(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT key, team, attempts, error FROM issues WHERE status = 'dead' ORDER BY key"
+            ).fetchall()
+
+    def requeue_dead(self, keys=None):
+        """
+        Gives dead-lettered issues (all, or just keys) a fresh set of attempts;
+        the daemon picks them up on its next cycle.
+        """
+        with self._lock:
+            if keys is None:
+                count = self._db.execute("UPDATE issues SET status = 'failed', attempts = 0 WHERE status = 'dead'").rowcount
+            else:
+                count = self._db.executemany(
+                    "UPDATE issues SET status = 'failed', attempts = 0 WHERE status = 'dead' AND key = ?",
+                    [(key,) for key in keys],
+                ).rowcount
+            self._db.commit()
+        return count
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM issues GROUP BY status").fetchall())
+
+    def routing_lags(self, since=0.0):
+        """Seconds from issue creation to confirmed write-back, for issues routed after `since`."""
+        with self._lock:
+            return [
+                lag for (lag,) in self._db.execute(
+                    "SELECT routed_at - created FROM issues WHERE status = 'routed' AND routed_at >= ? "
+                    "AND created IS NOT NULL",
+                    (since,),
+                )
+            ]
+
+    def close(self):
+        self._db.close()
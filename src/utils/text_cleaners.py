@@ -1,35 +1,66 @@
-import re 
+import re
 import pandas as pd
 import logging
-logging.basicConfig(level=logging.INFO) 
+from concurrent.futures import ProcessPoolExecutor
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump whenever the cleaning output changes; cached preprocessed datasets
+# built with another version are rebuilt.
+CLEANER_VERSION = "1"
+
+# Replace Google Drive links and other markdown links with a placeholder
+HTTPS_LINK_PATTERN = re.compile(r'\[https:\/\/.*?\|.*?\]')
+# Remove all other markdown-style links (like [text|url])
+MARKDOWN_LINK_PATTERN = re.compile(r'\[.*?\|.*?\]')
+# Remove file/image attachments like !file.png!
+ATTACHMENT_PATTERN = re.compile(r'!.*?!')
+
+# Below this many descriptions a process pool costs more than it saves.
+MIN_PARALLEL_BATCH = 2000
 
 
 def clean_description(text):
-    
+
     """Clean and standardize JIRA bug descriptions"""
-    
+
     if pd.isna(text) or text is None:
         return ""
-    
+
     text = str(text)
-    
-    # Replace Google Drive links and other markdown links with a placeholder
-    text = re.sub(r'\[https:\/\/.*?\|.*?\]', '[LINK]', text)
-    
-    # Remove all other markdown-style links (like [text|url])
-    text = re.sub(r'\[.*?\|.*?\]', '[LINK]', text)
 
-    # Remove file/image attachments like !file.png!
-    text = re.sub(r'!.*?!', '[FILE ATTACHMENT]', text)
-    
-    # Collapse multiple spaces
-    text = re.sub(r'\s+', ' ', text)
+    # The link passes must stay separate and in this order: the first one can
+    # change where the second one starts matching.
+    if '|' in text:
+        text = HTTPS_LINK_PATTERN.sub('[LINK]', text)
+        text = MARKDOWN_LINK_PATTERN.sub('[LINK]', text)
+
+    if '!' in text:
+        text = ATTACHMENT_PATTERN.sub('[FILE ATTACHMENT]', text)
+
+    # Collapse whitespace runs and strip; str.split() uses the same whitespace
+    # definition as the regex \s.
+    text = ' '.join(text.split())
+
+    logger.debug("Cleaned description: %s", text)
+
+    return text
+
 
-    text.strip()
+def clean_descriptions(texts, n_jobs=None, chunksize=256):
+    """
+    Batch version of clean_description for a pandas Series or a list of strings.
+    Returns the same type (a Series keeps its index). With n_jobs > 1 and at
+    least MIN_PARALLEL_BATCH descriptions, the work is spread over a process pool.
+    """
+    values = texts.tolist() if isinstance(texts, pd.Series) else list(texts)
 
-    logger.info(f"Cleaned description: {text}")
+    if n_jobs and n_jobs > 1 and len(values) >= MIN_PARALLEL_BATCH:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            cleaned = list(executor.map(clean_description, values, chunksize=chunksize))
+    else:
+        cleaned = [clean_description(text) for text in values]
 
-    
-    return text.strip()
\ No newline at end of file
+    if isinstance(texts, pd.Series):
+        return pd.Series(cleaned, index=texts.index, name=texts.name)
+    return cleaned